@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark der WebP-Encoder-Profile
+
+Encodes every image of a reference corpus with each profile from
+WEBP_PROFILES and reports encode time vs. output size, so the defaults
+(UPLOAD_WEBP_PROFILE, TRANSFORM_WEBP_PROFILE) can be picked from data.
+
+Usage:
+    python benchmark_encoders.py /path/to/corpus [--quality 85] [--width 800] [--repeat 3]
+
+--width additionally downsizes before encoding, like a typical transform.
+"""
+import argparse
+import io
+import math
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add backend directory to path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from PIL import Image
+from image_processing import WEBP_PROFILES, webp_options
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".tif", ".tiff", ".bmp"}
+
+
+def load_corpus(corpus_dir: Path, width: int | None) -> list[tuple[str, Image.Image]]:
+    """Decode all corpus images once (decode time is not part of the benchmark)"""
+    images = []
+    for path in sorted(corpus_dir.rglob("*")):
+        if path.suffix.lower() not in IMAGE_SUFFIXES:
+            continue
+        try:
+            img = Image.open(path)
+            img.load()
+        except Exception as e:
+            print(f"⚠️  Skipping {path.name}: {e}")
+            continue
+
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() or img.mode == "P" else "RGB")
+        if width and img.width > width:
+            img.thumbnail((width, img.height), Image.Resampling.LANCZOS)
+        images.append((path.name, img))
+    return images
+
+
+def encode(img: Image.Image, quality: int, profile: str) -> tuple[float, int]:
+    """Encode once, returns (seconds, bytes)"""
+    output = io.BytesIO()
+    start = time.perf_counter()
+    img.save(output, format="WEBP", quality=quality, **webp_options(profile))
+    return time.perf_counter() - start, output.tell()
+
+
+def run_benchmark(images: list[tuple[str, Image.Image]], quality: int, repeat: int) -> dict:
+    """Median encode time and total output size per profile"""
+    results = {}
+    for profile in WEBP_PROFILES:
+        times = []
+        total_bytes = 0
+        for _, img in images:
+            samples = [encode(img, quality, profile) for _ in range(repeat)]
+            times.append(statistics.median(seconds for seconds, _ in samples))
+            total_bytes += samples[0][1]
+        results[profile] = {
+            "total_ms": sum(times) * 1000,
+            "median_ms": statistics.median(times) * 1000,
+            "p95_ms": sorted(times)[math.ceil(len(times) * 0.95) - 1] * 1000,
+            "bytes": total_bytes
+        }
+    return results
+
+
+def print_report(results: dict, image_count: int):
+    baseline = results["max"]
+    print(f"\n📊 {image_count} images\n")
+    print(f"{'profile':<10} {'total ms':>10} {'median ms':>10} {'p95 ms':>10} {'KiB':>10} {'size vs max':>12} {'time vs max':>12}")
+    for profile, r in results.items():
+        print(
+            f"{profile:<10} {r['total_ms']:>10.1f} {r['median_ms']:>10.1f} {r['p95_ms']:>10.1f} "
+            f"{r['bytes'] / 1024:>10.1f} {r['bytes'] / baseline['bytes'] * 100:>11.1f}% "
+            f"{r['total_ms'] / baseline['total_ms'] * 100:>11.1f}%"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark WebP encoder profiles")
+    parser.add_argument("corpus", type=Path, help="Directory with reference images")
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--width", type=int, default=None, help="Downsize to this width before encoding")
+    parser.add_argument("--repeat", type=int, default=3, help="Encodes per image and profile (median is used)")
+    args = parser.parse_args()
+
+    images = load_corpus(args.corpus, args.width)
+    if not images:
+        print(f"❌ No images found in {args.corpus}")
+        sys.exit(1)
+
+    results = run_benchmark(images, args.quality, args.repeat)
+    print_report(results, len(images))
+
+
+if __name__ == "__main__":
+    main()
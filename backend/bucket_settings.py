@@ -0,0 +1,71 @@
+"""
+Per-bucket options
+
+Stored as SystemSetting rows with the key "bucket:{bucket}:{name}". Reads
+are cached per process for BUCKET_SETTINGS_TTL seconds because the transform
+endpoint consults them on every request; other API workers pick up a change
+once their cached entry expires.
+"""
+
+import time
+from typing import Optional
+from sqlalchemy.orm import Session
+from config import settings
+from models import SystemSetting
+
+BUCKET_SETTINGS_TTL = 30
+
+_cache: dict[str, tuple[float, Optional[str]]] = {}
+
+
+def bucket_setting_key(bucket: str, name: str) -> str:
+    """SystemSetting key of a per-bucket option"""
+    return f"bucket:{bucket}:{name}"
+
+
+def get_bucket_setting(db: Session, bucket: str, name: str) -> Optional[str]:
+    """Raw value of a bucket option, None if unset"""
+    key = bucket_setting_key(bucket, name)
+    cached = _cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    setting = db.query(SystemSetting).filter_by(key=key).first()
+    value = setting.value if setting else None
+    _cache[key] = (time.monotonic() + BUCKET_SETTINGS_TTL, value)
+    return value
+
+
+def set_bucket_setting(db: Session, bucket: str, name: str, value: Optional[str]):
+    """Store a bucket option (None removes it) and commit"""
+    key = bucket_setting_key(bucket, name)
+    setting = db.query(SystemSetting).filter_by(key=key).first()
+
+    if value is None:
+        if setting:
+            db.delete(setting)
+    elif setting:
+        setting.value = value
+    else:
+        db.add(SystemSetting(key=key, value=value))
+
+    db.commit()
+    _cache.pop(key, None)
+
+
+def get_bucket_generate_variants(db: Session, bucket: str) -> bool:
+    """Render standard variants at upload (GENERATE_VARIANTS if unset)"""
+    value = get_bucket_setting(db, bucket, "generate_variants")
+    if value is None:
+        return settings.GENERATE_VARIANTS
+    return value == "true"
+
+
+def get_bucket_upload_profile(db: Session, bucket: str) -> str:
+    """WebP encoder profile for uploads (UPLOAD_WEBP_PROFILE if unset)"""
+    return get_bucket_setting(db, bucket, "upload_webp_profile") or settings.UPLOAD_WEBP_PROFILE
+
+
+def get_bucket_transform_profile(db: Session, bucket: str) -> str:
+    """WebP encoder profile for transforms (TRANSFORM_WEBP_PROFILE if unset)"""
+    return get_bucket_setting(db, bucket, "transform_webp_profile") or settings.TRANSFORM_WEBP_PROFILE
@@ -0,0 +1,175 @@
+"""
+Cache pre-warming jobs (kind "warm")
+
+Renders the responsive srcset ladder (WARM_WIDTHS x WARM_FORMATS) and the
+standard variants of many images in the background, so launch traffic hits
+warm caches instead of rendering on the first request. Every file is one
+render_batch() call: one source fetch and decode, results written to the
+derivatives bucket and Redis. With `edge` the public transform URLs are
+requested as well, which fills the nginx cache.
+
+Warming runs at low priority:
+- at most WARM_RATE_LIMIT files per second per job
+- it pauses while interactive transform requests wait for a slot
+- transform queue admission limits do not apply (background_work)
+"""
+
+import asyncio
+import time
+from typing import Optional
+import httpx
+from minio.error import S3Error
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from database import SessionLocal
+from models import UploadedFile
+from derivatives import STANDARD_VARIANTS, normalize_transform_params
+from bucket_settings import get_bucket_transform_profile
+from image_processing import AUTO_FORMATS
+from transform_presets import snap_dimensions
+from transform_batch import render_batch
+from executors import transform_queue
+from url_helpers import build_transform_url
+from jobs import increment_progress, register_job_handler
+
+# Accept header per negotiated format, for edge requests of format=auto URLs
+EDGE_ACCEPT = {
+    "avif": "image/avif,image/webp,*/*",
+    "webp": "image/webp,*/*",
+    "jpg": "*/*"
+}
+
+QUEUE_BACKOFF = 0.5  # Seconds to wait while interactive transforms are queued
+
+
+def select_warm_files(
+    db: Session,
+    bucket: Optional[str] = None,
+    folder: Optional[str] = None,
+    paths: Optional[list[str]] = None,
+    top: Optional[int] = None
+) -> list[tuple[str, str]]:
+    """
+    (bucket, object name) of the images to warm, at most WARM_MAX_FILES
+
+    paths: explicit object names within bucket
+    top: the N most downloaded images (of bucket/folder, if given)
+    otherwise: all images of bucket (and folder)
+    """
+    if paths:
+        return [(bucket, path.lstrip("/")) for path in paths[:settings.WARM_MAX_FILES]]
+
+    query = db.query(UploadedFile.bucket, UploadedFile.path).filter(
+        UploadedFile.file_type == "image",
+        UploadedFile.is_active == True
+    )
+    if bucket:
+        query = query.filter(UploadedFile.bucket == bucket)
+        if folder:
+            query = query.filter(UploadedFile.path.startswith(f"/{bucket}/{folder.strip('/')}/"))
+
+    if top:
+        query = query.order_by(UploadedFile.download_count.desc())
+    else:
+        query = query.order_by(UploadedFile.id)
+    limit = min(top, settings.WARM_MAX_FILES) if top else settings.WARM_MAX_FILES
+
+    # UploadedFile.path is "/{bucket}/{object name}"
+    return [(row.bucket, row.path[len(row.bucket) + 2:]) for row in query.limit(limit).all()]
+
+
+def warm_outputs(widths: list[int], formats: list[str], include_variants: bool) -> list[dict]:
+    """URL parameters to warm per file: the srcset ladder plus the standard variants"""
+    outputs = [{"w": width, "format": format} for format in formats for width in widths]
+    if include_variants:
+        outputs += [dict(params) for params in STANDARD_VARIANTS.values()]
+    return outputs
+
+
+def render_params(output: dict, profile: str) -> list[dict]:
+    """
+    Normalized transform params of one output, as the transform endpoint
+    would render them (width snapping applied, format=auto: every negotiable format)
+    """
+    formats = AUTO_FORMATS if output.get("format") == "auto" else [output.get("format")]
+    w, h = snap_dimensions(output.get("w"), output.get("h"))
+    return [
+        normalize_transform_params(
+            w, h, format, output.get("quality", 85),
+            output.get("fit", "contain"), output.get("crop"), profile
+        )
+        for format in formats
+    ]
+
+
+async def warm_edge(client: httpx.AsyncClient, bucket: str, path: str, outputs: list[dict]) -> int:
+    """Request the public transform URLs through nginx, returns the number of requests"""
+    requests = 0
+    for output in outputs:
+        url = build_transform_url(bucket, path, **output)
+        formats = AUTO_FORMATS if output.get("format") == "auto" else [None]
+        for format in formats:
+            headers = {"Accept": EDGE_ACCEPT[format]} if format else {}
+            try:
+                response = await client.get(url, headers=headers)
+                if response.status_code >= 400:
+                    print(f"Edge warm of {url} returned {response.status_code}")
+            except httpx.HTTPError as e:
+                print(f"Edge warm of {url} failed: {e}")
+            requests += 1
+    return requests
+
+
+async def wait_for_idle_transforms():
+    """Yield to interactive transform requests waiting in this worker"""
+    while transform_queue.waiting > 0:
+        await asyncio.sleep(QUEUE_BACKOFF)
+
+
+async def process_warm_job(job_id: str, params: dict) -> dict:
+    """Background handler: render the outputs of every selected file"""
+    outputs = params["outputs"]
+    interval = 1 / params["rate"] if params.get("rate") else 0
+
+    db = SessionLocal()
+    try:
+        profiles = {
+            bucket: get_bucket_transform_profile(db, bucket)
+            for bucket in {bucket for bucket, _ in params["files"]}
+        }
+    finally:
+        db.close()
+
+    result = {"files": len(params["files"]), "rendered": 0, "cached": 0, "edge_requests": 0, "failed": []}
+    client = httpx.AsyncClient(timeout=settings.WARM_EDGE_TIMEOUT) if params.get("edge") else None
+    try:
+        for bucket, path in params["files"]:
+            started = time.monotonic()
+            await wait_for_idle_transforms()
+
+            renders = [p for output in outputs for p in render_params(output, profiles[bucket])]
+            try:
+                for output in await render_batch(bucket, path, renders):
+                    result[output["status"]] += 1
+                if client:
+                    result["edge_requests"] += await warm_edge(client, bucket, path, outputs)
+            except S3Error as e:
+                result["failed"].append({"bucket": bucket, "path": path, "error": f"Not found: {e.code}"})
+            except Exception as e:
+                print(f"Warming {bucket}/{path} failed: {e}")
+                result["failed"].append({"bucket": bucket, "path": path, "error": str(e)})
+
+            await run_in_threadpool(increment_progress, job_id)
+
+            remaining = interval - (time.monotonic() - started)
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+    finally:
+        if client:
+            await client.aclose()
+
+    return result
+
+
+register_job_handler("warm", process_warm_job, concurrency=settings.WARM_JOB_WORKERS)
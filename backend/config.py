@@ -19,6 +19,9 @@ class Settings(BaseSettings):
     MINIO_SECRET_KEY: str = "adminpassword123"
     MINIO_SECURE: bool = False
     MINIO_DEFAULT_BUCKET: str = "media"
+    MINIO_PUBLIC_ENDPOINT: str = ""  # Host:port clients reach MinIO on (presigned uploads), empty = MINIO_ENDPOINT
+    MINIO_PUBLIC_SECURE: bool = False
+    MINIO_REGION: str = "us-east-1"  # Fixed region: presigning needs no round-trip to MinIO
     
     # NGINX Cache
     NGINX_CACHE_PATH: str = "/var/cache/nginx/cdn"
@@ -32,9 +35,71 @@ class Settings(BaseSettings):
     
     # Upload Settings
     MAX_UPLOAD_SIZE: int = 5_000_000_000  # 5GB
+    UPLOAD_CONCURRENCY: int = 4  # Files of one /upload/multi batch processed in parallel
+    UPLOAD_PART_SIZE: int = 8 * 1024 * 1024  # 8MB multipart chunks (MinIO minimum: 5MB)
+    BUCKET_REGISTRY_TTL: int = 300  # Seconds a checked bucket is trusted without asking MinIO
+    
+    # Resumable Uploads
+    RESUMABLE_CHUNK_SIZE: int = 8 * 1024 * 1024  # Default chunk size for upload sessions
+    RESUMABLE_MAX_CHUNK_SIZE: int = 64 * 1024 * 1024
+    RESUMABLE_SESSION_TTL_HOURS: int = 24
+    PRESIGNED_UPLOAD_EXPIRY_MINUTES: int = 60  # Validity of presigned PUT URLs
     ALLOWED_IMAGE_EXTENSIONS: set = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg"}
     ALLOWED_VIDEO_EXTENSIONS: set = {".mp4", ".webm", ".avi", ".mov", ".mkv", ".flv", ".m4v"}
     
+    # Image Processing (process pool per API worker)
+    API_WORKERS: int = 4  # uvicorn workers (start.sh), each one has its own process pool
+    IMAGE_WORKERS: int = 0  # Pool size per API worker, 0 = CPU cores / API_WORKERS (at least 2)
+    IMAGE_QUEUE_SIZE: int = 32  # Tasks allowed to wait for a free process
+    IMAGE_QUEUE_TIMEOUT: float = 30.0  # Seconds a task may wait before 503
+    IMAGE_RETRY_AFTER: int = 5  # Retry-After header (seconds) on 503
+    TRANSFORM_CONCURRENCY: int = 0  # Pool processes for transforms, 0 = half; the rest serves uploads
+    TRANSFORM_QUEUE_SIZE: int = 64  # Transform requests allowed to wait for a slot
+    TRANSFORM_QUEUE_TIMEOUT: float = 10.0  # Seconds a transform may wait before 503
+    ORIGIN_IO_WORKERS: int = 16  # Threads for MinIO reads of transform sources
+    TRANSFORM_BATCH_MAX_OUTPUTS: int = 24  # Outputs per POST /api/transform/batch
+    
+    # Derivatives (standard variants rendered at upload)
+    DERIVATIVES_BUCKET: str = "derivatives"  # Private bucket, served via /api/transform
+    GENERATE_VARIANTS: bool = False  # Default when neither upload nor bucket setting decides
+    DERIVATIVES_EXPIRE_DAYS: int = 90  # Bucket lifecycle expiry of stored derivatives, 0 = keep
+    
+    # WebP encoder profiles: fast, balanced, max (see benchmark_encoders.py)
+    UPLOAD_WEBP_PROFILE: str = "max"
+    TRANSFORM_WEBP_PROFILE: str = "max"
+    
+    # Transform Snapping: requested widths are rounded up to the ladder
+    TRANSFORM_SNAP_MODE: str = "off"  # off, up (render snapped size), redirect (301 to snapped URL)
+    TRANSFORM_WIDTH_LADDER: list[int] = [160, 320, 400, 480, 640, 800, 960, 1200, 1600, 2000, 2400, 3200, 4000]
+    
+    # Transform Cache (Redis, shared by all API workers)
+    TRANSFORM_CACHE_ENABLED: bool = True
+    TRANSFORM_CACHE_TTL: int = 7 * 24 * 3600  # Seconds per entry
+    TRANSFORM_CACHE_MAX_ENTRY_SIZE: int = 4 * 1024 * 1024  # Larger results are not cached
+    TRANSFORM_LOCK_TTL: float = 30.0  # Seconds a render lock lives if its holder dies
+    TRANSFORM_COALESCE_WAIT: float = 10.0  # Max seconds to wait for another worker's render
+    TRANSFORM_COALESCE_POLL: float = 0.05  # Poll interval while waiting
+    
+    # Transform Source Cache (originals, per node)
+    SOURCE_CACHE_DIR: str = "/tmp/cdn-source-cache"  # Empty = memory tier only
+    SOURCE_CACHE_DISK_SIZE: int = 2 * 1024 * 1024 * 1024  # 2GB, LRU
+    SOURCE_CACHE_MEMORY_SIZE: int = 64 * 1024 * 1024  # Per API worker
+    SOURCE_CACHE_MAX_MEMORY_ENTRY: int = 16 * 1024 * 1024  # Larger sources only go to disk
+    
+    # Background Jobs (Redis queue, consumers run in every API worker)
+    UPLOAD_STAGING_BUCKET: str = "upload-staging"  # Private bucket for async upload payloads
+    UPLOAD_JOB_WORKERS: int = 1  # Upload jobs processed concurrently per API worker
+    JOB_POLL_TIMEOUT: int = 5  # Seconds a worker blocks on the queue per poll
+    JOB_STALE_AFTER_MINUTES: int = 60  # Processing jobs without progress are re-queued on startup
+    
+    # Cache Warming (background jobs, see cache_warming.py)
+    WARM_WIDTHS: list[int] = [400, 800, 1200, 1600]  # Default srcset ladder
+    WARM_FORMATS: list[str] = ["webp"]  # Default formats, "auto" = every negotiable format
+    WARM_RATE_LIMIT: float = 2.0  # Max files per second per job
+    WARM_MAX_FILES: int = 5000  # Files per job
+    WARM_JOB_WORKERS: int = 1  # Warm jobs processed concurrently per API worker
+    WARM_EDGE_TIMEOUT: float = 30.0  # Seconds per edge (nginx) request
+    
     # CDN Settings
     CDN_DOMAIN: str = "localhost"
     CDN_PROTOCOL: str = "http"
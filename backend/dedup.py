@@ -0,0 +1,69 @@
+"""
+Content-addressed deduplication for uploads
+
+The dedup key is a SHA-256 over the hash of the original bytes, the target
+bucket and a signature of the processing options (WebP quality, watermark
+config). A repeat upload with the same key skips conversion and storage and
+gets the file that is already stored.
+"""
+
+import hashlib
+from datetime import datetime
+from typing import Optional
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from models import ContentIndex, UploadedFile, WatermarkConfig
+from metrics import track_cache
+
+
+def watermark_signature(config: WatermarkConfig, position: str) -> str:
+    """Identify a watermark config version and the settings applied with it"""
+    changed = config.updated_at or config.created_at
+    version = int(changed.timestamp()) if changed else 0
+    return f"wm:{config.id}:{version}:{position}:{config.opacity}:{config.scale_percent}"
+
+
+def watermark_version(config: WatermarkConfig) -> str:
+    """Changes whenever logo or settings of the config change (overlay cache key)"""
+    changed = config.updated_at or config.created_at
+    return f"{config.id}:{changed.timestamp() if changed else 0}"
+
+
+def content_key(sha256: str, bucket: str, signature: str) -> str:
+    """Dedup key for original content uploaded to bucket with given processing"""
+    return hashlib.sha256(f"{sha256}|{bucket}|{signature}".encode()).hexdigest()
+
+
+def find_duplicate(db: Session, key: str) -> Optional[UploadedFile]:
+    """Return the active file already stored under this key (hit stats are committed by the caller)"""
+    row = db.query(ContentIndex, UploadedFile).join(
+        UploadedFile, ContentIndex.file_id == UploadedFile.id
+    ).filter(
+        ContentIndex.content_key == key,
+        UploadedFile.is_active == True
+    ).first()
+
+    if not row:
+        track_cache(False, "dedup")
+        return None
+
+    entry, db_file = row
+    entry.hit_count = (entry.hit_count or 0) + 1
+    entry.last_hit_at = datetime.now()
+
+    track_cache(True, "dedup")
+    return db_file
+
+
+def register_contents(db: Session, entries: list[dict]):
+    """
+    Bulk-add index entries (dicts with content_key, sha256, file_id)
+
+    Runs in the caller's transaction. Keys stored concurrently by another
+    upload are skipped - the first entry wins.
+    """
+    if not entries:
+        return
+    db.execute(
+        pg_insert(ContentIndex).values(entries).on_conflict_do_nothing(index_elements=["content_key"])
+    )
@@ -0,0 +1,225 @@
+"""
+Stored image derivatives
+
+The standard variants advertised in upload responses (thumbnail, preview,
+large, original_webp) can be rendered once at ingest and stored in the
+private derivatives bucket. On-the-fly transforms with a bounded parameter
+set (presets, snapped widths, the standard variants) are written through to
+the same place, so renders survive nginx purges and node replacements. The
+transform endpoint serves a stored derivative directly instead of
+downloading and decoding the original again.
+
+Object layout: {DERIVATIVES_BUCKET}/{bucket}/{path}/{source_etag}/{cache_key}
+
+The source ETag in the key means an overwritten original never serves old
+renders; remove_stale_derivatives drops the old versions once the new one is
+rendered, remove_derivatives drops all versions at once. The bucket expires
+objects after DERIVATIVES_EXPIRE_DAYS (lifecycle rule), which bounds it.
+"""
+
+import hashlib
+import io
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Optional
+from minio.commonconfig import ENABLED, Filter
+from minio.error import S3Error
+from minio.lifecycleconfig import Expiration, LifecycleConfig, Rule
+from config import settings
+from services import minio_client, ensure_bucket_exists
+
+# Same parameters as the transform URLs in upload responses
+STANDARD_VARIANTS = {
+    "thumbnail": {"w": 400, "h": 400, "fit": "cover", "crop": "center", "format": "webp"},
+    "preview": {"w": 800, "format": "webp"},
+    "large": {"w": 1600, "format": "webp"},
+    "original_webp": {"format": "webp", "quality": 90}
+}
+
+_lifecycle_applied = False
+
+
+def normalize_transform_params(
+    w: Optional[int] = None,
+    h: Optional[int] = None,
+    format: Optional[str] = None,
+    quality: int = 85,
+    fit: str = "contain",
+    crop: Optional[str] = None,
+    profile: Optional[str] = None
+) -> dict:
+    """Transform parameters with defaults filled in, so equal renders share a key"""
+    if format:
+        format = format.lower()
+        if format == "jpeg":
+            format = "jpg"
+    return {
+        "w": w, "h": h, "format": format, "quality": quality, "fit": fit, "crop": crop,
+        "profile": profile or settings.TRANSFORM_WEBP_PROFILE
+    }
+
+
+def get_transform_cache_key(bucket: str, path: str, params: dict) -> str:
+    """Generate cache key for transformed images"""
+    param_str = "&".join(f"{k}={v}" for k, v in sorted(params.items()) if v is not None)
+    key_str = f"{bucket}/{path}?{param_str}"
+    return hashlib.md5(key_str.encode()).hexdigest()
+
+
+def transform_etag(bucket: str, path: str, params: dict, source_etag: str) -> str:
+    """
+    Strong ETag of a transform result: one source version rendered with
+    normalized params always gives the same bytes
+    """
+    key = f"{source_etag}/{get_transform_cache_key(bucket, path, params)}"
+    return f'"{hashlib.md5(key.encode()).hexdigest()}"'
+
+
+def http_date(timestamp: Optional[datetime]) -> Optional[str]:
+    """Last-Modified header value of a source timestamp (MinIO returns UTC)"""
+    if timestamp is None:
+        return None
+    return format_datetime(timestamp.astimezone(timezone.utc), usegmt=True)
+
+
+def derivative_prefix(bucket: str, path: str) -> str:
+    return f"{bucket}/{path.lstrip('/')}/"
+
+
+def derivative_object_name(bucket: str, path: str, params: dict, source_etag: str) -> str:
+    """Object name for normalized transform params of one source version"""
+    return f"{derivative_prefix(bucket, path)}{source_etag}/{get_transform_cache_key(bucket, path, params)}"
+
+
+def standard_variant_params(profile: Optional[str] = None) -> dict[str, dict]:
+    """Normalized parameters of the standard variants for a WebP profile"""
+    return {
+        name: normalize_transform_params(**params, profile=profile)
+        for name, params in STANDARD_VARIANTS.items()
+    }
+
+
+def is_standard_variant(params: dict) -> bool:
+    """Normalized params equal to one of the standard variants"""
+    return params in standard_variant_params(params.get("profile")).values()
+
+
+def ensure_derivatives_bucket():
+    """Private derivatives bucket with its expiry rule (blocking, the rule is set once per process)"""
+    global _lifecycle_applied
+    ensure_bucket_exists(settings.DERIVATIVES_BUCKET, public=False)
+    if _lifecycle_applied or not settings.DERIVATIVES_EXPIRE_DAYS:
+        return
+    try:
+        minio_client.set_bucket_lifecycle(
+            settings.DERIVATIVES_BUCKET,
+            LifecycleConfig([
+                Rule(
+                    ENABLED,
+                    rule_filter=Filter(prefix=""),
+                    rule_id="expire-derivatives",
+                    expiration=Expiration(days=settings.DERIVATIVES_EXPIRE_DAYS)
+                )
+            ])
+        )
+        _lifecycle_applied = True
+    except Exception as e:
+        print(f"Could not set the lifecycle of {settings.DERIVATIVES_BUCKET}: {e}")
+
+
+def store_derivative(
+    bucket: str,
+    path: str,
+    params: dict,
+    data: bytes,
+    content_type: str,
+    source_etag: str
+):
+    """Upload one rendered transform (blocking, call from a thread)"""
+    ensure_derivatives_bucket()
+    minio_client.put_object(
+        settings.DERIVATIVES_BUCKET,
+        derivative_object_name(bucket, path, params, source_etag),
+        io.BytesIO(data),
+        length=len(data),
+        content_type=content_type
+    )
+
+
+def store_derivatives(
+    bucket: str,
+    path: str,
+    variants: dict[str, dict],
+    rendered: dict[str, tuple[bytes, str]],
+    source_etag: str
+):
+    """
+    Upload rendered variants (blocking, call from a thread)
+
+    variants: variant name -> normalized params (see standard_variant_params)
+    rendered: variant name -> (bytes, content_type), see render_variants
+    """
+    for name, (data, content_type) in rendered.items():
+        store_derivative(bucket, path, variants[name], data, content_type, source_etag)
+
+
+def derivative_exists(bucket: str, path: str, params: dict, source_etag: str) -> bool:
+    """Whether a derivative is stored, without downloading it (blocking)"""
+    try:
+        minio_client.stat_object(settings.DERIVATIVES_BUCKET, derivative_object_name(bucket, path, params, source_etag))
+        return True
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchBucket"):
+            return False
+        raise
+
+
+def fetch_derivative(bucket: str, path: str, params: dict, source_etag: str) -> Optional[tuple[bytes, str]]:
+    """Stored derivative for normalized transform params, or None (blocking)"""
+    object_name = derivative_object_name(bucket, path, params, source_etag)
+    try:
+        response = minio_client.get_object(settings.DERIVATIVES_BUCKET, object_name)
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchBucket"):
+            return None
+        raise
+
+    try:
+        return response.read(), response.headers.get("Content-Type", "image/webp")
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def remove_derivatives(bucket: str, path: str):
+    """Delete all stored derivatives of a file (blocking, best effort)"""
+    try:
+        objects = minio_client.list_objects(
+            settings.DERIVATIVES_BUCKET, prefix=derivative_prefix(bucket, path), recursive=True
+        )
+        for obj in objects:
+            minio_client.remove_object(settings.DERIVATIVES_BUCKET, obj.object_name)
+    except Exception as e:
+        print(f"Could not remove derivatives of {bucket}/{path}: {e}")
+
+
+def remove_stale_derivatives(bucket: str, path: str, source_etag: str) -> int:
+    """
+    Delete the derivatives of older versions of a file (blocking, best effort)
+
+    Returns the number of removed objects. Only this file's own
+    {source_etag}/{cache_key} objects are considered, not those of files
+    whose object name extends this one.
+    """
+    prefix = derivative_prefix(bucket, path)
+    removed = 0
+    try:
+        objects = minio_client.list_objects(settings.DERIVATIVES_BUCKET, prefix=prefix, recursive=True)
+        for obj in objects:
+            etag, _, cache_key = obj.object_name[len(prefix):].partition("/")
+            if etag != source_etag and cache_key and "/" not in cache_key:
+                minio_client.remove_object(settings.DERIVATIVES_BUCKET, obj.object_name)
+                removed += 1
+    except Exception as e:
+        print(f"Could not remove stale derivatives of {bucket}/{path}: {e}")
+    return removed
@@ -0,0 +1,215 @@
+"""
+Executors for blocking work
+
+Pillow encode/decode runs in a process pool so a large image never blocks
+the event loop, origin reads run in a dedicated thread pool. Every pool sits
+behind a WorkQueue that bounds admission per uvicorn worker: when all slots
+and the waiting line are taken, callers get a 503 with Retry-After instead
+of piling up.
+
+Queues: image (uploads), transform (on-the-fly renders, same process pool),
+origin (MinIO reads for transforms). The image and transform queues split
+the process pool between them (queue_budget), so admitted work never waits
+inside the pool, where no 503 could reach it. The pools of all uvicorn
+workers together are sized to the host's cores (API_WORKERS).
+"""
+
+import asyncio
+import functools
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Callable, Optional
+from fastapi import HTTPException
+from config import settings
+from metrics import track_queue_depth, track_queue_wait, track_queue_rejected, track_executor_task
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_io_pool: Optional[ThreadPoolExecutor] = None
+
+# Set inside background jobs: work is never rejected and waits for a slot as
+# long as it takes, without counting against the waiting line of requests
+background_work: ContextVar[bool] = ContextVar("background_work", default=False)
+
+
+def image_worker_count() -> int:
+    """
+    Process pool size of this uvicorn worker
+
+    IMAGE_WORKERS, default: the cores divided between the API_WORKERS. At
+    least 2, so uploads and transforms get a process each.
+    """
+    workers = settings.IMAGE_WORKERS or (os.cpu_count() or 1) // max(1, settings.API_WORKERS)
+    return max(2, workers)
+
+
+def queue_budget() -> tuple[int, int]:
+    """
+    (image, transform) concurrency: the process pool split between the queues
+
+    TRANSFORM_CONCURRENCY processes (default: half of the pool) for
+    transforms, the rest for uploads, each at least one.
+    """
+    pool = image_worker_count()
+    transform = settings.TRANSFORM_CONCURRENCY or (pool + 1) // 2
+    transform = min(max(1, transform), pool - 1)
+    return pool - transform, transform
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Lazily start the image process pool of this uvicorn worker"""
+    global _process_pool
+    if _process_pool is None:
+        # spawn: children must not inherit the event loop, DB pool or threads
+        _process_pool = ProcessPoolExecutor(
+            max_workers=image_worker_count(),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+
+def get_io_pool() -> ThreadPoolExecutor:
+    """Threads for blocking origin reads (kept apart from Starlette's threadpool)"""
+    global _io_pool
+    if _io_pool is None:
+        _io_pool = ThreadPoolExecutor(max_workers=settings.ORIGIN_IO_WORKERS, thread_name_prefix="origin-io")
+    return _io_pool
+
+
+def shutdown_executors():
+    """Stop worker processes and I/O threads (called on application shutdown)"""
+    global _process_pool, _io_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+    if _io_pool is not None:
+        _io_pool.shutdown(wait=False, cancel_futures=True)
+        _io_pool = None
+
+
+class QueueSaturated(HTTPException):
+    """503 raised when a WorkQueue cannot admit more work"""
+
+    def __init__(self, queue_name: str, retry_after: int):
+        super().__init__(
+            503,
+            f"{queue_name} queue is saturated, retry later",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+class WorkQueue:
+    """
+    Bounded admission in front of an executor
+
+    At most `concurrency` tasks run at once, at most `max_waiting` requests
+    wait for a slot, and no request waits longer than `timeout` seconds.
+    Background work (see background_work) queues up without these limits.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_waiting: int, timeout: float, retry_after: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.waiting = 0
+        self.background_waiting = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def is_saturated(self) -> bool:
+        return self._semaphore.locked() and self.waiting >= self.max_waiting
+
+    def check_capacity(self):
+        """Fail fast before starting work that will need this queue"""
+        if self.is_saturated() and not background_work.get():
+            track_queue_rejected(self.name)
+            raise QueueSaturated(self.name, self.retry_after)
+
+    def _track_depth(self):
+        track_queue_depth(self.name, self.waiting + self.background_waiting)
+
+    async def _acquire_request(self):
+        self.waiting += 1
+        self._track_depth()
+        wait_start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            track_queue_rejected(self.name)
+            raise QueueSaturated(self.name, self.retry_after)
+        finally:
+            self.waiting -= 1
+            self._track_depth()
+        track_queue_wait(self.name, time.perf_counter() - wait_start)
+
+    async def _acquire_background(self):
+        self.background_waiting += 1
+        self._track_depth()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.background_waiting -= 1
+            self._track_depth()
+
+    async def run(self, task: str, executor: Executor, func: Callable, *args, **kwargs):
+        """Run func(*args, **kwargs) on executor once a slot is free"""
+        self.check_capacity()
+
+        if background_work.get():
+            await self._acquire_background()
+        else:
+            await self._acquire_request()
+
+        task_start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+        finally:
+            self._semaphore.release()
+            track_executor_task(task, time.perf_counter() - task_start)
+
+
+image_concurrency, transform_concurrency = queue_budget()
+
+image_queue = WorkQueue(
+    "image",
+    concurrency=image_concurrency,
+    max_waiting=settings.IMAGE_QUEUE_SIZE,
+    timeout=settings.IMAGE_QUEUE_TIMEOUT,
+    retry_after=settings.IMAGE_RETRY_AFTER
+)
+
+
+async def run_image_task(task: str, func: Callable, *args, **kwargs):
+    """Run a Pillow function from image_processing in the process pool"""
+    return await image_queue.run(task, get_process_pool(), func, *args, **kwargs)
+
+
+transform_queue = WorkQueue(
+    "transform",
+    concurrency=transform_concurrency,
+    max_waiting=settings.TRANSFORM_QUEUE_SIZE,
+    timeout=settings.TRANSFORM_QUEUE_TIMEOUT,
+    retry_after=settings.IMAGE_RETRY_AFTER
+)
+
+origin_queue = WorkQueue(
+    "origin",
+    concurrency=settings.ORIGIN_IO_WORKERS,
+    max_waiting=settings.TRANSFORM_QUEUE_SIZE,
+    timeout=settings.TRANSFORM_QUEUE_TIMEOUT,
+    retry_after=settings.IMAGE_RETRY_AFTER
+)
+
+
+async def run_transform_task(task: str, func: Callable, *args, **kwargs):
+    """Render an on-the-fly transform in the process pool (transform admission limit)"""
+    return await transform_queue.run(task, get_process_pool(), func, *args, **kwargs)
+
+
+async def run_io_task(task: str, func: Callable, *args, **kwargs):
+    """Run a blocking origin read in the I/O thread pool"""
+    return await origin_queue.run(task, get_io_pool(), func, *args, **kwargs)
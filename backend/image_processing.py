@@ -0,0 +1,627 @@
+"""
+Image processing for uploads and transforms
+
+Pure Pillow functions with no database or storage access, so they can run
+inside the image process pool (see executors.py).
+"""
+
+from fastapi import HTTPException
+from PIL import Image, ImageOps, features
+from collections import OrderedDict
+from typing import Optional
+import io
+
+# WebP encoder profiles: Pillow save options per name.
+# `method` is the encoder effort (0 = fastest, 6 = smallest output).
+# Compare them on real images with benchmark_encoders.py.
+WEBP_PROFILES = {
+    "fast": {"method": 1},
+    "balanced": {"method": 4},
+    "max": {"method": 6}
+}
+
+# AVIF encoder profiles (same names): `speed` 0 = slowest/smallest, 10 = fastest.
+# Only offered if Pillow was built with AVIF support (wheels since 11.3).
+AVIF_PROFILES = {
+    "fast": {"speed": 8},
+    "balanced": {"speed": 6},
+    "max": {"speed": 4}
+}
+AVIF_SUPPORTED = features.check("avif")
+AUTO_FORMATS = (["avif"] if AVIF_SUPPORTED else []) + ["webp", "jpg"]  # format=auto candidates
+
+
+# Shrink-on-load: pre-scale (JPEG DCT scaling / Image.reduce) only down to
+# REDUCING_GAP times the final size, the last step is always LANCZOS.
+REDUCING_GAP = 2.0
+REDUCE_MODES = {"L", "LA", "RGB", "RGBA", "CMYK", "I", "F"}
+
+
+# Watermark overlays per process (see get_watermark_overlay)
+OVERLAY_CACHE_SIZE = 32
+OVERLAY_WIDTH_STEP = 16
+_overlay_cache: OrderedDict = OrderedDict()
+
+
+def webp_options(profile: str) -> dict:
+    """Pillow save options of a WebP profile (unknown names fall back to max)"""
+    return WEBP_PROFILES.get(profile, WEBP_PROFILES["max"])
+
+
+def avif_options(profile: str) -> dict:
+    """Pillow save options of an AVIF profile (unknown names fall back to max)"""
+    return AVIF_PROFILES.get(profile, AVIF_PROFILES["max"])
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """
+    Output format for format=auto from the Accept header
+
+    AVIF (if supported here), then WebP, then JPEG. Must match the
+    $transform_accept map in the nginx config, which keys the cache on it.
+    """
+    accept = (accept or "").lower()
+    if AVIF_SUPPORTED and "image/avif" in accept:
+        return "avif"
+    if "image/webp" in accept:
+        return "webp"
+    return "jpg"
+
+
+def opacity_lut(opacity: int) -> list[int]:
+    """Lookup table scaling an alpha channel to opacity percent"""
+    return [int(p * (opacity / 100)) for p in range(256)]
+
+
+def build_watermark_overlay(watermark_data: bytes, max_width: int, opacity: int) -> Image.Image:
+    """Decode the logo, shrink it to max_width and bake in the opacity"""
+    watermark = Image.open(io.BytesIO(watermark_data)).convert('RGBA')
+    
+    if watermark.width > max_width:
+        ratio = max_width / watermark.width
+        new_size = (max_width, max(1, int(watermark.height * ratio)))
+        watermark = watermark.resize(new_size, Image.Resampling.LANCZOS)
+    
+    watermark.putalpha(watermark.getchannel('A').point(opacity_lut(opacity)))
+    return watermark
+
+
+def get_watermark_overlay(
+    watermark_data: bytes,
+    max_width: int,
+    opacity: int,
+    version: Optional[str] = None
+) -> Image.Image:
+    """
+    Ready-to-composite overlay, cached per process when a config version is given
+    
+    The width is rounded to OVERLAY_WIDTH_STEP so images of similar size share
+    one overlay. A config change means a new version (watermark_version), so
+    stale overlays are never hit and drop out of the LRU - no explicit clear,
+    which could not reach the image pool processes anyway.
+    """
+    if version is None:
+        return build_watermark_overlay(watermark_data, max_width, opacity)
+    
+    width_bucket = max(OVERLAY_WIDTH_STEP, round(max_width / OVERLAY_WIDTH_STEP) * OVERLAY_WIDTH_STEP)
+    key = (version, width_bucket, opacity)
+    
+    overlay = _overlay_cache.get(key)
+    if overlay is None:
+        overlay = build_watermark_overlay(watermark_data, width_bucket, opacity)
+        _overlay_cache[key] = overlay
+        if len(_overlay_cache) > OVERLAY_CACHE_SIZE:
+            _overlay_cache.popitem(last=False)
+    else:
+        _overlay_cache.move_to_end(key)
+    
+    return overlay
+
+
+def composite_watermark(
+    base_image: Image.Image,
+    watermark_data: bytes,
+    position: str = "bottom-right",
+    opacity: int = 70,
+    scale_percent: int = 20,
+    padding: int = 10,
+    version: Optional[str] = None
+) -> Image.Image:
+    """
+    Composite a watermark (database blob) onto a decoded image
+    
+    version: watermark config version, enables the overlay cache
+    Returns an RGBA image, the caller decides about the output mode.
+    """
+    if base_image.mode != 'RGBA':
+        base_image = base_image.convert('RGBA')
+    
+    watermark = get_watermark_overlay(
+        watermark_data, int(base_image.width * (scale_percent / 100)), opacity, version
+    )
+    
+    # Calculate position
+    wm_width, wm_height = watermark.size
+    base_width, base_height = base_image.size
+    
+    if position == "top-left":
+        pos = (padding, padding)
+    elif position == "top-right":
+        pos = (base_width - wm_width - padding, padding)
+    elif position == "bottom-left":
+        pos = (padding, base_height - wm_height - padding)
+    elif position == "bottom-right":
+        pos = (base_width - wm_width - padding, base_height - wm_height - padding)
+    elif position == "center":
+        pos = ((base_width - wm_width) // 2, (base_height - wm_height) // 2)
+    else:
+        pos = (base_width - wm_width - padding, base_height - wm_height - padding)
+    
+    # Composite the overlay in place
+    base_image.alpha_composite(watermark, dest=(max(0, pos[0]), max(0, pos[1])))
+    return base_image
+
+
+class ImagePipeline:
+    """
+    Decode once, apply operations in order, encode once to WebP
+    
+    Operations are stored as (name, kwargs) so a pipeline built in the API
+    process pickles cleanly into the image process pool:
+    
+        pipeline = ImagePipeline().orient().watermark(logo, position="center")
+        webp, width, height = await run_image_task("upload_pipeline", pipeline.run, data)
+    """
+    
+    def __init__(self):
+        self.operations: list[tuple[str, dict]] = []
+    
+    def orient(self) -> "ImagePipeline":
+        """Rotate/flip according to the EXIF orientation tag"""
+        self.operations.append(("orient", {}))
+        return self
+    
+    def watermark(
+        self,
+        watermark_data: bytes,
+        position: str = "bottom-right",
+        opacity: int = 70,
+        scale_percent: int = 20,
+        padding: int = 10,
+        version: Optional[str] = None
+    ) -> "ImagePipeline":
+        """Composite the watermark (see composite_watermark)"""
+        self.operations.append(("watermark", {
+            "watermark_data": watermark_data,
+            "position": position,
+            "opacity": opacity,
+            "scale_percent": scale_percent,
+            "padding": padding,
+            "version": version
+        }))
+        return self
+    
+    def resize(self, width: Optional[int] = None, height: Optional[int] = None, fit: str = "contain") -> "ImagePipeline":
+        """Resize (see apply_resize)"""
+        self.operations.append(("resize", {"width": width, "height": height, "fit": fit}))
+        return self
+    
+    def has(self, name: str) -> bool:
+        return any(op == name for op, _ in self.operations)
+    
+    def without(self, name: str) -> "ImagePipeline":
+        """Copy of this pipeline with all `name` operations removed"""
+        pipeline = ImagePipeline()
+        pipeline.operations = [(op, kwargs) for op, kwargs in self.operations if op != name]
+        return pipeline
+    
+    def run(self, image_data: bytes, quality: int = 85, profile: str = "max") -> tuple[bytes, int, int]:
+        """
+        Process an encoded image
+        Returns: (webp_content, width, height)
+        """
+        try:
+            img = self.process(image_data)
+            return encode_webp(img, quality, profile), img.width, img.height
+        except Exception as e:
+            raise HTTPException(500, f"Image processing failed: {str(e)}")
+    
+    def run_with_variants(
+        self,
+        image_data: bytes,
+        variants: dict[str, dict],
+        quality: int = 85,
+        profile: str = "max"
+    ) -> tuple[bytes, int, int, Optional[dict[str, tuple[bytes, str]]]]:
+        """
+        Process an encoded image and render variants from the processed pixels
+        
+        The variants are rendered from this decode (see render_image_variants),
+        sized like /api/transform renders of the stored WebP. Variants are
+        optional: if they fail, the result is None.
+        Returns: (webp_content, width, height, name -> (bytes, content_type))
+        """
+        try:
+            img = self.process(image_data)
+            webp = encode_webp(img, quality, profile)
+        except Exception as e:
+            raise HTTPException(500, f"Image processing failed: {str(e)}")
+        
+        try:
+            rendered = render_image_variants(img, "WEBP", variants)
+        except Exception as e:
+            print(f"Variant rendering failed: {e}")
+            rendered = None
+        return webp, img.width, img.height, rendered
+    
+    def process(self, image_data: bytes) -> Image.Image:
+        """Decode and apply the operations, returns the image that gets encoded"""
+        img = Image.open(io.BytesIO(image_data))
+        has_alpha = img.mode in ('RGBA', 'LA', 'P')
+        
+        for op, kwargs in self.operations:
+            if op == "orient":
+                img = ImageOps.exif_transpose(img)
+            elif op == "watermark":
+                img = composite_watermark(img, **kwargs)
+            elif op == "resize":
+                img = apply_resize(img, kwargs["width"], kwargs["height"], kwargs["fit"])
+            else:
+                raise ValueError(f"Unknown pipeline operation: {op}")
+        
+        if not has_alpha and img.mode != 'RGB':
+            img = img.convert('RGB')
+        img.load()
+        return img
+
+
+def encode_webp(img: Image.Image, quality: int = 85, profile: str = "max") -> bytes:
+    output = io.BytesIO()
+    img.save(output, format='WEBP', quality=quality, **webp_options(profile))
+    return output.getvalue()
+
+
+def transform_image(
+    image_data: bytes,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    format: Optional[str] = None,
+    quality: int = 85,
+    fit: str = "contain",
+    crop: Optional[str] = None,
+    profile: str = "max"
+) -> tuple[bytes, str]:
+    """
+    Transform image with various operations
+    
+    Args:
+        image_data: Original image bytes
+        width: Target width (optional)
+        height: Target height (optional)
+        format: Output format (webp, jpg, png, optional)
+        quality: Quality for lossy formats (1-100)
+        fit: Resize mode - contain, cover, fill, or inside
+        crop: Crop mode - top, bottom, left, right, center, entropy, attention
+        profile: WebP encoder profile - fast, balanced or max
+        
+    Returns:
+        (transformed_bytes, content_type)
+    """
+    try:
+        img = Image.open(io.BytesIO(image_data))
+        original_format = img.format
+        source_size = img.size
+        img = shrink_on_load(img, prescale_factor(source_size, width, height, fit, crop))
+        return render_transform(
+            img, original_format, width, height, format, quality, fit, crop, profile, source_size
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Image transformation failed: {str(e)}")
+
+
+def render_transform(
+    img: Image.Image,
+    original_format: Optional[str],
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    format: Optional[str] = None,
+    quality: int = 85,
+    fit: str = "contain",
+    crop: Optional[str] = None,
+    profile: str = "max",
+    source_size: Optional[tuple[int, int]] = None
+) -> tuple[bytes, str]:
+    """
+    Transform an already decoded image (see transform_image for the options)
+    
+    img is not modified, so one decoded image can feed several renders.
+    source_size: size of the source before shrink-on-load (default img.size)
+    """
+    try:
+        resize_from = cropped_size(source_size or img.size, crop)
+        img = img.copy()
+        
+        # Handle transparency
+        if img.mode in ('RGBA', 'LA', 'P'):
+            if format and format.lower() in ('jpg', 'jpeg'):
+                # Convert RGBA to RGB with white background for JPEG
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                if img.mode == 'P':
+                    img = img.convert('RGBA')
+                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+                img = background
+        elif img.mode != 'RGB' and (not format or format.lower() not in ('png', 'webp', 'avif')):
+            img = img.convert('RGB')
+        
+        # Crop if specified
+        if crop:
+            img = apply_crop(img, crop)
+        
+        # Resize if width or height specified
+        if width or height:
+            img = apply_resize(img, width, height, fit, resize_from)
+        
+        # Determine output format
+        output_format = format.upper() if format else (original_format or 'WEBP')
+        if output_format == 'JPG':
+            output_format = 'JPEG'
+        
+        # Validate format
+        valid_formats = ['WEBP', 'JPEG', 'PNG', 'GIF'] + (['AVIF'] if AVIF_SUPPORTED else [])
+        if output_format not in valid_formats:
+            output_format = 'WEBP'
+        
+        # Save with specified format and quality
+        output = io.BytesIO()
+        save_params = {'format': output_format}
+        
+        if output_format in ('JPEG', 'WEBP', 'AVIF'):
+            save_params['quality'] = max(1, min(100, quality))
+            if output_format == 'WEBP':
+                save_params.update(webp_options(profile))
+            elif output_format == 'AVIF':
+                save_params.update(avif_options(profile))
+        elif output_format == 'PNG':
+            save_params['optimize'] = True
+        
+        img.save(output, **save_params)
+        transformed_data = output.getvalue()
+        
+        # Determine content type
+        content_type_map = {
+            'WEBP': 'image/webp',
+            'JPEG': 'image/jpeg',
+            'PNG': 'image/png',
+            'GIF': 'image/gif',
+            'AVIF': 'image/avif'
+        }
+        content_type = content_type_map.get(output_format, 'image/webp')
+        
+        return transformed_data, content_type
+        
+    except Exception as e:
+        raise HTTPException(500, f"Image transformation failed: {str(e)}")
+
+
+def render_variants(image_data: bytes, variants: dict[str, dict]) -> dict[str, tuple[bytes, str]]:
+    """
+    Render several transforms from a single decode
+
+    The source is pre-scaled on load only as far as the largest variant
+    allows, then rendered by render_image_variants.
+
+    variants: name -> transform params (w, h, format, quality, fit, crop, profile)
+    Returns: name -> (bytes, content_type)
+    """
+    img = Image.open(io.BytesIO(image_data))
+    original_format = img.format
+    source_size = img.size
+    factor = min((variant_prescale_factor(source_size, params) for params in variants.values()), default=1)
+    img = shrink_on_load(img, factor)
+    return render_image_variants(img, original_format, variants, source_size)
+
+
+def render_image_variants(
+    img: Image.Image,
+    original_format: Optional[str],
+    variants: dict[str, dict],
+    source_size: Optional[tuple[int, int]] = None
+) -> dict[str, tuple[bytes, str]]:
+    """
+    Render several transforms of a decoded image
+
+    Outputs are rendered largest first, each one from the nearest larger
+    intermediate: the image is shrunk step by step (never below REDUCING_GAP
+    times the next output), so small outputs do not resample the full image.
+    Output sizes are computed from source_size (the size before any
+    pre-scaling, default img.size), like transform_image does.
+    """
+    source_size = source_size or img.size
+    img.load()
+    factors = {name: variant_prescale_factor(source_size, params) for name, params in variants.items()}
+
+    rendered = {}
+    for name in sorted(variants, key=lambda n: factors[n]):
+        params = variants[name]
+        # Shrink the intermediate further if this output is much smaller
+        step = factors[name] * img.width / source_size[0]
+        if step >= 2 and img.mode in REDUCE_MODES:
+            img = img.reduce(int(step))
+        rendered[name] = render_transform(
+            img,
+            original_format,
+            width=params.get("w"),
+            height=params.get("h"),
+            format=params.get("format"),
+            quality=params.get("quality", 85),
+            fit=params.get("fit", "contain"),
+            crop=params.get("crop"),
+            profile=params.get("profile") or "max",
+            source_size=source_size
+        )
+
+    return {name: rendered[name] for name in variants}
+
+
+def variant_prescale_factor(size: tuple[int, int], params: dict) -> float:
+    return prescale_factor(size, params.get("w"), params.get("h"), params.get("fit", "contain"), params.get("crop"))
+
+
+def cropped_size(size: tuple[int, int], crop_mode: Optional[str]) -> tuple[int, int]:
+    """Image size after apply_crop"""
+    width, height = size
+    if crop_mode in ("center", "entropy"):
+        return min(width, height), min(width, height)
+    if crop_mode in ("top", "bottom"):
+        return width, min(width, height)
+    if crop_mode in ("left", "right"):
+        return min(width, height), height
+    return width, height
+
+
+def prescale_factor(
+    size: tuple[int, int],
+    width: Optional[int],
+    height: Optional[int],
+    fit: str = "contain",
+    crop: Optional[str] = None
+) -> float:
+    """
+    How far the source may be shrunk before the final resize
+
+    Returns the source/target ratio divided by REDUCING_GAP (1 = no pre-scaling).
+    Crops only drop pixels, so the ratio is taken on the cropped size.
+    """
+    if not width and not height:
+        return 1
+    crop_width, crop_height = cropped_size(size, crop)
+    scales = []
+    if width:
+        scales.append(width / crop_width)
+    if height:
+        scales.append(height / crop_height)
+    
+    if fit in ("cover", "fill"):
+        scale = max(scales)  # Both target dimensions must be covered
+    else:
+        scale = min(scales)
+    
+    return max(1, 1 / (scale * REDUCING_GAP))
+
+
+def shrink_on_load(img: Image.Image, factor: float) -> Image.Image:
+    """
+    Decode a smaller version of a freshly opened image
+
+    JPEG: DCT-domain scaling via draft (1/2, 1/4, 1/8), the full-size pixels
+    are never decoded. Other formats: decode, then Image.reduce (box filter,
+    much cheaper than LANCZOS over the full image).
+    """
+    if factor < 2:
+        return img
+    
+    target = (max(1, int(img.width / factor)), max(1, int(img.height / factor)))
+    if img.format == "JPEG":
+        img.draft(img.mode, target)  # Picks the largest scale still >= target
+        return img
+    
+    if img.mode not in REDUCE_MODES:
+        return img
+    img.load()
+    return img.reduce(int(factor))
+
+
+def apply_crop(img: Image.Image, crop_mode: str) -> Image.Image:
+    """Apply cropping to image"""
+    width, height = img.size
+    
+    if crop_mode == "center":
+        # Center crop to square
+        size = min(width, height)
+        left = (width - size) // 2
+        top = (height - size) // 2
+        return img.crop((left, top, left + size, top + size))
+    
+    elif crop_mode == "entropy":
+        # Crop to most interesting part (high entropy area)
+        return ImageOps.fit(img, (min(width, height), min(width, height)), method=Image.Resampling.LANCZOS, centering=(0.5, 0.5))
+    
+    elif crop_mode in ("top", "bottom", "left", "right"):
+        # Directional crop
+        size = min(width, height)
+        if crop_mode == "top":
+            return img.crop((0, 0, width, size))
+        elif crop_mode == "bottom":
+            return img.crop((0, height - size, width, height))
+        elif crop_mode == "left":
+            return img.crop((0, 0, size, height))
+        elif crop_mode == "right":
+            return img.crop((width - size, 0, width, height))
+    
+    return img
+
+
+def target_size(
+    size: tuple[int, int],
+    width: Optional[int],
+    height: Optional[int],
+    fit: str = "contain"
+) -> Optional[tuple[int, int]]:
+    """
+    Output size of a resize, None if there is nothing to resize
+
+    size is the (cropped) source size before any pre-scaling, so the result
+    does not depend on how far the source was shrunk on load. A requested
+    side is kept exactly, a derived side is rounded to nearest. contain and
+    inside never enlarge the image.
+    """
+    if not width and not height:
+        return None
+    source_width, source_height = size
+    
+    if fit in ("cover", "fill"):
+        if width and height:
+            return width, height
+        if width:
+            return width, max(1, round(source_height * width / source_width))
+        return max(1, round(source_width * height / source_height)), height
+    
+    # contain, inside: fit within the requested box, preserve aspect ratio
+    scales = []
+    if width:
+        scales.append((width / source_width, "w"))
+    if height:
+        scales.append((height / source_height, "h"))
+    scale, side = min(scales)
+    if scale >= 1:
+        return source_width, source_height
+    if side == "w":
+        return width, max(1, round(source_height * scale))
+    return max(1, round(source_width * scale)), height
+
+
+def apply_resize(
+    img: Image.Image,
+    width: Optional[int],
+    height: Optional[int],
+    fit: str,
+    source_size: Optional[tuple[int, int]] = None
+) -> Image.Image:
+    """
+    Apply resizing to image
+    
+    source_size: (cropped) size before shrink-on-load, the output size is
+    computed from it (default: img.size)
+    """
+    size = target_size(source_size or img.size, width, height, fit)
+    if size is None or size == img.size:
+        return img
+    
+    if fit == "cover":
+        # Resize to cover bounds (preserve aspect ratio, crop excess)
+        return ImageOps.fit(img, size, method=Image.Resampling.LANCZOS)
+    
+    # contain/inside: size already preserves the aspect ratio, fill may distort
+    return img.resize(size, Image.Resampling.LANCZOS)
@@ -0,0 +1,165 @@
+"""
+Streaming ingest helpers
+
+Files that skip image processing (videos) are piped from the request spool
+straight into MinIO in fixed-size parts. Size and SHA-256 are collected while
+MinIO reads the stream, so memory per upload stays at about one part no
+matter how large the file is.
+"""
+
+import hashlib
+import tempfile
+from datetime import datetime
+from typing import BinaryIO, Optional
+from config import settings
+from services import minio_client
+
+
+class UploadTooLarge(Exception):
+    """Raised while streaming when a file exceeds MAX_UPLOAD_SIZE"""
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """Detect the container type from the first bytes of a file"""
+    if head[4:8] == b"ftyp":
+        return "video/quicktime" if head[8:12] == b"qt  " else "video/mp4"
+    if head[4:8] in (b"moov", b"mdat", b"wide", b"free", b"skip"):
+        return "video/quicktime"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video/webm" if b"webm" in head else "video/x-matroska"
+    if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+        return "video/x-msvideo"
+    if head[:3] == b"FLV":
+        return "video/x-flv"
+    return None
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Detect the image format from the first bytes of a file"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    text = head.lstrip()[:256].lower()
+    if text.startswith(b"<svg") or (text.startswith(b"<?xml") and b"<svg" in head.lower()):
+        return "image/svg+xml"
+    return None
+
+
+def read_object_head(bucket: str, object_name: str, size: int = 64 * 1024) -> bytes:
+    """First bytes of a stored object (blocking)"""
+    response = minio_client.get_object(bucket, object_name, offset=0, length=size)
+    try:
+        return response.read()
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def object_version(bucket: str, object_name: str) -> tuple[str, Optional[datetime]]:
+    """ETag and last modification time of a stored object (blocking, raises S3Error if it does not exist)"""
+    stat = minio_client.stat_object(bucket, object_name)
+    return stat.etag, stat.last_modified
+
+
+def read_object(bucket: str, object_name: str) -> bytes:
+    """Whole stored object (blocking)"""
+    response = minio_client.get_object(bucket, object_name)
+    try:
+        return response.read()
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def peek_head(fileobj: BinaryIO, size: int = 64) -> bytes:
+    """Read the first bytes of a seekable file and rewind it"""
+    fileobj.seek(0)
+    head = fileobj.read(size)
+    fileobj.seek(0)
+    return head
+
+
+def file_sha256(fileobj: BinaryIO, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a seekable file, read in chunks and rewound (blocking)"""
+    sha256 = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        sha256.update(chunk)
+    fileobj.seek(0)
+    return sha256.hexdigest()
+
+
+class HashingReader:
+    """
+    File-like wrapper handed to minio put_object
+
+    Every chunk MinIO pulls is counted and fed into SHA-256, and the upload
+    is aborted as soon as it grows past max_size.
+    """
+
+    def __init__(self, fileobj: BinaryIO, max_size: int = settings.MAX_UPLOAD_SIZE):
+        self._fileobj = fileobj
+        self._sha256 = hashlib.sha256()
+        self.max_size = max_size
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._fileobj.read(size)
+        if chunk:
+            self.size += len(chunk)
+            if self.size > self.max_size:
+                raise UploadTooLarge(f"File too large. Max: {self.max_size} bytes")
+            self._sha256.update(chunk)
+        return chunk
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+
+def stream_to_minio(
+    bucket: str,
+    object_name: str,
+    fileobj: BinaryIO,
+    content_type: str
+) -> HashingReader:
+    """
+    Stream a file into MinIO as a multipart upload of UPLOAD_PART_SIZE parts
+
+    Blocking - call it from a thread (run_in_threadpool). Returns the reader
+    so the caller can pick up size and sha256.
+    """
+    reader = HashingReader(fileobj)
+    minio_client.put_object(
+        bucket,
+        object_name,
+        reader,
+        length=-1,
+        content_type=content_type,
+        part_size=settings.UPLOAD_PART_SIZE,
+        num_parallel_uploads=1
+    )
+    return reader
+
+
+def download_to_spool(bucket: str, object_name: str) -> tempfile.SpooledTemporaryFile:
+    """
+    Copy a MinIO object into a spooled temp file (RAM up to one part, then disk)
+
+    Blocking - call it from a thread. The returned file is rewound.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.UPLOAD_PART_SIZE)
+    response = minio_client.get_object(bucket, object_name)
+    try:
+        for chunk in response.stream(1024 * 1024):
+            spool.write(chunk)
+    finally:
+        response.close()
+        response.release_conn()
+    spool.seek(0)
+    return spool
@@ -0,0 +1,171 @@
+"""
+Background job queue
+
+Job state lives in the background_jobs table, the queue itself is a Redis
+list per job kind. Every API worker runs consumers for the registered kinds,
+so bursts (e.g. async uploads from PayloadCMS) are absorbed by the queue and
+drained at a fixed concurrency.
+"""
+
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import BackgroundJob
+from services import redis_client
+from config import settings
+from executors import background_work
+
+# handler(job_id, params) -> result dict (stored as JSON on the job)
+JobHandler = Callable[[str, dict], Awaitable[dict]]
+
+_handlers: dict[str, tuple[JobHandler, int]] = {}
+
+
+def queue_key(kind: str) -> str:
+    return f"cdn:jobs:{kind}"
+
+
+def register_job_handler(kind: str, handler: JobHandler, concurrency: int = 1):
+    """Register the coroutine that processes jobs of a kind"""
+    _handlers[kind] = (handler, concurrency)
+
+
+def create_job(db: Session, kind: str, params: dict, total_items: int, created_by: Optional[str] = None) -> BackgroundJob:
+    """Persist a new job and push it onto the queue"""
+    job = BackgroundJob(
+        id=uuid.uuid4().hex,
+        kind=kind,
+        status="queued",
+        params=json.dumps(params),
+        total_items=total_items,
+        processed_items=0,
+        created_by=created_by,
+        created_at=datetime.now()
+    )
+    db.add(job)
+    db.commit()
+
+    redis_client.lpush(queue_key(kind), job.id)
+    return job
+
+
+def increment_progress(job_id: str, count: int = 1):
+    """Count processed items of a running job"""
+    db = SessionLocal()
+    try:
+        db.query(BackgroundJob).filter(BackgroundJob.id == job_id).update(
+            {"processed_items": BackgroundJob.processed_items + count, "updated_at": datetime.now()},
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def job_status(job: BackgroundJob) -> dict:
+    """Public view of a job"""
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "total": job.total_items,
+        "processed": job.processed_items,
+        "progress": round(job.processed_items / job.total_items * 100, 1) if job.total_items else None,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error_message,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None
+    }
+
+
+async def run_job(kind: str, job_id: str):
+    """Claim a queued job and run its handler"""
+    handler, _ = _handlers[kind]
+
+    db = SessionLocal()
+    try:
+        # Atomic claim - duplicates in the queue are harmless
+        claimed = db.query(BackgroundJob).filter(
+            BackgroundJob.id == job_id,
+            BackgroundJob.status == "queued"
+        ).update({"status": "processing", "started_at": datetime.now()}, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            return
+
+        job = db.get(BackgroundJob, job_id)
+        token = background_work.set(True)
+        try:
+            result = await handler(job_id, json.loads(job.params or "{}"))
+            job.status = "completed"
+            job.result = json.dumps(result, default=str)
+        except Exception as e:
+            print(f"❌ Job {job_id} ({kind}) failed: {e}")
+            db.rollback()
+            job = db.get(BackgroundJob, job_id)
+            job.status = "failed"
+            job.error_message = str(e)
+        finally:
+            background_work.reset(token)
+
+        job.completed_at = datetime.now()
+        db.commit()
+    finally:
+        db.close()
+
+
+async def consume_jobs(kind: str):
+    """Worker loop: block on the Redis list and run jobs one at a time"""
+    while True:
+        try:
+            item = await asyncio.to_thread(redis_client.brpop, queue_key(kind), settings.JOB_POLL_TIMEOUT)
+            if item:
+                await run_job(kind, item[1])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Job worker '{kind}' error: {e}")
+            await asyncio.sleep(5)
+
+
+def requeue_stale_jobs():
+    """
+    Re-queue jobs lost by a restart: queued jobs (Redis may have lost them)
+    and processing jobs without progress for JOB_STALE_AFTER_MINUTES
+    """
+    db = SessionLocal()
+    try:
+        stale_before = datetime.now() - timedelta(minutes=settings.JOB_STALE_AFTER_MINUTES)
+        db.query(BackgroundJob).filter(
+            BackgroundJob.status == "processing",
+            or_(
+                BackgroundJob.updated_at < stale_before,
+                (BackgroundJob.updated_at == None) & (BackgroundJob.started_at < stale_before)
+            )
+        ).update({"status": "queued"}, synchronize_session=False)
+        db.commit()
+
+        for job in db.query(BackgroundJob).filter(BackgroundJob.status == "queued").all():
+            if job.kind in _handlers:
+                redis_client.lpush(queue_key(job.kind), job.id)
+    except Exception as e:
+        print(f"Could not re-queue jobs: {e}")
+    finally:
+        db.close()
+
+
+def start_job_workers() -> list[asyncio.Task]:
+    """Start consumers for all registered job kinds (called on startup)"""
+    requeue_stale_jobs()
+
+    tasks = []
+    for kind, (_, concurrency) in _handlers.items():
+        for _ in range(concurrency):
+            tasks.append(asyncio.create_task(consume_jobs(kind)))
+    return tasks
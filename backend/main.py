@@ -7,8 +7,10 @@ import asyncio
 from config import settings
 from database import engine, Base, SessionLocal
 from models import UploadedFile
-from routers import upload_v2 as upload, cache, stats, admin, purge, auth, transform, tracking, settings as settings_router, update as update_router
+from routers import upload_v2 as upload, upload_sessions, cache, stats, admin, purge, auth, transform, tracking, settings as settings_router, update as update_router
 from metrics import PrometheusMiddleware, metrics_endpoint, update_file_counts
+from executors import shutdown_executors
+from jobs import start_job_workers
 from sqlalchemy import func
 
 
@@ -57,6 +59,10 @@ async def lifespan(app: FastAPI):
     metrics_task = asyncio.create_task(update_metrics_task())
     print("Metrics update task started")
 
+    # Start background job consumers (async uploads)
+    job_tasks = start_job_workers()
+    print(f"{len(job_tasks)} job workers started")
+
     yield
 
     # Shutdown
@@ -65,6 +71,10 @@ async def lifespan(app: FastAPI):
         await metrics_task
     except asyncio.CancelledError:
         pass
+    for task in job_tasks:
+        task.cancel()
+    await asyncio.gather(*job_tasks, return_exceptions=True)
+    shutdown_executors()
     print("Shutting down CDN Backend API...")
 
 
@@ -118,6 +128,7 @@ async def global_exception_handler(request: Request, exc: Exception):
 # Routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(upload.router, prefix="/api", tags=["Upload"])
+app.include_router(upload_sessions.router, prefix="/api", tags=["Upload"])
 app.include_router(transform.router, prefix="/api", tags=["Image Transform"])
 app.include_router(cache.router, prefix="/api/cache", tags=["Cache Management"])
 app.include_router(purge.router, prefix="/api", tags=["Cache Purge"])
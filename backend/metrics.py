@@ -131,6 +131,33 @@ WATERMARK_OPERATIONS = Counter(
     ['status']  # applied, failed, skipped
 )
 
+# === Executor Metrics ===
+EXECUTOR_QUEUE_DEPTH = Gauge(
+    'cdn_executor_queue_depth',
+    'Tasks waiting for an executor slot',
+    ['queue']  # image, transform, origin
+)
+
+EXECUTOR_QUEUE_WAIT = Histogram(
+    'cdn_executor_queue_wait_seconds',
+    'Time spent waiting for an executor slot',
+    ['queue'],
+    buckets=[0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+)
+
+EXECUTOR_REJECTED = Counter(
+    'cdn_executor_rejected_total',
+    'Tasks rejected because the queue was saturated',
+    ['queue']
+)
+
+EXECUTOR_TASK_DURATION = Histogram(
+    'cdn_executor_task_duration_seconds',
+    'Executor task run time',
+    ['task'],  # upload_pipeline, transform, origin_fetch, ...
+    buckets=[0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+)
+
 
 class PrometheusMiddleware(BaseHTTPMiddleware):
     """
@@ -235,3 +262,19 @@ def update_file_counts(image_count: int, video_count: int, image_size: int, vide
     FILES_TOTAL.labels(file_type='video').set(video_count)
     FILES_SIZE_TOTAL.labels(file_type='image').set(image_size)
     FILES_SIZE_TOTAL.labels(file_type='video').set(video_size)
+
+def track_queue_depth(queue: str, depth: int):
+    """Update number of tasks waiting in an executor queue"""
+    EXECUTOR_QUEUE_DEPTH.labels(queue=queue).set(depth)
+
+def track_queue_wait(queue: str, duration: float):
+    """Track time a task waited for an executor slot"""
+    EXECUTOR_QUEUE_WAIT.labels(queue=queue).observe(duration)
+
+def track_queue_rejected(queue: str):
+    """Track task rejected by a saturated queue"""
+    EXECUTOR_REJECTED.labels(queue=queue).inc()
+
+def track_executor_task(task: str, duration: float):
+    """Track executor task run time"""
+    EXECUTOR_TASK_DURATION.labels(task=task).observe(duration)
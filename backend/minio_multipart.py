@@ -0,0 +1,72 @@
+"""
+MinIO multipart upload primitives for resumable upload sessions
+
+minio-py only exposes multipart uploads through private methods
+(_create_multipart_upload, _upload_part, ...). All calls go through this
+module, and the expected signatures are checked at import, so a minio
+upgrade that changes them fails at startup instead of mid-upload.
+The version is pinned in requirements.txt.
+
+All functions are blocking - call them from a thread.
+"""
+
+import inspect
+from minio import Minio
+from minio.datatypes import Part
+from services import minio_client
+
+# Private Minio method -> leading parameters this module relies on
+REQUIRED_METHODS = {
+    "_create_multipart_upload": ["bucket_name", "object_name", "headers"],
+    "_upload_part": ["bucket_name", "object_name", "data", "headers", "upload_id", "part_number"],
+    "_list_parts": ["bucket_name", "object_name", "upload_id", "max_parts", "part_number_marker"],
+    "_complete_multipart_upload": ["bucket_name", "object_name", "upload_id", "parts"],
+    "_abort_multipart_upload": ["bucket_name", "object_name", "upload_id"]
+}
+
+
+def check_minio_api():
+    """Raise RuntimeError if the installed minio lacks a method or changed its parameters"""
+    for name, expected in REQUIRED_METHODS.items():
+        method = getattr(Minio, name, None)
+        if method is None:
+            raise RuntimeError(f"minio {name} is missing - check the version pinned in requirements.txt")
+        params = list(inspect.signature(method).parameters)[1:len(expected) + 1]
+        if params != expected:
+            raise RuntimeError(f"minio {name} has parameters {params}, expected {expected}")
+
+
+check_minio_api()
+
+
+def create_multipart_upload(bucket: str, object_name: str, content_type: str) -> str:
+    """Start a multipart upload, returns its upload id"""
+    return minio_client._create_multipart_upload(bucket, object_name, {"Content-Type": content_type})
+
+
+def upload_part(bucket: str, object_name: str, upload_id: str, part_number: int, data: bytes) -> str:
+    """Store (or overwrite) one part, returns its ETag"""
+    return minio_client._upload_part(bucket, object_name, data, None, upload_id, part_number)
+
+
+def list_parts(bucket: str, object_name: str, upload_id: str) -> list[Part]:
+    """All stored parts of an upload (follows pagination)"""
+    parts = []
+    marker = None
+    while True:
+        result = minio_client._list_parts(bucket, object_name, upload_id, part_number_marker=marker)
+        parts.extend(result.parts)
+        if not result.is_truncated:
+            return parts
+        marker = result.next_part_number_marker
+
+
+def complete_multipart_upload(bucket: str, object_name: str, upload_id: str, parts: list[Part]):
+    """Assemble the parts (sorted by part number) into the final object"""
+    ordered = [Part(p.part_number, p.etag) for p in sorted(parts, key=lambda p: p.part_number)]
+    return minio_client._complete_multipart_upload(bucket, object_name, upload_id, ordered)
+
+
+def abort_multipart_upload(bucket: str, object_name: str, upload_id: str):
+    """Discard an upload and all its parts"""
+    minio_client._abort_multipart_upload(bucket, object_name, upload_id)
@@ -169,3 +169,92 @@ class SystemSetting(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+
+class TransformPreset(Base):
+    """Named transform served at /api/transform/_preset/{name}/{bucket}/{path}"""
+    __tablename__ = "transform_presets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(50), unique=True, nullable=False, index=True)
+    description = Column(String(255))
+    
+    # Transform parameters (same meaning as the /api/transform query params)
+    width = Column(Integer)
+    height = Column(Integer)
+    format = Column(String(10))  # webp, avif, jpg, png, gif, auto
+    quality = Column(Integer, default=85)
+    fit = Column(String(20), default="contain")
+    crop = Column(String(20))
+    profile = Column(String(20))  # fast, balanced, max (None = bucket default)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class UploadSession(Base):
+    """Resumable chunked upload, backed by a MinIO multipart upload"""
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(64), primary_key=True, index=True)  # public session token
+    upload_id = Column(String(255), nullable=False)  # MinIO multipart upload id
+    bucket = Column(String(100), nullable=False)
+    object_name = Column(String(500), nullable=False)
+    original_filename = Column(String(255), nullable=False)
+    file_type = Column(String(20))  # 'image' oder 'video'
+    mime_type = Column(String(100))
+    total_size = Column(BigInteger, nullable=False)  # in bytes
+    chunk_size = Column(Integer, nullable=False)  # in bytes
+    
+    # Status
+    status = Column(String(20), default="active")  # 'active', 'pending' (presigned), 'completed', 'aborted'
+    file_id = Column(Integer, ForeignKey("uploaded_files.id", ondelete="SET NULL"), nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    expires_at = Column(DateTime(timezone=True))
+
+
+class ContentIndex(Base):
+    """Deduplication index: original content + processing options -> stored file"""
+    __tablename__ = "content_index"
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_key = Column(String(64), unique=True, nullable=False, index=True)  # sha256(hash|bucket|options)
+    sha256 = Column(String(64), nullable=False, index=True)  # Hash of the original upload
+    file_id = Column(Integer, ForeignKey("uploaded_files.id", ondelete="CASCADE"), nullable=False, index=True)
+    
+    # Statistics
+    hit_count = Column(BigInteger, default=0)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_hit_at = Column(DateTime(timezone=True))
+
+
+class BackgroundJob(Base):
+    """Asynchronous jobs processed by the background workers (e.g. async uploads)"""
+    __tablename__ = "background_jobs"
+
+    id = Column(String(64), primary_key=True, index=True)  # public job id
+    kind = Column(String(20), nullable=False, index=True)  # 'upload'
+    status = Column(String(20), default="queued", index=True)  # 'queued', 'processing', 'completed', 'failed'
+    params = Column(Text)  # JSON
+    
+    # Progress
+    total_items = Column(Integer, default=0)
+    processed_items = Column(Integer, default=0)
+    
+    # Outcome
+    result = Column(Text)  # JSON
+    error_message = Column(Text)
+    
+    # User/Trigger
+    created_by = Column(String(100))
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    started_at = Column(DateTime(timezone=True))
+    completed_at = Column(DateTime(timezone=True))
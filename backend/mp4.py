@@ -0,0 +1,204 @@
+"""
+MP4/MOV container helpers (ISO base media file format)
+
+- Faststart remux: move a trailing `moov` box in front of the media data so
+  players can start without fetching the end of the file first. Pure box
+  shuffling plus chunk offset patching, no re-encode.
+- Metadata: duration from `mvhd`, width/height from the video track `tkhd`.
+
+Works on seekable files and copies in chunks, so memory use is bounded by
+the size of the moov box (capped at MAX_MOOV_SIZE).
+"""
+
+import struct
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+MAX_MOOV_SIZE = 64 * 1024 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024
+MP4_MIME_TYPES = {"video/mp4", "video/quicktime"}
+
+# Boxes whose payload is a list of child boxes (on the path to stco/co64/tkhd)
+CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"edts", b"dinf", b"mvex", b"udta"}
+
+
+@dataclass
+class Box:
+    type: bytes
+    offset: int  # start of the box header in the file
+    size: int  # header + payload
+    header_size: int
+
+
+@dataclass
+class VideoInfo:
+    duration: Optional[float] = None  # seconds
+    width: Optional[int] = None
+    height: Optional[int] = None
+    faststart: bool = False  # moov was moved to the front
+
+
+def read_top_level_boxes(fileobj: BinaryIO) -> list[Box]:
+    """Parse the top-level box layout (raises ValueError on malformed files)"""
+    fileobj.seek(0, 2)
+    file_size = fileobj.tell()
+
+    boxes = []
+    offset = 0
+    while offset + 8 <= file_size:
+        fileobj.seek(offset)
+        size, box_type = struct.unpack(">I4s", fileobj.read(8))
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", fileobj.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - offset
+        if size < header_size or offset + size > file_size:
+            raise ValueError(f"Invalid box '{box_type!r}' at offset {offset}")
+        boxes.append(Box(box_type, offset, size, header_size))
+        offset += size
+
+    fileobj.seek(0)
+    return boxes
+
+
+def iter_children(data: bytes, start: int, end: int):
+    """Yield (type, payload_start, box_end) for the boxes in data[start:end]"""
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size or offset + size > end:
+            raise ValueError(f"Invalid box '{box_type!r}' inside moov")
+        yield box_type, offset + header_size, offset + size
+        offset += size
+
+
+def patch_chunk_offsets(moov: bytearray, shift_start: int, shift_end: int, delta: int):
+    """
+    Add delta to every stco/co64 chunk offset in [shift_start, shift_end)
+
+    Raises OverflowError if a 32-bit stco offset would overflow.
+    """
+    def walk(start: int, end: int):
+        for box_type, payload, box_end in iter_children(moov, start, end):
+            if box_type in CONTAINER_BOXES:
+                walk(payload, box_end)
+            elif box_type in (b"stco", b"co64"):
+                # version/flags (4) + entry count (4), then the offsets
+                count = struct.unpack_from(">I", moov, payload + 4)[0]
+                fmt, width = (">I", 4) if box_type == b"stco" else (">Q", 8)
+                position = payload + 8
+                for _ in range(count):
+                    value = struct.unpack_from(fmt, moov, position)[0]
+                    if shift_start <= value < shift_end:
+                        value += delta
+                        if box_type == b"stco" and value > 0xFFFFFFFF:
+                            raise OverflowError("stco offset overflow")
+                        struct.pack_into(fmt, moov, position, value)
+                    position += width
+
+    header_size = 16 if struct.unpack_from(">I", moov, 0)[0] == 1 else 8
+    walk(header_size, len(moov))
+
+
+def parse_moov(moov: bytes) -> VideoInfo:
+    """Duration (mvhd) and video dimensions (tkhd of the 'vide' track)"""
+    info = VideoInfo()
+    header_size = 16 if struct.unpack_from(">I", moov, 0)[0] == 1 else 8
+
+    for box_type, payload, box_end in iter_children(moov, header_size, len(moov)):
+        if box_type == b"mvhd":
+            version = moov[payload]
+            if version == 1:
+                timescale, duration = struct.unpack_from(">IQ", moov, payload + 20)
+            else:
+                timescale, duration = struct.unpack_from(">II", moov, payload + 12)
+            if timescale:
+                info.duration = round(duration / timescale, 3)
+
+        elif box_type == b"trak":
+            handler = None
+            size = None
+            for child_type, child_payload, child_end in iter_children(moov, payload, box_end):
+                if child_type == b"tkhd":
+                    # width/height are the last 8 bytes, 16.16 fixed point
+                    size = struct.unpack_from(">II", moov, child_end - 8)
+                elif child_type == b"mdia":
+                    for mdia_type, mdia_payload, _ in iter_children(moov, child_payload, child_end):
+                        if mdia_type == b"hdlr":
+                            handler = bytes(moov[mdia_payload + 8:mdia_payload + 12])
+            if handler == b"vide" and size and info.width is None:
+                info.width, info.height = size[0] >> 16, size[1] >> 16
+
+    return info
+
+
+def copy_range(src: BinaryIO, dst: BinaryIO, start: int, length: int):
+    src.seek(start)
+    while length > 0:
+        chunk = src.read(min(COPY_CHUNK_SIZE, length))
+        if not chunk:
+            raise ValueError("Unexpected end of file")
+        dst.write(chunk)
+        length -= len(chunk)
+
+
+def prepare_mp4(fileobj: BinaryIO) -> tuple[BinaryIO, VideoInfo]:
+    """
+    Read metadata and, if the moov box trails the media data, remux to faststart
+
+    Blocking - call it from a thread. Returns the file to store (the input
+    itself, or a new rewound temp file) and the parsed metadata. Files that
+    cannot be parsed are returned unchanged with empty metadata; files that
+    cannot be remuxed (stco overflow) unchanged with their metadata.
+    """
+    try:
+        boxes = read_top_level_boxes(fileobj)
+        moov = next((b for b in boxes if b.type == b"moov"), None)
+        mdat = next((b for b in boxes if b.type == b"mdat"), None)
+        if moov is None or moov.size > MAX_MOOV_SIZE:
+            return fileobj, VideoInfo()
+
+        fileobj.seek(moov.offset)
+        moov_data = bytearray(fileobj.read(moov.size))
+        info = parse_moov(moov_data)
+
+        if mdat is None or moov.offset < mdat.offset:
+            fileobj.seek(0)
+            return fileobj, info
+
+        # New layout: leading ftyp (and anything else before the first
+        # mdat that is not media), then moov, then the rest in order.
+        insert_at = mdat.offset
+        try:
+            patch_chunk_offsets(moov_data, insert_at, moov.offset, moov.size)
+        except OverflowError as e:
+            print(f"MP4 faststart skipped: {e}")
+            fileobj.seek(0)
+            return fileobj, info
+
+        output = tempfile.SpooledTemporaryFile(max_size=COPY_CHUNK_SIZE * 8)
+        copy_range(fileobj, output, 0, insert_at)
+        output.write(moov_data)
+        copy_range(fileobj, output, insert_at, moov.offset - insert_at)
+        end = moov.offset + moov.size
+        fileobj.seek(0, 2)
+        copy_range(fileobj, output, end, fileobj.tell() - end)
+
+        output.seek(0)
+        fileobj.seek(0)
+        info.faststart = True
+        return output, info
+
+    except (ValueError, struct.error) as e:
+        print(f"MP4 faststart skipped: {e}")
+        fileobj.seek(0)
+        return fileobj, VideoInfo()
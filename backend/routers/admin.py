@@ -1,8 +1,18 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from typing import Optional, Literal
 from sqlalchemy.orm import Session
 from database import get_db
-from services import minio_client
+from services import minio_client, public_read_policy, invalidate_bucket
 from auth import require_admin
+from bucket_settings import (
+    set_bucket_setting, get_bucket_generate_variants,
+    get_bucket_upload_profile, get_bucket_transform_profile
+)
+from models import TransformPreset
+from derivatives import STANDARD_VARIANTS
+from transform_presets import preset_params, invalidate_preset
+import re
 
 router = APIRouter()
 
@@ -45,18 +55,8 @@ async def create_bucket(
         
         # Set bucket policy to public read
         import json
-        policy = {
-            "Version": "2012-10-17",
-            "Statement": [
-                {
-                    "Effect": "Allow",
-                    "Principal": {"AWS": "*"},
-                    "Action": ["s3:GetObject"],
-                    "Resource": [f"arn:aws:s3:::{name}/*"]
-                }
-            ]
-        }
-        minio_client.set_bucket_policy(name, json.dumps(policy))
+        minio_client.set_bucket_policy(name, json.dumps(public_read_policy(name)))
+        invalidate_bucket(name)
         
         return {
             "success": True,
@@ -81,18 +81,8 @@ async def make_bucket_public(
         
         # Set bucket policy to public read
         import json
-        policy = {
-            "Version": "2012-10-17",
-            "Statement": [
-                {
-                    "Effect": "Allow",
-                    "Principal": {"AWS": "*"},
-                    "Action": ["s3:GetObject"],
-                    "Resource": [f"arn:aws:s3:::{name}/*"]
-                }
-            ]
-        }
-        minio_client.set_bucket_policy(name, json.dumps(policy))
+        minio_client.set_bucket_policy(name, json.dumps(public_read_policy(name)))
+        invalidate_bucket(name)
         
         return {
             "success": True,
@@ -103,6 +93,164 @@ async def make_bucket_public(
         return {"error": str(e)}
 
 
+@router.post("/buckets/registry/reset")
+async def reset_bucket_registry(
+    admin = Depends(require_admin)
+):
+    """
+    Bucket-Registry leeren (z.B. nach Änderungen direkt in MinIO)
+    
+    Gilt für diesen API-Worker, die anderen folgen nach BUCKET_REGISTRY_TTL.
+    """
+    invalidate_bucket()
+    return {"success": True}
+
+
+class BucketSettingsModel(BaseModel):
+    # None = use the global default
+    generate_variants: Optional[bool] = None
+    upload_webp_profile: Optional[Literal["fast", "balanced", "max"]] = None
+    transform_webp_profile: Optional[Literal["fast", "balanced", "max"]] = None
+
+
+def bucket_settings_response(db: Session, name: str) -> dict:
+    return {
+        "bucket": name,
+        "generate_variants": get_bucket_generate_variants(db, name),
+        "upload_webp_profile": get_bucket_upload_profile(db, name),
+        "transform_webp_profile": get_bucket_transform_profile(db, name)
+    }
+
+
+@router.get("/buckets/{name}/settings")
+async def get_bucket_settings(
+    name: str,
+    db: Session = Depends(get_db),
+    admin = Depends(require_admin)
+):
+    """
+    Upload-Einstellungen eines Buckets
+    """
+    return bucket_settings_response(db, name)
+
+
+@router.put("/buckets/{name}/settings")
+async def update_bucket_settings(
+    name: str,
+    bucket_settings: BucketSettingsModel,
+    db: Session = Depends(get_db),
+    admin = Depends(require_admin)
+):
+    """
+    Upload-Einstellungen eines Buckets setzen (`null` = globaler Default)
+    
+    - `generate_variants`: Standard-Varianten (thumbnail, preview, large,
+      original_webp) direkt beim Upload rendern
+    - `upload_webp_profile` / `transform_webp_profile`: WebP-Encoder-Profil
+      (fast, balanced, max) für Uploads bzw. Transformationen
+    """
+    if not minio_client.bucket_exists(name):
+        raise HTTPException(404, f"Bucket '{name}' does not exist")
+    
+    generate_variants = bucket_settings.generate_variants
+    set_bucket_setting(
+        db, name, "generate_variants",
+        None if generate_variants is None else ("true" if generate_variants else "false")
+    )
+    set_bucket_setting(db, name, "upload_webp_profile", bucket_settings.upload_webp_profile)
+    set_bucket_setting(db, name, "transform_webp_profile", bucket_settings.transform_webp_profile)
+    
+    return {"success": True, **bucket_settings_response(db, name)}
+
+
+class TransformPresetModel(BaseModel):
+    description: Optional[str] = None
+    width: Optional[int] = Field(None, ge=1, le=4000)
+    height: Optional[int] = Field(None, ge=1, le=4000)
+    format: Optional[Literal["auto", "avif", "webp", "jpg", "png", "gif"]] = None
+    quality: int = Field(85, ge=1, le=100)
+    fit: Literal["contain", "cover", "fill", "inside"] = "contain"
+    crop: Optional[Literal["top", "bottom", "left", "right", "center", "entropy"]] = None
+    profile: Optional[Literal["fast", "balanced", "max"]] = None  # None = bucket default
+
+
+def preset_response(preset: TransformPreset) -> dict:
+    return {
+        "name": preset.name,
+        "description": preset.description,
+        "url_template": f"/api/transform/_preset/{preset.name}/{{bucket}}/{{path}}",
+        **preset_params(preset)
+    }
+
+
+@router.get("/transform-presets")
+async def list_transform_presets(
+    db: Session = Depends(get_db),
+    admin = Depends(require_admin)
+):
+    """
+    Alle Transform-Presets (eingebaut: thumbnail, preview, large, original_webp)
+    """
+    presets = db.query(TransformPreset).order_by(TransformPreset.name).all()
+    return {
+        "presets": [preset_response(p) for p in presets],
+        "builtin": sorted(STANDARD_VARIANTS)
+    }
+
+
+@router.put("/transform-presets/{name}")
+async def save_transform_preset(
+    name: str,
+    preset_data: TransformPresetModel,
+    db: Session = Depends(get_db),
+    admin = Depends(require_admin)
+):
+    """
+    Transform-Preset anlegen oder ändern
+    
+    Ausgeliefert unter `/api/transform/_preset/{name}/{bucket}/{path}`.
+    Ein Preset mit dem Namen einer eingebauten Variante ersetzt diese.
+    """
+    if not re.fullmatch(r"[a-z0-9_-]{1,50}", name):
+        raise HTTPException(400, "Preset name may only contain a-z, 0-9, '_' and '-' (max 50)")
+    if not preset_data.width and not preset_data.height and not preset_data.format:
+        raise HTTPException(400, "A preset needs at least width, height or format")
+    
+    preset = db.query(TransformPreset).filter_by(name=name).first()
+    if not preset:
+        preset = TransformPreset(name=name)
+        db.add(preset)
+    for field, value in preset_data.model_dump().items():
+        setattr(preset, field, value)
+    db.commit()
+    db.refresh(preset)
+    invalidate_preset(name)
+    
+    return {"success": True, **preset_response(preset)}
+
+
+@router.delete("/transform-presets/{name}")
+async def delete_transform_preset(
+    name: str,
+    db: Session = Depends(get_db),
+    admin = Depends(require_admin)
+):
+    """
+    Transform-Preset löschen
+    
+    Bereits gerenderte Bilder bleiben in den Caches, bis sie ablaufen.
+    """
+    preset = db.query(TransformPreset).filter_by(name=name).first()
+    if not preset:
+        raise HTTPException(404, f"Preset '{name}' not found")
+    
+    db.delete(preset)
+    db.commit()
+    invalidate_preset(name)
+    
+    return {"success": True}
+
+
 @router.get("/system-info")
 async def system_info(
     db: Session = Depends(get_db),
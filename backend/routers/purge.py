@@ -4,6 +4,8 @@ from database import get_db
 from models import CachePurgeLog, CacheEntry
 from config import settings
 from auth import get_current_user_or_api_key
+from transform_cache import invalidate_cached_transforms, clear_transform_cache
+from starlette.concurrency import run_in_threadpool
 import os
 import shutil
 from datetime import datetime
@@ -74,6 +76,12 @@ async def purge_single_file(
     
     result = purge_nginx_cache_by_pattern(pattern=path)
     
+    # Cached transform renders of the file (Redis)
+    bucket, _, object_name = path.lstrip("/").partition("/")
+    transforms_purged = 0
+    if object_name:
+        transforms_purged = await run_in_threadpool(invalidate_cached_transforms, bucket, object_name)
+    
     # Log purge operation
     purge_log = CachePurgeLog(
         purge_type="single",
@@ -101,6 +109,7 @@ async def purge_single_file(
         "path": path,
         "files_purged": result["files_purged"],
         "bytes_freed": result["bytes_freed"],
+        "transforms_purged": transforms_purged,
         "message": f"Purged cache for {path}"
     }
 
@@ -118,6 +127,7 @@ async def purge_bucket(
     """
     
     result = purge_nginx_cache_by_pattern(pattern=f"/{bucket_name}/")
+    transforms_purged = await run_in_threadpool(clear_transform_cache, bucket_name)
     
     # Log purge operation
     purge_log = CachePurgeLog(
@@ -146,6 +156,7 @@ async def purge_bucket(
         "bucket": bucket_name,
         "files_purged": result["files_purged"],
         "bytes_freed": result["bytes_freed"],
+        "transforms_purged": transforms_purged,
         "message": f"Purged cache for bucket '{bucket_name}'"
     }
 
@@ -171,6 +182,7 @@ async def purge_all_cache(
         )
     
     result = purge_nginx_cache_by_pattern(full=True)
+    transforms_purged = await run_in_threadpool(clear_transform_cache)
     
     # Log purge operation
     purge_log = CachePurgeLog(
@@ -196,6 +208,7 @@ async def purge_all_cache(
         "success": True,
         "files_purged": result["files_purged"],
         "bytes_freed": result["bytes_freed"],
+        "transforms_purged": transforms_purged,
         "message": "Full cache purged successfully"
     }
 
@@ -1,193 +1,179 @@
-from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, RedirectResponse
+from pydantic import BaseModel, Field
+from minio.error import S3Error
 from sqlalchemy.orm import Session
 from database import get_db
-from services import minio_client
-from PIL import Image, ImageOps
-import io
+from models import BackgroundJob
+from jobs import create_job, job_status
+from email.utils import parsedate_to_datetime
+from ingest import object_version
+from source_cache import get_source
+from executors import run_io_task, run_transform_task, transform_queue, QueueSaturated
+from starlette.concurrency import run_in_threadpool
 from typing import Optional, Literal
 from fastapi import Depends
 from config import settings
-import hashlib
+from image_processing import transform_image, negotiate_format, AVIF_SUPPORTED, AUTO_FORMATS
+from derivatives import (
+    normalize_transform_params, fetch_derivative, store_derivative, transform_etag, http_date,
+    is_standard_variant, remove_stale_derivatives
+)
+from bucket_settings import get_bucket_transform_profile
+from transform_presets import get_preset, snap_dimensions
+from transform_batch import render_batch
+from cache_warming import select_warm_files, warm_outputs
+from url_helpers import build_transform_url, get_responsive_srcset, srcset_variants
+from auth import get_current_user_or_api_key
+from transform_cache import get_cached_entry, store_cached_transform, render_once
+from metrics import track_cache, track_storage_operation
 
 router = APIRouter()
 
 
-def get_transform_cache_key(bucket: str, path: str, params: dict) -> str:
-    """Generate cache key for transformed images"""
-    param_str = "&".join(f"{k}={v}" for k, v in sorted(params.items()) if v is not None)
-    key_str = f"{bucket}/{path}?{param_str}"
-    return hashlib.md5(key_str.encode()).hexdigest()
-
-
-def transform_image(
-    image_data: bytes,
-    width: Optional[int] = None,
-    height: Optional[int] = None,
-    format: Optional[str] = None,
-    quality: int = 85,
-    fit: str = "contain",
-    crop: Optional[str] = None
-) -> tuple[bytes, str]:
+@router.get("/transform/_preset/{preset}/{bucket}/{path:path}")
+async def transform_preset_endpoint(
+    preset: str,
+    bucket: str,
+    path: str,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
     """
-    Transform image with various operations
-    
-    Args:
-        image_data: Original image bytes
-        width: Target width (optional)
-        height: Target height (optional)
-        format: Output format (webp, jpg, png, optional)
-        quality: Quality for lossy formats (1-100)
-        fit: Resize mode - contain, cover, fill, or inside
-        crop: Crop mode - top, bottom, left, right, center, entropy, attention
-        
-    Returns:
-        (transformed_bytes, content_type)
+    Transform image with a named preset
+    
+    Presets are managed under `/api/admin/transform-presets`. Built in:
+    `thumbnail`, `preview`, `large`, `original_webp` (same as the upload
+    response transform URLs). The `_preset` prefix is not a valid bucket
+    name, so no bucket is shadowed.
+    
+    **Example:** `/api/transform/_preset/thumbnail/media/image.jpg`
     """
-    try:
-        img = Image.open(io.BytesIO(image_data))
-        original_format = img.format
-        
-        # Handle transparency
-        if img.mode in ('RGBA', 'LA', 'P'):
-            if format and format.lower() in ('jpg', 'jpeg'):
-                # Convert RGBA to RGB with white background for JPEG
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-        elif img.mode != 'RGB' and (not format or format.lower() not in ('png', 'webp')):
-            img = img.convert('RGB')
-        
-        # Crop if specified
-        if crop:
-            img = apply_crop(img, crop)
-        
-        # Resize if width or height specified
-        if width or height:
-            img = apply_resize(img, width, height, fit)
-        
-        # Determine output format
-        output_format = format.upper() if format else (original_format or 'WEBP')
-        if output_format == 'JPG':
-            output_format = 'JPEG'
-        
-        # Validate format
-        valid_formats = ['WEBP', 'JPEG', 'PNG', 'GIF']
-        if output_format not in valid_formats:
-            output_format = 'WEBP'
-        
-        # Save with specified format and quality
-        output = io.BytesIO()
-        save_params = {'format': output_format}
-        
-        if output_format in ('JPEG', 'WEBP'):
-            save_params['quality'] = max(1, min(100, quality))
-            if output_format == 'WEBP':
-                save_params['method'] = 6  # Best compression
-        elif output_format == 'PNG':
-            save_params['optimize'] = True
-        
-        img.save(output, **save_params)
-        transformed_data = output.getvalue()
-        
-        # Determine content type
-        content_type_map = {
-            'WEBP': 'image/webp',
-            'JPEG': 'image/jpeg',
-            'PNG': 'image/png',
-            'GIF': 'image/gif'
-        }
-        content_type = content_type_map.get(output_format, 'image/webp')
-        
-        return transformed_data, content_type
-        
-    except Exception as e:
-        raise HTTPException(500, f"Image transformation failed: {str(e)}")
+    params = get_preset(db, preset)
+    if params is None:
+        raise HTTPException(404, f"Unknown transform preset: {preset}")
+    
+    return await serve_transform(
+        bucket, path, params.get("w"), params.get("h"), params.get("format"),
+        params.get("quality", 85), params.get("fit", "contain"), params.get("crop"),
+        params.get("profile"), accept, if_none_match, if_modified_since, db, persist=True
+    )
 
 
-def apply_crop(img: Image.Image, crop_mode: str) -> Image.Image:
-    """Apply cropping to image"""
-    width, height = img.size
-    
-    if crop_mode == "center":
-        # Center crop to square
-        size = min(width, height)
-        left = (width - size) // 2
-        top = (height - size) // 2
-        return img.crop((left, top, left + size, top + size))
-    
-    elif crop_mode == "entropy":
-        # Crop to most interesting part (high entropy area)
-        return ImageOps.fit(img, (min(width, height), min(width, height)), method=Image.Resampling.LANCZOS, centering=(0.5, 0.5))
-    
-    elif crop_mode in ("top", "bottom", "left", "right"):
-        # Directional crop
-        size = min(width, height)
-        if crop_mode == "top":
-            return img.crop((0, 0, width, size))
-        elif crop_mode == "bottom":
-            return img.crop((0, height - size, width, height))
-        elif crop_mode == "left":
-            return img.crop((0, 0, size, height))
-        elif crop_mode == "right":
-            return img.crop((width - size, 0, width, height))
-    
-    return img
+class WarmCacheModel(BaseModel):
+    # Selection: paths (within bucket), top N by downloads, or all images of bucket/folder
+    bucket: Optional[str] = None
+    folder: Optional[str] = None
+    paths: list[str] = []
+    top: Optional[int] = Field(None, ge=1)
+    widths: list[int] = []  # Default: WARM_WIDTHS
+    formats: list[Literal["auto", "avif", "webp", "jpg", "png"]] = []  # Default: WARM_FORMATS
+    include_variants: bool = True  # Standard variants (thumbnail, preview, large, original_webp)
+    edge: bool = False  # Also request the public URLs, so nginx caches them
+    rate: Optional[float] = Field(None, gt=0)  # Files per second, capped at WARM_RATE_LIMIT
 
 
-def apply_resize(img: Image.Image, width: Optional[int], height: Optional[int], fit: str) -> Image.Image:
-    """Apply resizing to image"""
-    original_width, original_height = img.size
-    
-    # Calculate target dimensions
-    if width and height:
-        target_width, target_height = width, height
-    elif width:
-        target_width = width
-        target_height = int(original_height * (width / original_width))
-    elif height:
-        target_height = height
-        target_width = int(original_width * (height / original_height))
-    else:
-        return img
-    
-    # Apply resize based on fit mode
-    if fit == "contain":
-        # Resize to fit within bounds (preserve aspect ratio)
-        img.thumbnail((target_width, target_height), Image.Resampling.LANCZOS)
-        return img
-    
-    elif fit == "cover":
-        # Resize to cover bounds (preserve aspect ratio, crop excess)
-        return ImageOps.fit(img, (target_width, target_height), method=Image.Resampling.LANCZOS)
-    
-    elif fit == "fill":
-        # Resize to exact dimensions (may distort)
-        return img.resize((target_width, target_height), Image.Resampling.LANCZOS)
-    
-    elif fit == "inside":
-        # Only shrink if larger (preserve aspect ratio)
-        if original_width > target_width or original_height > target_height:
-            img.thumbnail((target_width, target_height), Image.Resampling.LANCZOS)
-        return img
-    
-    else:
-        # Default to contain
-        img.thumbnail((target_width, target_height), Image.Resampling.LANCZOS)
-        return img
+@router.post("/transform-jobs/warm")
+async def warm_cache_endpoint(
+    warm: WarmCacheModel,
+    auth = Depends(get_current_user_or_api_key),
+    db: Session = Depends(get_db)
+):
+    """
+    Pre-render the srcset ladder of many images in the background
+    
+    Selects files by `paths` (object names within `bucket`), `top` (the N
+    most downloaded images, optionally of `bucket`/`folder`) or all images of
+    `bucket`/`folder`. Each file gets `widths` x `formats` plus the standard
+    variants, rendered from one decode like `/api/transform/batch`. The job
+    runs at low priority and at most `rate` files per second.
+    
+    Returns 202 with a job id, poll `GET /api/transform-jobs/warm/{job_id}`.
+    Jobs live outside `/api/transform/`, where every GET path is a bucket
+    and responses are cached by nginx.
+    
+    **Authentication required**
+    
+    **Example:** `{"top": 200, "widths": [400, 800, 1200], "formats": ["auto"], "edge": true}`
+    """
+    if warm.paths and not warm.bucket:
+        raise HTTPException(400, "paths require a bucket")
+    if not warm.paths and not warm.top and not warm.bucket:
+        raise HTTPException(400, "Select files by bucket, paths or top")
+    
+    widths = warm.widths or settings.WARM_WIDTHS
+    if any(width < 1 or width > 4000 for width in widths):
+        raise HTTPException(400, "Widths must be between 1 and 4000")
+    formats = warm.formats or settings.WARM_FORMATS
+    if "avif" in formats and not AVIF_SUPPORTED:
+        raise HTTPException(400, "AVIF output is not supported by this server")
+    
+    files = select_warm_files(db, warm.bucket, warm.folder, warm.paths, warm.top)
+    if not files:
+        raise HTTPException(404, "No images match the selection")
+    
+    job = create_job(
+        db,
+        "warm",
+        {
+            "files": files,
+            "outputs": warm_outputs(widths, formats, warm.include_variants),
+            "edge": warm.edge,
+            "rate": min(warm.rate or settings.WARM_RATE_LIMIT, settings.WARM_RATE_LIMIT)
+        },
+        total_items=len(files),
+        created_by=getattr(auth, "username", None) or getattr(auth, "name", None)
+    )
+    
+    return JSONResponse(status_code=202, content={
+        "job_id": job.id,
+        "status": job.status,
+        "total": job.total_items,
+        "status_url": f"/api/transform-jobs/warm/{job.id}"
+    })
+
+
+@router.get("/transform-jobs/warm/{job_id}")
+async def get_warm_job(
+    job_id: str,
+    auth = Depends(get_current_user_or_api_key),
+    db: Session = Depends(get_db)
+):
+    """
+    Status of a cache warming job
+    
+    `processed`/`total` count files. Once completed, `result` holds the
+    rendered/cached output counts and the files that failed.
+    """
+    job = db.query(BackgroundJob).filter(
+        BackgroundJob.id == job_id,
+        BackgroundJob.kind == "warm"
+    ).first()
+    
+    if not job:
+        raise HTTPException(404, "Warm job not found")
+    
+    return job_status(job)
 
 
 @router.get("/transform/{bucket}/{path:path}")
 async def transform_image_endpoint(
     bucket: str,
     path: str,
+    request: Request,
     w: Optional[int] = Query(None, description="Target width in pixels", ge=1, le=4000),
     h: Optional[int] = Query(None, description="Target height in pixels", ge=1, le=4000),
-    format: Optional[Literal["webp", "jpg", "jpeg", "png", "gif"]] = Query(None, description="Output format"),
+    format: Optional[Literal["auto", "avif", "webp", "jpg", "jpeg", "png", "gif"]] = Query(None, description="Output format"),
     quality: int = Query(85, description="Quality for lossy formats (1-100)", ge=1, le=100),
     fit: Literal["contain", "cover", "fill", "inside"] = Query("contain", description="Resize mode"),
-    crop: Optional[Literal["top", "bottom", "left", "right", "center", "entropy"]] = Query(None, description="Crop mode")
+    crop: Optional[Literal["top", "bottom", "left", "right", "center", "entropy"]] = Query(None, description="Crop mode"),
+    profile: Optional[Literal["fast", "balanced", "max"]] = Query(None, description="WebP/AVIF encoder profile"),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
 ):
     """
     Transform image on-the-fly with caching
@@ -195,7 +181,8 @@ async def transform_image_endpoint(
     **URL Parameters:**
     - `w`: Width in pixels (1-4000)
     - `h`: Height in pixels (1-4000)
-    - `format`: Output format (webp, jpg, png, gif)
+    - `format`: Output format (avif, webp, jpg, png, gif) or `auto`:
+      AVIF, WebP or JPEG depending on the Accept header (response varies on Accept)
     - `quality`: Quality 1-100 (default: 85)
     - `fit`: Resize mode
         - `contain`: Fit within bounds, preserve aspect (default)
@@ -206,52 +193,364 @@ async def transform_image_endpoint(
         - `center`: Center crop to square
         - `top/bottom/left/right`: Directional crop
         - `entropy`: Crop to most interesting area
+    - `profile`: WebP/AVIF encoder effort - `fast`, `balanced` or `max`
+      (default: bucket setting, then TRANSFORM_WEBP_PROFILE)
+    
+    With TRANSFORM_SNAP_MODE `up` or `redirect`, `w` is rounded up to
+    TRANSFORM_WIDTH_LADDER (and `h` scaled along).
     
     **Examples:**
     - `/api/transform/media/image.jpg?w=800&h=600&format=webp`
     - `/api/transform/media/photo.png?w=400&fit=cover&crop=center`
     - `/api/transform/media/banner.jpg?w=1200&quality=90`
+    - `/api/transform/media/hero.jpg?w=1200&format=auto`
+    
+    Responses carry a strong `ETag` (source ETag + normalized parameters)
+    and the source's `Last-Modified`. Conditional requests are answered with
+    304 from the source metadata alone, without fetching or rendering.
     """
     
     # Validate at least one dimension or format change
     if not w and not h and not format:
         raise HTTPException(400, "At least one transformation parameter (w, h, or format) is required")
     
+    # Round the width up to the ladder (TRANSFORM_SNAP_MODE), fewer distinct renders
+    snapped_w, snapped_h = snap_dimensions(w, h)
+    if (snapped_w, snapped_h) != (w, h):
+        if settings.TRANSFORM_SNAP_MODE == "redirect":
+            url = request.url.include_query_params(w=snapped_w, **({"h": snapped_h} if h else {}))
+            return RedirectResponse(
+                f"{url.path}?{url.query}",
+                status_code=301,
+                headers={"Cache-Control": "public, max-age=86400"}
+            )
+        w, h = snapped_w, snapped_h
+    
+    # Snapped widths are a bounded set, worth keeping in the derivatives bucket
+    return await serve_transform(
+        bucket, path, w, h, format, quality, fit, crop, profile,
+        accept, if_none_match, if_modified_since, db,
+        persist=bool(w) and settings.TRANSFORM_SNAP_MODE != "off"
+    )
+
+
+async def serve_transform(
+    bucket: str,
+    path: str,
+    w: Optional[int],
+    h: Optional[int],
+    format: Optional[str],
+    quality: int,
+    fit: str,
+    crop: Optional[str],
+    profile: Optional[str],
+    accept: Optional[str],
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    db: Session,
+    persist: bool = False
+) -> Response:
+    """
+    Cached or freshly rendered transform (304, Redis, derivatives, then render)
+    
+    persist: write a fresh render through to the derivatives bucket (presets,
+    snapped widths). The standard variants are always written through, other
+    renders only live in Redis and nginx.
+    """
+    response_headers = {"Cache-Control": "public, max-age=2592000"}  # 30 days
+    
+    # format=auto: the negotiated format is part of the cache key
+    if format == "auto":
+        format = negotiate_format(accept)
+        response_headers["Vary"] = "Accept"
+    elif format == "avif" and not AVIF_SUPPORTED:
+        raise HTTPException(400, "AVIF output is not supported by this server")
+    
+    profile = profile or get_bucket_transform_profile(db, bucket)
+    params = normalize_transform_params(w, h, format, quality, fit, crop, profile)
+    
+    async def stat_source() -> tuple[str, Optional[str]]:
+        # Current version of the source (stored derivatives and ETags are keyed by it)
+        try:
+            source_etag, modified = await run_io_task("origin_stat", object_version, bucket, path)
+        except QueueSaturated:
+            raise
+        except Exception as e:
+            raise HTTPException(404, f"Image not found: {str(e)}")
+        return source_etag, http_date(modified)
+    
+    # Revalidation (browser or nginx proxy_cache_revalidate): one metadata lookup, no render
+    source_etag = last_modified = None
+    if if_none_match or if_modified_since:
+        source_etag, last_modified = await stat_source()
+        etag = transform_etag(bucket, path, params, source_etag)
+        if is_not_modified(if_none_match, if_modified_since, etag, last_modified):
+            track_cache(True, "transform_revalidate")
+            return Response(
+                status_code=304,
+                headers=validator_headers(response_headers, etag, last_modified)
+            )
+        track_cache(False, "transform_revalidate")
+    
+    # Rendered before by any API worker? Serve it from Redis
+    cached = await run_in_threadpool(get_cached_entry, bucket, path, params)
+    if cached and source_etag and cached["source_etag"] != source_etag:
+        cached = None  # Rendered from an older version of the source
+    track_cache(cached is not None, "transform")
+    if cached:
+        if not cached["source_etag"]:
+            source_etag, last_modified = await stat_source()
+        cached_etag = cached["source_etag"] or source_etag
+        return Response(
+            content=cached["data"],
+            media_type=cached["content_type"],
+            headers={
+                **validator_headers(
+                    response_headers,
+                    transform_etag(bucket, path, params, cached_etag),
+                    cached["last_modified"] or last_modified
+                ),
+                "X-Transform-Cache": "HIT",
+                "X-Transformed-Size": str(len(cached["data"]))
+            }
+        )
+    
+    if source_etag is None:
+        source_etag, last_modified = await stat_source()
+    response_headers = validator_headers(
+        response_headers, transform_etag(bucket, path, params, source_etag), last_modified
+    )
+    
+    # Rendered at upload or by an earlier request? Serve the stored derivative
     try:
-        # Fetch original image from MinIO
-        response = minio_client.get_object(bucket, path)
-        image_data = response.read()
-        response.close()
-        response.release_conn()
-        
+        derivative = await run_io_task("derivative_fetch", fetch_derivative, bucket, path, params, source_etag)
+    except QueueSaturated:
+        raise
     except Exception as e:
-        raise HTTPException(404, f"Image not found: {str(e)}")
+        print(f"Derivative lookup failed for {bucket}/{path}: {e}")
+        derivative = None
+    
+    if derivative:
+        derivative_data, content_type = derivative
+        await run_in_threadpool(
+            store_cached_transform, bucket, path, params, derivative_data, content_type,
+            source_etag, last_modified
+        )
+        return Response(
+            content=derivative_data,
+            media_type=content_type,
+            headers={
+                **response_headers,
+                "X-Transform-Cache": "DERIVATIVE",
+                "X-Transformed-Size": str(len(derivative_data))
+            }
+        )
+    
+    source = {}
+    
+    async def render() -> tuple[bytes, str]:
+        # Fail fast before reading the origin if no render slot will be free
+        transform_queue.check_capacity()
+        
+        try:
+            # Original from the local source cache or MinIO (I/O thread pool)
+            image_data = await run_io_task("origin_fetch", get_source, bucket, path, source_etag)
+        except QueueSaturated:
+            raise
+        except Exception as e:
+            raise HTTPException(404, f"Image not found: {str(e)}")
+        
+        source["size"] = len(image_data)
+        
+        # Transform image (process pool, waits at most TRANSFORM_QUEUE_TIMEOUT)
+        return await run_transform_task(
+            "transform",
+            transform_image,
+            image_data=image_data,
+            width=w,
+            height=h,
+            format=params["format"],
+            quality=quality,
+            fit=fit,
+            crop=crop,
+            profile=profile
+        )
     
-    # Transform image
-    transformed_data, content_type = transform_image(
-        image_data=image_data,
-        width=w,
-        height=h,
-        format=format,
-        quality=quality,
-        fit=fit,
-        crop=crop
+    # Concurrent requests for the same render (any API worker) wait for one result
+    transformed_data, content_type, cache_status = await render_once(
+        bucket, path, params, render, source_etag, last_modified
     )
     
+    # Write through to the derivatives bucket (survives nginx/Redis eviction).
+    # A render of a new source version also drops the derivatives of the old ones.
+    if cache_status == "MISS":
+        try:
+            if persist or is_standard_variant(params):
+                await run_io_task(
+                    "derivative_store", store_derivative,
+                    bucket, path, params, transformed_data, content_type, source_etag
+                )
+                track_storage_operation("derivatives", True)
+            await run_io_task("derivative_prune", remove_stale_derivatives, bucket, path, source_etag)
+        except QueueSaturated:
+            pass
+        except Exception as e:
+            track_storage_operation("derivatives", False)
+            print(f"Derivative write-through failed for {bucket}/{path}: {e}")
+    
+    headers = {
+        **response_headers,
+        "X-Transform-Cache": cache_status,
+        "X-Transformed-Size": str(len(transformed_data))
+    }
+    if "size" in source:
+        headers["X-Original-Size"] = str(source["size"])
+        headers["X-Compression-Ratio"] = f"{(1 - len(transformed_data)/source['size']) * 100:.1f}%"
+    
     # Return transformed image with caching headers
     return Response(
         content=transformed_data,
         media_type=content_type,
-        headers={
-            "Cache-Control": "public, max-age=2592000",  # 30 days
-            "X-Transform-Cache": "MISS",  # First request is always a miss
-            "X-Original-Size": str(len(image_data)),
-            "X-Transformed-Size": str(len(transformed_data)),
-            "X-Compression-Ratio": f"{(1 - len(transformed_data)/len(image_data)) * 100:.1f}%"
-        }
+        headers=headers
     )
 
 
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses the weak comparison, so W/ prefixes are ignored"""
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def is_not_modified(
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    etag: str,
+    last_modified: Optional[str]
+) -> bool:
+    """Conditional GET: If-None-Match wins, If-Modified-Since only counts without it"""
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def validator_headers(headers: dict, etag: str, last_modified: Optional[str]) -> dict:
+    headers = {**headers, "ETag": etag}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    return headers
+
+
+class BatchOutputModel(BaseModel):
+    w: Optional[int] = Field(None, ge=1, le=4000)
+    h: Optional[int] = Field(None, ge=1, le=4000)
+    format: Optional[Literal["auto", "avif", "webp", "jpg", "jpeg", "png", "gif"]] = None
+    quality: int = Field(85, ge=1, le=100)
+    fit: Literal["contain", "cover", "fill", "inside"] = "contain"
+    crop: Optional[Literal["top", "bottom", "left", "right", "center", "entropy"]] = None
+    profile: Optional[Literal["fast", "balanced", "max"]] = None
+
+
+class BatchTransformModel(BaseModel):
+    bucket: str
+    path: str
+    outputs: list[BatchOutputModel] = []
+    # Shortcut: the entries of get_responsive_srcset(bucket, path, srcset_widths, srcset_format)
+    srcset_widths: list[int] = []
+    srcset_format: Literal["auto", "avif", "webp", "jpg", "png"] = "webp"
+    force: bool = False  # Render even if already stored
+
+
+def batch_formats(format: Optional[str]) -> list[Optional[str]]:
+    """format=auto can be negotiated to any of these, so all are rendered"""
+    if format == "auto":
+        return AUTO_FORMATS
+    if format == "avif" and not AVIF_SUPPORTED:
+        raise HTTPException(400, "AVIF output is not supported by this server")
+    return [format]
+
+
+@router.post("/transform/batch")
+async def transform_batch_endpoint(
+    batch: BatchTransformModel,
+    auth = Depends(get_current_user_or_api_key),
+    db: Session = Depends(get_db)
+):
+    """
+    Render several variants of one image from a single fetch and decode
+    
+    Each output is derived from the nearest larger intermediate and stored
+    (derivatives bucket + Redis) under the same key as the matching
+    `/api/transform` URL, which is then served from cache. Widths are snapped
+    like on `/api/transform`, the returned URLs carry the snapped size. Outputs that are
+    already stored are skipped unless `force` is set. `format=auto` renders
+    every format the negotiation can pick.
+    
+    **Authentication required**
+    
+    **Example:**
+    `{"bucket": "media", "path": "hero.jpg", "srcset_widths": [400, 800, 1200]}`
+    """
+    requested = [output.model_dump() for output in batch.outputs]
+    requested += srcset_variants(batch.srcset_widths, batch.srcset_format)
+    if not requested:
+        raise HTTPException(400, "No outputs requested")
+    
+    bucket_profile = get_bucket_transform_profile(db, batch.bucket)
+    entries = []
+    for output in requested:
+        if not output.get("w") and not output.get("h") and not output.get("format"):
+            raise HTTPException(400, "Every output needs w, h or format")
+        # Same width snapping as /api/transform, so the stored keys are the ones it looks up
+        w, h = snap_dimensions(output.get("w"), output.get("h"))
+        output = {**output, "w": w, "h": h}
+        for format in batch_formats(output.get("format")):
+            params = normalize_transform_params(
+                output.get("w"), output.get("h"), format, output.get("quality", 85),
+                output.get("fit", "contain"), output.get("crop"), output.get("profile") or bucket_profile
+            )
+            entries.append((output, params))
+    
+    if len(entries) > settings.TRANSFORM_BATCH_MAX_OUTPUTS:
+        raise HTTPException(400, f"Too many outputs (max {settings.TRANSFORM_BATCH_MAX_OUTPUTS})")
+    
+    try:
+        results = await render_batch(batch.bucket, batch.path, [params for _, params in entries], batch.force)
+    except S3Error as e:
+        raise HTTPException(404, f"Image not found: {str(e)}")
+    
+    outputs = []
+    for (output, params), result in zip(entries, results):
+        url_params = {k: v for k, v in output.items() if v is not None}
+        if url_params.get("quality") == 85:
+            url_params.pop("quality")
+        if url_params.get("fit") == "contain":
+            url_params.pop("fit")
+        outputs.append({
+            "url": build_transform_url(batch.bucket, batch.path, **url_params),
+            "format": params["format"],
+            **result
+        })
+    
+    response = {
+        "bucket": batch.bucket,
+        "path": batch.path,
+        "rendered": sum(1 for o in outputs if o["status"] == "rendered"),
+        "cached": sum(1 for o in outputs if o["status"] == "cached"),
+        "outputs": outputs
+    }
+    if batch.srcset_widths:
+        response["srcset"] = get_responsive_srcset(
+            batch.bucket, batch.path, batch.srcset_widths, batch.srcset_format
+        )
+    return response
+
+
 @router.get("/transform-info")
 async def transform_info():
     """Get information about available transformation options"""
@@ -274,7 +573,8 @@ async def transform_info():
             "format": {
                 "type": "string",
                 "description": "Output format",
-                "options": ["webp", "jpg", "jpeg", "png", "gif"],
+                "options": ["auto", "webp", "jpg", "jpeg", "png", "gif"] + (["avif"] if AVIF_SUPPORTED else []),
+                "auto": "AVIF, WebP or JPEG depending on the Accept header",
                 "optional": True
             },
             "quality": {
@@ -308,6 +608,17 @@ async def transform_info():
                     "entropy": "Crop to most interesting area"
                 },
                 "optional": True
+            },
+            "profile": {
+                "type": "string",
+                "description": "WebP/AVIF encoder effort (speed vs. size)",
+                "options": {
+                    "fast": "Fastest encode, larger files",
+                    "balanced": "Middle ground",
+                    "max": "Smallest files, slowest encode"
+                },
+                "default": settings.TRANSFORM_WEBP_PROFILE,
+                "optional": True
             }
         },
         "examples": [
@@ -315,6 +626,10 @@ async def transform_info():
                 "description": "Resize to 800x600 WebP",
                 "url": "/api/transform/media/image.jpg?w=800&h=600&format=webp"
             },
+            {
+                "description": "Best format the browser accepts (AVIF/WebP/JPEG)",
+                "url": "/api/transform/media/hero.jpg?w=1200&format=auto"
+            },
             {
                 "description": "Square thumbnail with center crop",
                 "url": "/api/transform/media/photo.png?w=400&h=400&fit=cover&crop=center"
@@ -335,11 +650,11 @@ async def transform_info():
         "caching": {
             "enabled": True,
             "duration": "30 days",
-            "location": "NGINX cache layer"
+            "location": "NGINX cache layer, Redis (shared by all API workers), derivatives bucket (persistent)"
         },
         "limits": {
             "max_width": 4000,
             "max_height": 4000,
-            "supported_formats": ["JPEG", "PNG", "GIF", "WebP", "BMP", "TIFF"]
+            "supported_formats": ["JPEG", "PNG", "GIF", "WebP", "BMP", "TIFF"] + (["AVIF"] if AVIF_SUPPORTED else [])
         }
     }
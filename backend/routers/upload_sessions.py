@@ -0,0 +1,528 @@
+"""
+Resumable Upload Router
+- Create an upload session (MinIO multipart upload)
+- PUT numbered chunks, in any order, retry as often as needed
+- Query which chunks arrived
+- Complete: assemble the object and register the UploadedFile row
+
+Presigned uploads use the same session table: the client PUTs the file
+straight to MinIO (private staging bucket), then finalize validates the
+object and copies it into the public bucket with the sniffed Content-Type.
+"""
+
+from fastapi import APIRouter, Form, Depends, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from database import get_db
+from services import minio_client, minio_public_client, ensure_bucket_exists
+from ingest import sniff_content_type, sniff_image_type, read_object_head
+from minio_multipart import (
+    create_multipart_upload, upload_part, list_parts,
+    complete_multipart_upload, abort_multipart_upload
+)
+from models import UploadedFile, UploadSession
+from config import settings
+from url_helpers import build_cdn_url
+from auth import get_current_user_or_api_key
+from minio.commonconfig import CopySource, REPLACE
+from minio.datatypes import Part
+from minio.error import S3Error
+from PIL import Image
+from datetime import datetime, timedelta
+from pathlib import Path
+import io
+import math
+import mimetypes
+import secrets
+import uuid
+from metrics import track_upload, track_upload_error, track_storage_operation
+
+router = APIRouter()
+
+# S3/MinIO: every part except the last must be at least 5MB
+MIN_CHUNK_SIZE = 5 * 1024 * 1024
+
+
+def resolve_file_type(filename: str) -> tuple[str, str, str]:
+    """(file_type, mime_type, extension) of an allowed upload, 400 otherwise"""
+    file_ext = Path(filename).suffix.lower()
+    mime_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+    if file_ext in settings.ALLOWED_IMAGE_EXTENSIONS:
+        return "image", mime_type, file_ext
+    if file_ext in settings.ALLOWED_VIDEO_EXTENSIONS:
+        return "video", mime_type, file_ext
+    raise HTTPException(400, f"File type not allowed: {file_ext}")
+
+
+def new_object_name(folder: str, file_ext: str) -> str:
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    safe_filename = f"{timestamp}_{secrets.token_hex(8)}{file_ext}"
+    return f"{folder.strip('/')}/{safe_filename}" if folder else safe_filename
+
+
+def register_session_file(db: Session, session: UploadSession, mime_type: str, width=None, height=None) -> dict:
+    """Create the UploadedFile row of a finished session and close the session"""
+    cdn_url = build_cdn_url(session.bucket, session.object_name)
+    safe_filename = session.object_name.rsplit("/", 1)[-1]
+
+    db_file = UploadedFile(
+        filename=safe_filename,
+        original_filename=session.original_filename,
+        bucket=session.bucket,
+        path=f"/{session.bucket}/{session.object_name}",
+        size=session.total_size,
+        mime_type=mime_type,
+        file_type=session.file_type,
+        width=width,
+        height=height,
+        cdn_url=cdn_url,
+        created_at=datetime.now(),
+        is_active=True
+    )
+    db.add(db_file)
+    db.flush()
+
+    session.status = "completed"
+    session.file_id = db_file.id
+    db.commit()
+
+    track_upload(session.file_type, session.bucket, session.total_size)
+
+    return {
+        "success": True,
+        "file_id": db_file.id,
+        "filename": safe_filename,
+        "original_filename": session.original_filename,
+        "cdn_url": cdn_url,
+        "size": session.total_size,
+        "type": session.file_type
+    }
+
+
+def get_active_session(db: Session, session_id: str) -> UploadSession:
+    """Load a session that can still receive chunks"""
+    session = db.query(UploadSession).filter(UploadSession.id == session_id).first()
+
+    if not session:
+        raise HTTPException(404, "Upload session not found")
+
+    if session.status != "active":
+        raise HTTPException(409, f"Upload session is {session.status}")
+
+    if session.expires_at and session.expires_at < datetime.now(session.expires_at.tzinfo):
+        raise HTTPException(410, "Upload session expired")
+
+    return session
+
+
+def expected_chunk_size(session: UploadSession, chunk_number: int) -> int:
+    """Byte length chunk N must have (the last chunk takes the remainder)"""
+    total_chunks = math.ceil(session.total_size / session.chunk_size)
+    if chunk_number < total_chunks:
+        return session.chunk_size
+    return session.total_size - (total_chunks - 1) * session.chunk_size
+
+
+def list_uploaded_parts(session: UploadSession) -> list[Part]:
+    """All parts MinIO has stored for this session"""
+    return list_parts(session.bucket, session.object_name, session.upload_id)
+
+
+def presigned_staging_name(session: UploadSession) -> str:
+    """Object name of a presigned upload in UPLOAD_STAGING_BUCKET"""
+    return f"presigned/{session.id}"
+
+
+def abort_expired_sessions(db: Session):
+    """
+    Abort multipart uploads of expired sessions so MinIO frees the parts,
+    and remove staged objects of presigned uploads that were never finalized
+    """
+    expired = db.query(UploadSession).filter(
+        UploadSession.status.in_(["active", "pending"]),
+        UploadSession.expires_at < datetime.now()
+    ).limit(20).all()
+
+    for session in expired:
+        try:
+            if session.status == "pending":
+                minio_client.remove_object(settings.UPLOAD_STAGING_BUCKET, presigned_staging_name(session))
+            else:
+                abort_multipart_upload(session.bucket, session.object_name, session.upload_id)
+        except Exception as e:
+            print(f"Failed to abort expired upload session {session.id}: {e}")
+        session.status = "aborted"
+
+    if expired:
+        db.commit()
+
+
+def session_status(session: UploadSession, parts: list[Part]) -> dict:
+    """Progress report for a session"""
+    total_chunks = math.ceil(session.total_size / session.chunk_size)
+    received = sorted(p.part_number for p in parts)
+    received_set = set(received)
+
+    # Offset = bytes covered by the contiguous run of chunks from 1
+    next_chunk = 1
+    while next_chunk in received_set:
+        next_chunk += 1
+    offset = min((next_chunk - 1) * session.chunk_size, session.total_size)
+
+    return {
+        "session_id": session.id,
+        "status": session.status,
+        "filename": session.original_filename,
+        "total_size": session.total_size,
+        "chunk_size": session.chunk_size,
+        "total_chunks": total_chunks,
+        "received_chunks": received,
+        "missing_chunks": [n for n in range(1, total_chunks + 1) if n not in received_set],
+        "offset": offset,
+        "next_chunk": next_chunk if next_chunk <= total_chunks else None,
+        "expires_at": session.expires_at.isoformat() if session.expires_at else None
+    }
+
+
+@router.post("/upload/sessions")
+async def create_upload_session(
+    filename: str = Form(...),
+    size: int = Form(..., gt=0),
+    bucket: str = Form(default=settings.MINIO_DEFAULT_BUCKET),
+    folder: str = Form(default=""),
+    chunk_size: int = Form(default=settings.RESUMABLE_CHUNK_SIZE),
+    auth = Depends(get_current_user_or_api_key),
+    db: Session = Depends(get_db)
+):
+    """
+    Start a resumable upload
+
+    Returns a `session_id`. Upload the file in chunks of `chunk_size` bytes with
+    `PUT /api/upload/sessions/{session_id}/chunks/{n}` (n starts at 1), then call
+    `POST /api/upload/sessions/{session_id}/complete`.
+
+    Files are stored as uploaded (no WebP conversion).
+    """
+    if size > settings.MAX_UPLOAD_SIZE:
+        raise HTTPException(400, f"File too large. Max: {settings.MAX_UPLOAD_SIZE} bytes")
+
+    if chunk_size < MIN_CHUNK_SIZE and chunk_size < size:
+        raise HTTPException(400, f"chunk_size must be at least {MIN_CHUNK_SIZE} bytes")
+
+    if chunk_size > settings.RESUMABLE_MAX_CHUNK_SIZE:
+        raise HTTPException(400, f"chunk_size must not exceed {settings.RESUMABLE_MAX_CHUNK_SIZE} bytes")
+
+    file_type, mime_type, file_ext = resolve_file_type(filename)
+
+    abort_expired_sessions(db)
+    ensure_bucket_exists(bucket)
+
+    object_name = new_object_name(folder, file_ext)
+
+    try:
+        upload_id = await run_in_threadpool(create_multipart_upload, bucket, object_name, mime_type)
+        track_storage_operation("multipart_create", True)
+    except Exception as e:
+        track_storage_operation("multipart_create", False)
+        raise HTTPException(500, f"Could not start upload: {str(e)}")
+
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        upload_id=upload_id,
+        bucket=bucket,
+        object_name=object_name,
+        original_filename=filename,
+        file_type=file_type,
+        mime_type=mime_type,
+        total_size=size,
+        chunk_size=min(chunk_size, size),
+        status="active",
+        expires_at=datetime.now() + timedelta(hours=settings.RESUMABLE_SESSION_TTL_HOURS)
+    )
+    db.add(session)
+    db.commit()
+
+    return session_status(session, [])
+
+
+@router.put("/upload/sessions/{session_id}/chunks/{chunk_number}")
+async def upload_chunk(
+    session_id: str,
+    chunk_number: int,
+    request: Request,
+    auth = Depends(get_current_user_or_api_key),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload one chunk (raw request body)
+
+    Re-sending a chunk overwrites it, so retries are safe.
+    """
+    session = get_active_session(db, session_id)
+    total_chunks = math.ceil(session.total_size / session.chunk_size)
+
+    if chunk_number < 1 or chunk_number > total_chunks:
+        raise HTTPException(400, f"chunk_number must be between 1 and {total_chunks}")
+
+    data = await request.body()
+    expected = expected_chunk_size(session, chunk_number)
+    if len(data) != expected:
+        raise HTTPException(400, f"Chunk {chunk_number} must be {expected} bytes, got {len(data)}")
+
+    try:
+        etag = await run_in_threadpool(
+            upload_part,
+            session.bucket,
+            session.object_name,
+            session.upload_id,
+            chunk_number,
+            data
+        )
+        track_storage_operation("multipart_part", True)
+    except Exception as e:
+        track_storage_operation("multipart_part", False)
+        raise HTTPException(502, f"Chunk upload failed: {str(e)}")
+
+    return {
+        "session_id": session.id,
+        "chunk_number": chunk_number,
+        "size": len(data),
+        "etag": etag
+    }
+
+
+@router.get("/upload/sessions/{session_id}")
+async def get_upload_session(
+    session_id: str,
+    auth = Depends(get_current_user_or_api_key),
+    db: Session = Depends(get_db)
+):
+    """Report received chunks and the offset to resume from"""
+    session = db.query(UploadSession).filter(UploadSession.id == session_id).first()
+
+    if not session:
+        raise HTTPException(404, "Upload session not found")
+
+    if session.status != "active":
+        return {
+            "session_id": session.id,
+            "status": session.status,
+            "file_id": session.file_id
+        }
+
+    parts = await run_in_threadpool(list_uploaded_parts, session)
+    return session_status(session, parts)
+
+
+@router.post("/upload/sessions/{session_id}/complete")
+async def complete_upload_session(
+    session_id: str,
+    auth = Depends(get_current_user_or_api_key),
+    db: Session = Depends(get_db)
+):
+    """Assemble all chunks into the final object and register the file"""
+    session = get_active_session(db, session_id)
+    parts = await run_in_threadpool(list_uploaded_parts, session)
+    status = session_status(session, parts)
+
+    if status["missing_chunks"]:
+        raise HTTPException(409, {
+            "message": "Upload incomplete",
+            "missing_chunks": status["missing_chunks"]
+        })
+
+    for part in parts:
+        if part.size is not None and part.size != expected_chunk_size(session, part.part_number):
+            raise HTTPException(409, f"Chunk {part.part_number} has wrong size, re-upload it")
+
+    try:
+        await run_in_threadpool(
+            complete_multipart_upload,
+            session.bucket,
+            session.object_name,
+            session.upload_id,
+            parts
+        )
+        track_storage_operation("multipart_complete", True)
+    except Exception as e:
+        track_storage_operation("multipart_complete", False)
+        track_upload_error(str(type(e).__name__))
+        raise HTTPException(502, f"Could not complete upload: {str(e)}")
+
+    return register_session_file(db, session, session.mime_type)
+
+
+@router.delete("/upload/sessions/{session_id}")
+async def abort_upload_session(
+    session_id: str,
+    auth = Depends(get_current_user_or_api_key),
+    db: Session = Depends(get_db)
+):
+    """Abort an upload and discard all received chunks"""
+    session = get_active_session(db, session_id)
+
+    try:
+        await run_in_threadpool(
+            abort_multipart_upload,
+            session.bucket,
+            session.object_name,
+            session.upload_id
+        )
+    except Exception as e:
+        raise HTTPException(502, f"Could not abort upload: {str(e)}")
+
+    session.status = "aborted"
+    db.commit()
+
+    return {"success": True, "session_id": session.id, "status": "aborted"}
+
+
+@router.post("/upload/presigned")
+async def create_presigned_upload(
+    filename: str = Form(...),
+    size: int = Form(..., gt=0),
+    bucket: str = Form(default=settings.MINIO_DEFAULT_BUCKET),
+    folder: str = Form(default=""),
+    auth = Depends(get_current_user_or_api_key),
+    db: Session = Depends(get_db)
+):
+    """
+    Start a direct-to-storage upload
+
+    Returns a short-lived presigned `upload_url`. PUT the raw file there
+    (straight to MinIO, no backend involved), then call
+    `POST /api/upload/presigned/{session_id}/finalize` before `expires_at`.
+
+    The file lands in a private staging bucket and is only published by
+    finalize. Files are stored as uploaded (no WebP conversion).
+    """
+    if size > settings.MAX_UPLOAD_SIZE:
+        raise HTTPException(400, f"File too large. Max: {settings.MAX_UPLOAD_SIZE} bytes")
+
+    file_type, mime_type, file_ext = resolve_file_type(filename)
+
+    abort_expired_sessions(db)
+    ensure_bucket_exists(bucket)
+    ensure_bucket_exists(settings.UPLOAD_STAGING_BUCKET, public=False)
+
+    object_name = new_object_name(folder, file_ext)
+    expiry = timedelta(minutes=settings.PRESIGNED_UPLOAD_EXPIRY_MINUTES)
+
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        upload_id="",  # single PUT, no multipart upload
+        bucket=bucket,
+        object_name=object_name,
+        original_filename=filename,
+        file_type=file_type,
+        mime_type=mime_type,
+        total_size=size,
+        chunk_size=size,
+        status="pending",
+        expires_at=datetime.now() + expiry
+    )
+    upload_url = minio_public_client.presigned_put_object(
+        settings.UPLOAD_STAGING_BUCKET, presigned_staging_name(session), expires=expiry
+    )
+    db.add(session)
+    db.commit()
+
+    return {
+        "session_id": session.id,
+        "upload_url": upload_url,
+        "method": "PUT",
+        "headers": {"Content-Type": mime_type},
+        "object_name": object_name,
+        "expires_at": session.expires_at.isoformat()
+    }
+
+
+@router.post("/upload/presigned/{session_id}/finalize")
+async def finalize_presigned_upload(
+    session_id: str,
+    auth = Depends(get_current_user_or_api_key),
+    db: Session = Depends(get_db)
+):
+    """
+    Validate a presigned upload, publish and register the file
+
+    Checks that the object exists, has the announced size and that its
+    content matches the file type, then copies it into the target bucket
+    with the detected Content-Type. On a mismatch the staged object is
+    deleted; the client may PUT again while the URL is valid.
+    """
+    session = db.query(UploadSession).filter(
+        UploadSession.id == session_id,
+        UploadSession.status.in_(["pending", "completed"])
+    ).first()
+
+    if not session:
+        raise HTTPException(404, "Presigned upload not found")
+
+    if session.status == "completed":
+        raise HTTPException(409, {"message": "Upload already finalized", "file_id": session.file_id})
+
+    staging_name = presigned_staging_name(session)
+
+    if session.expires_at and session.expires_at < datetime.now(session.expires_at.tzinfo):
+        try:
+            await run_in_threadpool(minio_client.remove_object, settings.UPLOAD_STAGING_BUCKET, staging_name)
+        except Exception as e:
+            print(f"Could not remove expired presigned upload {session.id}: {e}")
+        session.status = "aborted"
+        db.commit()
+        raise HTTPException(410, "Upload session expired")
+
+    try:
+        stat = await run_in_threadpool(minio_client.stat_object, settings.UPLOAD_STAGING_BUCKET, staging_name)
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchObject"):
+            raise HTTPException(409, "File has not been uploaded yet")
+        raise HTTPException(502, f"Could not check upload: {str(e)}")
+
+    async def reject(message: str):
+        track_upload_error("PresignedValidation")
+        await run_in_threadpool(minio_client.remove_object, settings.UPLOAD_STAGING_BUCKET, staging_name)
+        raise HTTPException(422, message)
+
+    if stat.size != session.total_size:
+        await reject(f"Uploaded {stat.size} bytes, expected {session.total_size}")
+
+    head = await run_in_threadpool(read_object_head, settings.UPLOAD_STAGING_BUCKET, staging_name)
+
+    width, height = None, None
+    if session.file_type == "image":
+        mime_type = sniff_image_type(head)
+        if mime_type and mime_type != "image/svg+xml":
+            try:
+                width, height = Image.open(io.BytesIO(head)).size
+            except Exception:
+                pass
+    else:
+        mime_type = sniff_content_type(head)
+
+    if not mime_type:
+        await reject(f"Content is not a valid {session.file_type} file")
+
+    # Publish with the detected type - the client chose the staged Content-Type
+    try:
+        await run_in_threadpool(
+            minio_client.copy_object,
+            session.bucket,
+            session.object_name,
+            CopySource(settings.UPLOAD_STAGING_BUCKET, staging_name),
+            metadata={"Content-Type": mime_type},
+            metadata_directive=REPLACE
+        )
+        track_storage_operation("presigned_publish", True)
+    except Exception as e:
+        track_storage_operation("presigned_publish", False)
+        raise HTTPException(502, f"Could not publish upload: {str(e)}")
+
+    try:
+        await run_in_threadpool(minio_client.remove_object, settings.UPLOAD_STAGING_BUCKET, staging_name)
+    except Exception as e:
+        print(f"Could not remove staged presigned upload {session.id}: {e}")
+
+    return register_session_file(db, session, mime_type, width, height)
@@ -8,21 +8,38 @@ Enhanced Upload Router with:
 """
 
 from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Query
-from typing import List, Optional
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.concurrency import run_in_threadpool
+from typing import Awaitable, Callable, List, Literal, Optional
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, SessionLocal
 from services import minio_client, ensure_bucket_exists
-from models import UploadedFile, WatermarkConfig
+from ingest import stream_to_minio, download_to_spool, sniff_content_type, peek_head, file_sha256, UploadTooLarge
+from models import UploadedFile, UploadSession, WatermarkConfig, BackgroundJob
+from jobs import create_job, increment_progress, job_status, register_job_handler
+from dedup import content_key, find_duplicate, register_contents, watermark_signature, watermark_version
+from mp4 import MP4_MIME_TYPES, prepare_mp4
+from derivatives import STANDARD_VARIANTS, standard_variant_params, store_derivatives, remove_derivatives
+from transform_cache import invalidate_cached_transforms
+from source_cache import invalidate_source
+from bucket_settings import get_bucket_generate_variants, get_bucket_upload_profile, get_bucket_transform_profile
 from config import settings
-from url_helpers import build_cdn_url, build_transform_url, get_thumbnail_url
+from url_helpers import build_cdn_url, build_transform_url
 from auth import get_current_user_or_api_key, require_admin
 from datetime import datetime
 from pathlib import Path
 from PIL import Image, ImageDraw, ImageFont
+import asyncio
 import hashlib
 import mimetypes
+import secrets
 import io
 import tempfile
+import uuid
+from image_processing import ImagePipeline, render_variants
+from executors import run_image_task, image_queue, QueueSaturated
 from metrics import (
     track_upload, track_upload_error, track_storage_operation,
     track_watermark
@@ -36,216 +53,138 @@ def get_file_hash(file_content: bytes) -> str:
     return hashlib.sha256(file_content).hexdigest()[:16]
 
 
-def convert_image_to_webp(file_content: bytes, quality: int = 85) -> tuple[bytes, int, int]:
-    """
-    Convert images to WebP format
-    Returns: (webp_content, width, height)
-    """
-    try:
-        img = Image.open(io.BytesIO(file_content))
-        
-        if img.mode in ('RGBA', 'LA', 'P'):
-            pass
-        elif img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        output = io.BytesIO()
-        img.save(output, format='WEBP', quality=quality, method=6)
-        webp_content = output.getvalue()
-        
-        width, height = img.size
-        
-        return webp_content, width, height
-    except Exception as e:
-        raise HTTPException(500, f"Image conversion failed: {str(e)}")
+def build_object_name(folder: str, filename: str) -> str:
+    """Prefix filename with the (optional) target folder"""
+    if folder:
+        return f"{folder.strip('/')}/{filename}"
+    return filename
+
+
+def build_upload_result(
+    db_file: UploadedFile,
+    original_filename: str,
+    content_hash: str,
+    deduplicated: bool = False
+) -> dict:
+    """Per-file entry of the upload response"""
+    bucket = db_file.bucket
+    object_name = db_file.path[len(bucket) + 2:]  # path is "/{bucket}/{object_name}"
+    
+    result = {
+        "success": True,
+        "file_id": db_file.id,
+        "filename": db_file.filename,
+        "original_filename": original_filename,
+        "cdn_url": db_file.cdn_url,
+        "size": db_file.size,
+        "sha256": content_hash,
+        "type": db_file.file_type,
+        "dimensions": {"width": db_file.width, "height": db_file.height} if db_file.width else None,
+        "deduplicated": deduplicated
+    }
+    
+    if db_file.file_type == "video" and db_file.duration:
+        result["duration"] = db_file.duration
+    
+    # Add transform URLs for images
+    if db_file.file_type == "image":
+        result["transform_urls"] = {
+            name: build_transform_url(bucket, object_name, **params)
+            for name, params in STANDARD_VARIANTS.items()
+        }
+    
+    return result
 
 
-def apply_watermark(
-    image_content: bytes,
-    watermark_path: str,
-    position: str = "bottom-right",
-    opacity: int = 70,
-    padding: int = 10
-) -> bytes:
+def save_uploaded_files(db: Session, staged: list[dict]):
     """
-    Apply watermark to image from file path
+    Insert the UploadedFile rows of a batch in a single transaction
     
-    position: top-left, top-right, bottom-left, bottom-right, center
-    opacity: 0-100
+    Normally one INSERT ... RETURNING id for all files plus one INSERT for the
+    dedup index, then one commit. If the bulk insert fails, every row is
+    retried in its own savepoint so a bad row only fails its own file.
+    Sets "file_id" (success) or "error" (failure) on each staged item.
     """
+    stmt = insert(UploadedFile).returning(UploadedFile.id, sort_by_parameter_order=True)
+    
     try:
-        # Open images
-        base_image = Image.open(io.BytesIO(image_content))
-        
-        if base_image.mode != 'RGBA':
-            base_image = base_image.convert('RGBA')
-        
-        # Check if watermark exists
-        if not Path(watermark_path).exists():
-            raise HTTPException(400, f"Watermark file not found: {watermark_path}")
-        
-        watermark = Image.open(watermark_path).convert('RGBA')
-        
-        # Calculate watermark size (max 20% of image width)
-        max_wm_width = int(base_image.width * 0.2)
-        if watermark.width > max_wm_width:
-            ratio = max_wm_width / watermark.width
-            new_size = (max_wm_width, int(watermark.height * ratio))
-            watermark = watermark.resize(new_size, Image.Resampling.LANCZOS)
-        
-        # Adjust opacity
-        alpha = watermark.split()[3]
-        alpha = alpha.point(lambda p: int(p * (opacity / 100)))
-        watermark.putalpha(alpha)
-        
-        # Calculate position
-        wm_width, wm_height = watermark.size
-        base_width, base_height = base_image.size
-        
-        if position == "top-left":
-            pos = (padding, padding)
-        elif position == "top-right":
-            pos = (base_width - wm_width - padding, padding)
-        elif position == "bottom-left":
-            pos = (padding, base_height - wm_height - padding)
-        elif position == "bottom-right":
-            pos = (base_width - wm_width - padding, base_height - wm_height - padding)
-        elif position == "center":
-            pos = ((base_width - wm_width) // 2, (base_height - wm_height) // 2)
-        else:
-            pos = (base_width - wm_width - padding, base_height - wm_height - padding)
-        
-        # Create transparent layer and paste watermark
-        transparent = Image.new('RGBA', base_image.size, (0, 0, 0, 0))
-        transparent.paste(watermark, pos, watermark)
-        
-        # Composite
-        watermarked = Image.alpha_composite(base_image, transparent)
-        
-        # Convert back to RGB if needed
-        if watermarked.mode == 'RGBA':
-            watermarked = watermarked.convert('RGB')
-        
-        # Save to bytes
-        output = io.BytesIO()
-        watermarked.save(output, format='WEBP', quality=85)
-        
-        return output.getvalue()
-        
+        if staged:
+            file_ids = db.execute(stmt, [item["row"] for item in staged]).scalars().all()
+            for item, file_id in zip(staged, file_ids):
+                item["file_id"] = file_id
+            register_contents(db, [
+                {"content_key": item["dedup_key"], "sha256": item["content_hash"], "file_id": item["file_id"]}
+                for item in staged
+            ])
+        db.commit()
+        return
     except Exception as e:
-        raise HTTPException(500, f"Watermark failed: {str(e)}")
+        db.rollback()
+        print(f"Bulk insert failed, retrying rows one by one: {e}")
+    
+    for item in staged:
+        item.pop("file_id", None)
+        try:
+            with db.begin_nested():
+                item["file_id"] = db.execute(stmt, [item["row"]]).scalar_one()
+                register_contents(db, [{
+                    "content_key": item["dedup_key"],
+                    "sha256": item["content_hash"],
+                    "file_id": item["file_id"]
+                }])
+        except Exception as e:
+            item.pop("file_id", None)
+            print(f"Could not register {item['row']['path']}: {e}")
+            item["error"] = "Could not register the file, please retry"
+            track_upload_error(str(type(e).__name__))
+    db.commit()
 
 
-def apply_watermark_from_db(
-    image_content: bytes,
-    watermark_data: bytes,
-    position: str = "bottom-right",
-    opacity: int = 70,
-    scale_percent: int = 20,
-    padding: int = 10
-) -> bytes:
-    """
-    Apply watermark to image from database blob
-    
-    position: top-left, top-right, bottom-left, bottom-right, center
-    opacity: 0-100
-    scale_percent: size as percentage of image width
-    """
+def remove_stored_upload(bucket: str, object_name: str):
+    """Delete the object and derivatives of an upload that is not registered (best effort)"""
     try:
-        # Open images
-        base_image = Image.open(io.BytesIO(image_content))
-        
-        if base_image.mode != 'RGBA':
-            base_image = base_image.convert('RGBA')
-        
-        # Load watermark from bytes
-        watermark = Image.open(io.BytesIO(watermark_data)).convert('RGBA')
-        
-        # Calculate watermark size based on scale_percent
-        max_wm_width = int(base_image.width * (scale_percent / 100))
-        if watermark.width > max_wm_width:
-            ratio = max_wm_width / watermark.width
-            new_size = (max_wm_width, int(watermark.height * ratio))
-            watermark = watermark.resize(new_size, Image.Resampling.LANCZOS)
-        
-        # Adjust opacity
-        alpha = watermark.split()[3]
-        alpha = alpha.point(lambda p: int(p * (opacity / 100)))
-        watermark.putalpha(alpha)
-        
-        # Calculate position
-        wm_width, wm_height = watermark.size
-        base_width, base_height = base_image.size
-        
-        if position == "top-left":
-            pos = (padding, padding)
-        elif position == "top-right":
-            pos = (base_width - wm_width - padding, padding)
-        elif position == "bottom-left":
-            pos = (padding, base_height - wm_height - padding)
-        elif position == "bottom-right":
-            pos = (base_width - wm_width - padding, base_height - wm_height - padding)
-        elif position == "center":
-            pos = ((base_width - wm_width) // 2, (base_height - wm_height) // 2)
-        else:
-            pos = (base_width - wm_width - padding, base_height - wm_height - padding)
-        
-        # Create transparent layer and paste watermark
-        transparent = Image.new('RGBA', base_image.size, (0, 0, 0, 0))
-        transparent.paste(watermark, pos, watermark)
-        
-        # Composite
-        watermarked = Image.alpha_composite(base_image, transparent)
-        
-        # Convert back to RGB if needed
-        if watermarked.mode == 'RGBA':
-            watermarked = watermarked.convert('RGB')
-        
-        # Save to bytes
-        output = io.BytesIO()
-        watermarked.save(output, format='WEBP', quality=85)
-        
-        return output.getvalue()
-        
+        minio_client.remove_object(bucket, object_name)
+        remove_derivatives(bucket, object_name)
     except Exception as e:
-        raise HTTPException(500, f"Watermark failed: {str(e)}")
+        print(f"Could not remove unregistered upload {bucket}/{object_name}: {e}")
 
 
-@router.post("/upload/multi")
-async def upload_multiple_files(
-    files: List[UploadFile] = File(...),
-    bucket: str = Form(default=settings.MINIO_DEFAULT_BUCKET),
-    folder: str = Form(default=""),
-    apply_watermark_flag: bool = Form(default=False),
-    watermark_position: str = Form(default="bottom-right"),
-    auth = Depends(get_current_user_or_api_key),
-    db: Session = Depends(get_db)
-):
+async def ingest_files(
+    files: List[UploadFile],
+    bucket: str,
+    folder: str,
+    apply_watermark_flag: bool,
+    watermark_position: str,
+    db: Session,
+    on_file_done: Optional[Callable[[], Awaitable[None]]] = None,
+    generate_variants: Optional[bool] = None,
+    webp_profile: Optional[str] = None
+) -> dict:
     """
-    🚀 Multi-file upload endpoint
-    
-    - Supports JWT token or API key authentication
-    - Automatic WebP conversion for images
-    - Optional watermark application
-    - Batch processing
+    Convert, store and register a batch of files
     
-    **Authentication:**
-    - Header: `Authorization: Bearer <jwt_token>`
-    - OR Header: `X-API-Key: <api_key>`
+    Shared by the synchronous upload endpoints and background upload jobs.
+    on_file_done is awaited after each file has been processed (progress).
+    generate_variants: render the standard variants at ingest
+    (None = bucket default).
+    webp_profile: WebP encoder profile for stored images (None = bucket default).
     """
     
-    if not files:
-        raise HTTPException(400, "No files provided")
-    
-    if len(files) > 50:
-        raise HTTPException(400, "Maximum 50 files per request")
-    
-    results = []
-    errors = []
+    # Refuse the batch up front if the image pool is already saturated
+    if any(Path(f.filename or "").suffix.lower() in settings.ALLOWED_IMAGE_EXTENSIONS for f in files):
+        image_queue.check_capacity()
     
     # Ensure bucket exists
     ensure_bucket_exists(bucket)
     
+    if generate_variants is None:
+        generate_variants = get_bucket_generate_variants(db, bucket)
+    if generate_variants:
+        # Rendered like /api/transform would for this bucket
+        variant_params = standard_variant_params(get_bucket_transform_profile(db, bucket))
+    
+    webp_profile = webp_profile or get_bucket_upload_profile(db, bucket)
+    
     # Get watermark config from database if watermark is enabled
     watermark_data = None
     watermark_config = None
@@ -266,158 +205,298 @@ async def upload_multiple_files(
                 watermark_data = watermark_config.logo_data
                 print(f"[WATERMARK DEBUG] Watermark data loaded, size: {len(watermark_data)} bytes")
     
-    for file in files:
-        try:
-            # Read file
-            file_content = await file.read()
-            file_size = len(file_content)
-            
-            if file_size > settings.MAX_UPLOAD_SIZE:
-                errors.append({
-                    "filename": file.filename,
-                    "error": f"File too large. Max: {settings.MAX_UPLOAD_SIZE} bytes"
-                })
-                continue
-            
-            # Validate file type
-            file_ext = Path(file.filename).suffix.lower()
-            mime_type = mimetypes.guess_type(file.filename)[0] or "application/octet-stream"
-            original_ext = file_ext
-            
-            if file_ext in settings.ALLOWED_IMAGE_EXTENSIONS:
-                file_type = "image"
-            elif file_ext in settings.ALLOWED_VIDEO_EXTENSIONS:
-                file_type = "video"
-            else:
-                errors.append({
-                    "filename": file.filename,
-                    "error": f"File type not allowed: {file_ext}"
-                })
-                continue
-            
-            # Process images
-            width, height = None, None
-            if file_type == "image":
-                try:
-                    # Convert to WebP
-                    file_content, width, height = convert_image_to_webp(file_content, quality=85)
-                    file_ext = ".webp"
-                    mime_type = "image/webp"
+    # One decode/encode pass per image: orientation, optional watermark, WebP
+    upload_pipeline = ImagePipeline().orient()
+    if watermark_data:
+        upload_pipeline.watermark(
+            watermark_data,
+            position=watermark_config.position or watermark_position,
+            opacity=int(watermark_config.opacity * 100) if watermark_config.opacity else 70,
+            scale_percent=watermark_config.scale_percent or 20,
+            version=watermark_version(watermark_config)
+        )
+    
+    # Processing options that shape the stored image (part of the dedup key)
+    image_signature = f"webp:q85:{webp_profile}:oriented"
+    if watermark_data:
+        image_signature += "|" + watermark_signature(
+            watermark_config, watermark_config.position or watermark_position
+        )
+    
+    # Process files concurrently: CPU work of one file overlaps with the
+    # storage upload of another. Results keep the order of `files`.
+    semaphore = asyncio.Semaphore(settings.UPLOAD_CONCURRENCY)
+    
+    async def process_file(file: UploadFile) -> tuple[Optional[dict], Optional[dict]]:
+        """Upload one file, returns (result, error)"""
+        async with semaphore:
+            try:
+                # Reject oversized files before touching the body
+                if file.size is not None and file.size > settings.MAX_UPLOAD_SIZE:
+                    return None, {
+                        "filename": file.filename,
+                        "error": f"File too large. Max: {settings.MAX_UPLOAD_SIZE} bytes"
+                    }
+                
+                # Validate file type
+                file_ext = Path(file.filename).suffix.lower()
+                mime_type = mimetypes.guess_type(file.filename)[0] or "application/octet-stream"
+                original_ext = file_ext
+                
+                if file_ext in settings.ALLOWED_IMAGE_EXTENSIONS:
+                    file_type = "image"
+                elif file_ext in settings.ALLOWED_VIDEO_EXTENSIONS:
+                    file_type = "video"
+                else:
+                    return None, {
+                        "filename": file.filename,
+                        "error": f"File type not allowed: {file_ext}"
+                    }
+                
+                width, height, duration = None, None, None
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                
+                if file_type == "video":
+                    # Stream videos from the upload spool into MinIO, never holding
+                    # the whole file in memory. The object name uses a random token,
+                    # the content hash is taken from the spool before storing.
+                    safe_filename = f"{timestamp}_{secrets.token_hex(8)}{file_ext}"
+                    object_name = build_object_name(folder, safe_filename)
+                    mime_type = sniff_content_type(peek_head(file.file)) or mime_type
+                    
+                    # Already stored? Hand out the existing file, nothing is written.
+                    # sha256 and dedup refer to the upload, not a remuxed copy.
+                    content_hash = await run_in_threadpool(file_sha256, file.file)
+                    dedup_key = content_key(content_hash, bucket, "raw")
+                    duplicate = find_duplicate(db, dedup_key)
+                    if duplicate:
+                        return {"result": build_upload_result(duplicate, file.filename, content_hash, deduplicated=True)}, None
+                    
+                    # MP4/MOV: move a trailing moov box to the front (faststart)
+                    # and read duration/dimensions from the container headers
+                    video_file = file.file
+                    if mime_type in MP4_MIME_TYPES:
+                        video_file, video_info = await run_in_threadpool(prepare_mp4, file.file)
+                        width, height, duration = video_info.width, video_info.height, video_info.duration
+                        if video_info.faststart:
+                            print(f"🎬 Faststart remux: moved moov to front for {file.filename}")
+                    
+                    try:
+                        stream = await run_in_threadpool(
+                            stream_to_minio, bucket, object_name, video_file, mime_type
+                        )
+                        track_storage_operation("put", True)
+                    except UploadTooLarge as e:
+                        track_storage_operation("put", False)
+                        return None, {"filename": file.filename, "error": str(e)}
+                    except Exception as e:
+                        track_storage_operation("put", False)
+                        raise
+                    finally:
+                        if video_file is not file.file:
+                            video_file.close()
+                    
+                    file_size = stream.size
+                
+                else:
+                    file_content = await file.read()
                     file_size = len(file_content)
                     
-                    # Apply watermark if enabled and available
-                    if apply_watermark_flag and watermark_data:
-                        print(f"[WATERMARK DEBUG] Applying watermark to {file.filename}")
+                    if file_size > settings.MAX_UPLOAD_SIZE:
+                        return None, {
+                            "filename": file.filename,
+                            "error": f"File too large. Max: {settings.MAX_UPLOAD_SIZE} bytes"
+                        }
+                    
+                    # Same original with the same processing already stored?
+                    # Then skip conversion and storage entirely.
+                    content_hash = hashlib.sha256(file_content).hexdigest()
+                    dedup_key = content_key(content_hash, bucket, image_signature)
+                    duplicate = find_duplicate(db, dedup_key)
+                    if duplicate:
+                        return {"result": build_upload_result(duplicate, file.filename, content_hash, deduplicated=True)}, None
+                    
+                    rendered = None
+                    try:
+                        # Decode, orient, watermark and encode to WebP in one pass,
+                        # plus the standard variants (process pool, keeps the event loop free)
                         try:
-                            file_content = apply_watermark_from_db(
-                                file_content,
-                                watermark_data,
-                                position=watermark_config.position or watermark_position,
-                                opacity=int(watermark_config.opacity * 100) if watermark_config.opacity else 70,
-                                scale_percent=watermark_config.scale_percent or 20
+                            if upload_pipeline.has("watermark"):
+                                print(f"[WATERMARK DEBUG] Applying watermark to {file.filename}")
+                            file_content, width, height, rendered = await run_image_task(
+                                "upload_pipeline", upload_pipeline.run_with_variants, file_content,
+                                variant_params if generate_variants else {}, quality=85, profile=webp_profile
                             )
-                            file_size = len(file_content)
-                            print(f"[WATERMARK DEBUG] Watermark applied successfully to {file.filename}")
-                            track_watermark("applied")
+                            if upload_pipeline.has("watermark"):
+                                print(f"[WATERMARK DEBUG] Watermark applied successfully to {file.filename}")
+                                track_watermark("applied")
+                        except QueueSaturated:
+                            raise
                         except Exception as e:
+                            if not upload_pipeline.has("watermark"):
+                                raise
+                            # Store the converted image without watermark rather than the original
                             print(f"[WATERMARK ERROR] Watermark failed for {file.filename}: {e}")
                             track_watermark("failed")
-                            import traceback
-                            traceback.print_exc()
-                    elif apply_watermark_flag:
-                        print(f"[WATERMARK DEBUG] Watermark flag set but no watermark data available")
-                        track_watermark("skipped")
+                            file_content, width, height, rendered = await run_image_task(
+                                "upload_pipeline", upload_pipeline.without("watermark").run_with_variants,
+                                file_content, variant_params if generate_variants else {},
+                                quality=85, profile=webp_profile
+                            )
+                        
+                        file_ext = ".webp"
+                        mime_type = "image/webp"
+                        file_size = len(file_content)
+                        
+                        if apply_watermark_flag and not watermark_data:
+                            print(f"[WATERMARK DEBUG] Watermark flag set but no watermark data available")
+                            track_watermark("skipped")
+                        
+                    except QueueSaturated:
+                        raise
+                    except Exception as e:
+                        print(f"Image processing failed for {file.filename}, keeping original: {e}")
+                        if not width:
+                            try:
+                                img = Image.open(io.BytesIO(file_content))
+                                width, height = img.size
+                            except:
+                                pass
+                    
+                    # Generate unique filename
+                    file_hash = get_file_hash(file_content)
+                    safe_filename = f"{timestamp}_{file_hash}{file_ext}"
+                    object_name = build_object_name(folder, safe_filename)
                     
-                except Exception as e:
-                    print(f"Image processing failed for {file.filename}, keeping original: {e}")
-                    if not width:
+                    # Upload to MinIO
+                    from io import BytesIO
+                    try:
+                        stored = await run_in_threadpool(
+                            minio_client.put_object,
+                            bucket,
+                            object_name,
+                            BytesIO(file_content),
+                            length=file_size,
+                            content_type=mime_type
+                        )
+                        track_storage_operation("put", True)
+                    except Exception as e:
+                        track_storage_operation("put", False)
+                        raise
+                    
+                    # The standard variants were rendered from the pipeline's decode; if
+                    # it did not run (original kept), decode the stored file once.
+                    # Optional: on failure /api/transform renders them on demand.
+                    if generate_variants:
                         try:
-                            img = Image.open(io.BytesIO(file_content))
-                            width, height = img.size
-                        except:
-                            pass
-            
-            # Generate unique filename
-            file_hash = get_file_hash(file_content)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            safe_filename = f"{timestamp}_{file_hash}{file_ext}"
-            
-            # Build path
-            if folder:
-                object_name = f"{folder.strip('/')}/{safe_filename}"
-            else:
-                object_name = safe_filename
-            
-            # Upload to MinIO
-            from io import BytesIO
-            try:
-                minio_client.put_object(
-                    bucket,
-                    object_name,
-                    BytesIO(file_content),
-                    length=file_size,
-                    content_type=mime_type
-                )
-                track_storage_operation("put", True)
+                            if not rendered:
+                                rendered = await run_image_task(
+                                    "derivatives", render_variants, file_content, variant_params
+                                )
+                            await run_in_threadpool(
+                                store_derivatives, bucket, object_name, variant_params, rendered, stored.etag
+                            )
+                            track_storage_operation("derivatives", True)
+                        except Exception as e:
+                            track_storage_operation("derivatives", False)
+                            print(f"Derivative generation failed for {file.filename}: {e}")
+                
+                # Stage the database row - the whole batch is inserted at once below
+                return {
+                    "row": {
+                        "filename": safe_filename,
+                        "original_filename": file.filename,
+                        "bucket": bucket,
+                        "path": f"/{bucket}/{object_name}",
+                        "size": file_size,
+                        "mime_type": mime_type,
+                        "file_type": file_type,
+                        "cdn_url": build_cdn_url(bucket, object_name),
+                        "width": width,
+                        "height": height,
+                        "duration": duration,
+                        "created_at": datetime.now(),
+                        "is_active": True  # Explicitly set to ensure it's not NULL
+                    },
+                    "object_name": object_name,
+                    "dedup_key": dedup_key,
+                    "content_hash": content_hash
+                }, None
+                
+            except QueueSaturated:
+                raise  # Fails the whole request with 503 + Retry-After
             except Exception as e:
-                track_storage_operation("put", False)
-                raise
-            
-            # Build CDN URL
-            cdn_url = build_cdn_url(bucket, object_name)
-            
-            # Save to database
-            db_file = UploadedFile(
-                filename=safe_filename,
-                original_filename=file.filename,
-                bucket=bucket,
-                path=f"/{bucket}/{object_name}",
-                size=file_size,
-                mime_type=mime_type,
-                file_type=file_type,
-                cdn_url=cdn_url,
-                width=width,
-                height=height,
-                created_at=datetime.now(),
-                is_active=True  # Explicitly set to ensure it's not NULL
-            )
-            
-            db.add(db_file)
-            db.commit()
-            db.refresh(db_file)
-            
-            # Track successful upload
-            track_upload(file_type, bucket, file_size)
-            
-            # Build result
-            result = {
-                "success": True,
-                "file_id": db_file.id,
-                "filename": safe_filename,
-                "original_filename": file.filename,
-                "cdn_url": cdn_url,
-                "size": file_size,
-                "type": file_type,
-                "dimensions": {"width": width, "height": height} if width else None
-            }
-            
-            # Add transform URLs for images
-            if file_type == "image":
-                result["transform_urls"] = {
-                    "thumbnail": get_thumbnail_url(bucket, object_name, size=400),
-                    "preview": build_transform_url(bucket, object_name, w=800, format='webp'),
-                    "large": build_transform_url(bucket, object_name, w=1600, format='webp'),
-                    "original_webp": build_transform_url(bucket, object_name, format='webp', quality=90)
+                track_upload_error(str(type(e).__name__))
+                return None, {
+                    "filename": file.filename,
+                    "error": str(e)
                 }
-            
-            results.append(result)
-            
-        except Exception as e:
-            track_upload_error(str(type(e).__name__))
-            errors.append({
-                "filename": file.filename,
-                "error": str(e)
-            })
+    
+    async def process_and_report(file: UploadFile):
+        outcome = await process_file(file)
+        if on_file_done:
+            await on_file_done()
+        return outcome
+    
+    outcomes = await asyncio.gather(*(process_and_report(file) for file in files), return_exceptions=True)
+    
+    failure = next((o for o in outcomes if isinstance(o, QueueSaturated)), None) \
+        or next((o for o in outcomes if isinstance(o, BaseException)), None)
+    if failure:
+        # The batch is refused as a whole - drop what other files already stored
+        for outcome in outcomes:
+            if isinstance(outcome, tuple) and outcome[0] and "object_name" in outcome[0]:
+                await run_in_threadpool(remove_stored_upload, bucket, outcome[0]["object_name"])
+        raise failure
+    
+    # One transaction for all rows of the batch. Identical files of the batch
+    # share one row: the index only knows them after the insert.
+    staged = []
+    first_by_key = {}
+    for outcome, _ in outcomes:
+        if outcome and "row" in outcome:
+            first = first_by_key.setdefault(outcome["dedup_key"], outcome)
+            if first is outcome:
+                staged.append(outcome)
+            else:
+                outcome["duplicate_of"] = first
+    save_uploaded_files(db, staged)
+    
+    results = []
+    errors = []
+    for outcome, error in outcomes:
+        if error:
+            errors.append(error)
+        elif "error" in outcome:
+            # Stored, but the row could not be written - remove the orphan object
+            # (unless another file of the batch landed on the same object name)
+            if not any("file_id" in item and item["object_name"] == outcome["object_name"] for item in staged):
+                await run_in_threadpool(remove_stored_upload, bucket, outcome["object_name"])
+            errors.append({"filename": outcome["row"]["original_filename"], "error": outcome["error"]})
+        elif "duplicate_of" in outcome:
+            # Same content as an earlier file of this batch: hand out its row
+            first = outcome["duplicate_of"]
+            if outcome["object_name"] != first["object_name"]:
+                await run_in_threadpool(remove_stored_upload, bucket, outcome["object_name"])
+            if "file_id" in first:
+                results.append(build_upload_result(
+                    UploadedFile(id=first["file_id"], **first["row"]),
+                    outcome["row"]["original_filename"],
+                    outcome["content_hash"],
+                    deduplicated=True
+                ))
+            else:
+                errors.append({"filename": outcome["row"]["original_filename"], "error": first["error"]})
+        elif "row" in outcome:
+            row = outcome["row"]
+            track_upload(row["file_type"], bucket, row["size"])
+            results.append(build_upload_result(
+                UploadedFile(id=outcome["file_id"], **row),
+                row["original_filename"],
+                outcome["content_hash"]
+            ))
+        else:
+            results.append(outcome["result"])
     
     return {
         "success": len(results) > 0,
@@ -428,6 +507,180 @@ async def upload_multiple_files(
     }
 
 
+async def enqueue_upload_job(
+    files: List[UploadFile],
+    bucket: str,
+    folder: str,
+    apply_watermark_flag: bool,
+    watermark_position: str,
+    generate_variants: Optional[bool],
+    webp_profile: Optional[str],
+    auth,
+    db: Session
+) -> JSONResponse:
+    """Stage raw uploads in the private staging bucket and queue an upload job"""
+    ensure_bucket_exists(settings.UPLOAD_STAGING_BUCKET, public=False)
+    
+    job_prefix = uuid.uuid4().hex
+    staged_files = []
+    try:
+        for index, file in enumerate(files):
+            object_name = f"{job_prefix}/{index}_{Path(file.filename or 'file').name}"
+            reader = await run_in_threadpool(
+                stream_to_minio,
+                settings.UPLOAD_STAGING_BUCKET,
+                object_name,
+                file.file,
+                file.content_type or "application/octet-stream"
+            )
+            staged_files.append({
+                "object_name": object_name,
+                "filename": file.filename,
+                "content_type": file.content_type,
+                "size": reader.size
+            })
+        track_storage_operation("stage", True)
+    except UploadTooLarge as e:
+        remove_staged_files(staged_files)
+        raise HTTPException(400, str(e))
+    except Exception as e:
+        track_storage_operation("stage", False)
+        remove_staged_files(staged_files)
+        raise HTTPException(500, f"Could not stage upload: {str(e)}")
+    
+    job = create_job(
+        db,
+        "upload",
+        {
+            "bucket": bucket,
+            "folder": folder,
+            "apply_watermark_flag": apply_watermark_flag,
+            "watermark_position": watermark_position,
+            "generate_variants": generate_variants,
+            "webp_profile": webp_profile,
+            "files": staged_files
+        },
+        total_items=len(staged_files),
+        created_by=getattr(auth, "username", None) or getattr(auth, "name", None)
+    )
+    
+    return JSONResponse(status_code=202, content={
+        "job_id": job.id,
+        "status": job.status,
+        "total": job.total_items,
+        "status_url": f"/api/upload/jobs/{job.id}"
+    })
+
+
+def remove_staged_files(staged_files: list[dict]):
+    """Delete staged payloads (best effort)"""
+    for item in staged_files:
+        try:
+            minio_client.remove_object(settings.UPLOAD_STAGING_BUCKET, item["object_name"])
+        except Exception as e:
+            print(f"Could not remove staged file {item['object_name']}: {e}")
+
+
+async def process_upload_job(job_id: str, params: dict) -> dict:
+    """Background handler: run staged files through the regular ingest path"""
+    files = []
+    try:
+        for item in params["files"]:
+            spool = await run_in_threadpool(download_to_spool, settings.UPLOAD_STAGING_BUCKET, item["object_name"])
+            files.append(UploadFile(
+                spool,
+                filename=item["filename"],
+                size=item["size"],
+                headers=Headers({"content-type": item["content_type"] or "application/octet-stream"})
+            ))
+        
+        async def report_progress():
+            await run_in_threadpool(increment_progress, job_id)
+        
+        db = SessionLocal()
+        try:
+            result = await ingest_files(
+                files,
+                params["bucket"],
+                params["folder"],
+                params["apply_watermark_flag"],
+                params["watermark_position"],
+                db,
+                on_file_done=report_progress,
+                generate_variants=params.get("generate_variants"),
+                webp_profile=params.get("webp_profile")
+            )
+        finally:
+            db.close()
+    except Exception:
+        # A failed job is not retried, its payloads would stay in staging for good
+        await run_in_threadpool(remove_staged_files, params["files"])
+        raise
+    finally:
+        for file in files:
+            file.file.close()
+    
+    # Only after a finished or failed run - a crashed or cancelled worker
+    # leaves them for the retry (requeue_stale_jobs)
+    await run_in_threadpool(remove_staged_files, params["files"])
+    return result
+
+
+register_job_handler("upload", process_upload_job, concurrency=settings.UPLOAD_JOB_WORKERS)
+
+
+@router.post("/upload/multi")
+async def upload_multiple_files(
+    files: List[UploadFile] = File(...),
+    bucket: str = Form(default=settings.MINIO_DEFAULT_BUCKET),
+    folder: str = Form(default=""),
+    apply_watermark_flag: bool = Form(default=False),
+    watermark_position: str = Form(default="bottom-right"),
+    async_mode: bool = Form(default=False),
+    generate_variants: Optional[bool] = Form(default=None),
+    webp_profile: Optional[Literal["fast", "balanced", "max"]] = Form(default=None),
+    auth = Depends(get_current_user_or_api_key),
+    db: Session = Depends(get_db)
+):
+    """
+    🚀 Multi-file upload endpoint
+    
+    - Supports JWT token or API key authentication
+    - Automatic WebP conversion for images
+    - Videos are streamed to storage (constant memory per upload)
+    - Optional watermark application
+    - Batch processing (files run concurrently, up to UPLOAD_CONCURRENCY)
+    - `async_mode=true`: files are staged and processed in the background.
+      Returns 202 with a job id, poll `GET /api/upload/jobs/{job_id}`
+    - `generate_variants`: render thumbnail/preview/large/original_webp at
+      upload (default: bucket setting)
+    - `webp_profile`: WebP encoder effort - fast, balanced or max
+      (default: bucket setting, then UPLOAD_WEBP_PROFILE)
+    
+    **Authentication:**
+    - Header: `Authorization: Bearer <jwt_token>`
+    - OR Header: `X-API-Key: <api_key>`
+    """
+    
+    if not files:
+        raise HTTPException(400, "No files provided")
+    
+    if len(files) > 50:
+        raise HTTPException(400, "Maximum 50 files per request")
+    
+    if async_mode:
+        return await enqueue_upload_job(
+            files, bucket, folder, apply_watermark_flag, watermark_position,
+            generate_variants, webp_profile, auth, db
+        )
+    
+    return await ingest_files(
+        files, bucket, folder, apply_watermark_flag, watermark_position, db,
+        generate_variants=generate_variants,
+        webp_profile=webp_profile
+    )
+
+
 @router.post("/upload")
 async def upload_single_file(
     file: UploadFile = File(...),
@@ -435,6 +688,8 @@ async def upload_single_file(
     folder: str = Form(default=""),
     apply_watermark_flag: bool = Form(default=False),
     watermark_position: str = Form(default="bottom-right"),
+    generate_variants: Optional[bool] = Form(default=None),
+    webp_profile: Optional[Literal["fast", "balanced", "max"]] = Form(default=None),
     auth = Depends(get_current_user_or_api_key),
     db: Session = Depends(get_db)
 ):
@@ -446,14 +701,10 @@ async def upload_single_file(
     - OR Header: `X-API-Key: <api_key>`
     """
     
-    result = await upload_multiple_files(
-        files=[file],
-        bucket=bucket,
-        folder=folder,
-        apply_watermark_flag=apply_watermark_flag,
-        watermark_position=watermark_position,
-        auth=auth,
-        db=db
+    result = await ingest_files(
+        [file], bucket, folder, apply_watermark_flag, watermark_position, db,
+        generate_variants=generate_variants,
+        webp_profile=webp_profile
     )
     
     if result["uploaded"] == 0:
@@ -462,6 +713,29 @@ async def upload_single_file(
     return result["results"][0]
 
 
+@router.get("/upload/jobs/{job_id}")
+async def get_upload_job(
+    job_id: str,
+    auth = Depends(get_current_user_or_api_key),
+    db: Session = Depends(get_db)
+):
+    """
+    Status of an async upload job
+    
+    `status`: queued, processing, completed or failed. Once completed,
+    `result` holds the same payload the synchronous upload returns.
+    """
+    job = db.query(BackgroundJob).filter(
+        BackgroundJob.id == job_id,
+        BackgroundJob.kind == "upload"
+    ).first()
+    
+    if not job:
+        raise HTTPException(404, "Upload job not found")
+    
+    return job_status(job)
+
+
 @router.get("/files")
 async def list_uploaded_files(
     bucket: Optional[str] = Query(None),
@@ -512,15 +786,28 @@ async def delete_uploaded_file(
     if not file_record:
         raise HTTPException(404, "File not found")
     
+    # Delete the row first, so a database error cannot leave a row without object.
+    # Sessions keep their history; tables created before ondelete=SET NULL
+    # need the reference cleared here.
+    db.query(UploadSession).filter(UploadSession.file_id == file_record.id).update(
+        {"file_id": None}, synchronize_session=False
+    )
+    db.delete(file_record)
+    db.flush()
+    
+    object_name = file_record.path[len(file_record.bucket) + 2:]  # path is "/{bucket}/{object_name}"
+    
     # Delete from MinIO
     try:
-        minio_client.remove_object(file_record.bucket, file_record.path)
+        await run_in_threadpool(minio_client.remove_object, file_record.bucket, object_name)
     except Exception as e:
         # Continue even if MinIO deletion fails (file might already be gone)
-        pass
+        print(f"Could not remove {file_record.bucket}/{object_name}: {e}")
+    
+    await run_in_threadpool(remove_derivatives, file_record.bucket, object_name)
+    await run_in_threadpool(invalidate_cached_transforms, file_record.bucket, object_name)
+    await run_in_threadpool(invalidate_source, file_record.bucket, object_name)
     
-    # Delete from database
-    db.delete(file_record)
     db.commit()
     
     return {"message": "File deleted successfully"}
@@ -10,6 +10,7 @@ from database import get_db
 from auth import require_admin
 from models import WatermarkConfig, User
 from typing import Optional
+from datetime import datetime
 
 router = APIRouter()
 
@@ -49,6 +50,7 @@ async def upload_watermark(
             watermark.opacity = opacity
             watermark.scale_percent = scale_percent
             watermark.is_active = True
+            watermark.updated_at = datetime.now()  # new version: cached overlays are not reused
         else:
             # Create new
             watermark = WatermarkConfig(
@@ -139,6 +141,7 @@ async def update_watermark_config(
     watermark.position = position
     watermark.opacity = opacity
     watermark.scale_percent = scale_percent
+    watermark.updated_at = datetime.now()  # new version: cached overlays are not reused
     
     db.commit()
     
@@ -1,6 +1,10 @@
 from minio import Minio
+from minio.error import S3Error
+from typing import Optional
 from config import settings
+import json
 import redis
+import time
 
 # MinIO Client (Origin Storage)
 minio_client = Minio(
@@ -10,33 +14,92 @@ minio_client = Minio(
     secure=settings.MINIO_SECURE
 )
 
+# Signs presigned URLs for clients, so it uses the public endpoint. Signing is
+# local (fixed region) - this client never talks to MinIO itself.
+minio_public_client = Minio(
+    settings.MINIO_PUBLIC_ENDPOINT or settings.MINIO_ENDPOINT,
+    access_key=settings.MINIO_ACCESS_KEY,
+    secret_key=settings.MINIO_SECRET_KEY,
+    secure=settings.MINIO_PUBLIC_SECURE if settings.MINIO_PUBLIC_ENDPOINT else settings.MINIO_SECURE,
+    region=settings.MINIO_REGION
+)
+
 # Redis Client
 redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
 
+# Binary Redis Client (cached image bytes, see transform_cache.py)
+redis_binary_client = redis.from_url(settings.REDIS_URL)
+
+
+# Bucket registry: buckets known to exist (and to be public, if required).
+# Per process; admin bucket endpoints invalidate it, other API workers catch
+# up after BUCKET_REGISTRY_TTL seconds.
+_known_buckets: dict[str, tuple[float, bool]] = {}  # name -> (expires, public)
+
+
+def public_read_policy(bucket_name: str) -> dict:
+    """Bucket policy allowing anonymous GetObject"""
+    return {
+        "Version": "2012-10-17",
+        "Statement": [
+            {
+                "Effect": "Allow",
+                "Principal": {"AWS": "*"},
+                "Action": ["s3:GetObject"],
+                "Resource": [f"arn:aws:s3:::{bucket_name}/*"]
+            }
+        ]
+    }
 
-def ensure_bucket_exists(bucket_name: str):
-    """Erstellt Bucket falls nicht vorhanden"""
+
+def has_public_read(bucket_name: str) -> bool:
+    """True if the current bucket policy already grants anonymous GetObject"""
+    try:
+        policy = json.loads(minio_client.get_bucket_policy(bucket_name))
+    except S3Error as e:
+        if e.code == "NoSuchBucketPolicy":
+            return False
+        raise
+    
+    def as_list(value):
+        return value if isinstance(value, list) else [value]
+    
+    resource = f"arn:aws:s3:::{bucket_name}/*"
+    for statement in policy.get("Statement", []):
+        principal = statement.get("Principal")
+        if statement.get("Effect") == "Allow" \
+                and principal in ("*", {"AWS": "*"}, {"AWS": ["*"]}) \
+                and "s3:GetObject" in as_list(statement.get("Action", [])) \
+                and resource in as_list(statement.get("Resource", [])):
+            return True
+    return False
+
+
+def invalidate_bucket(bucket_name: Optional[str] = None):
+    """Forget a bucket (or all buckets) so the next upload checks MinIO again"""
+    if bucket_name is None:
+        _known_buckets.clear()
+    else:
+        _known_buckets.pop(bucket_name, None)
+
+
+def ensure_bucket_exists(bucket_name: str, public: bool = True):
+    """Erstellt Bucket falls nicht vorhanden (public=False: interner Bucket ohne Public-Policy)"""
+    known = _known_buckets.get(bucket_name)
+    if known and known[0] > time.monotonic() and (known[1] or not public):
+        return True
+    
     try:
         if not minio_client.bucket_exists(bucket_name):
             minio_client.make_bucket(bucket_name)
             print(f"✅ Bucket '{bucket_name}' created")
-            
-        # Set bucket policy to public read
-        from minio.policy import Policy
-        policy = {
-            "Version": "2012-10-17",
-            "Statement": [
-                {
-                    "Effect": "Allow",
-                    "Principal": {"AWS": "*"},
-                    "Action": ["s3:GetObject"],
-                    "Resource": [f"arn:aws:s3:::{bucket_name}/*"]
-                }
-            ]
-        }
-        import json
-        minio_client.set_bucket_policy(bucket_name, json.dumps(policy))
-        print(f"✅ Bucket '{bucket_name}' set to public read")
+        
+        # Set bucket policy to public read (only if it is not already)
+        if public and not has_public_read(bucket_name):
+            minio_client.set_bucket_policy(bucket_name, json.dumps(public_read_policy(bucket_name)))
+            print(f"✅ Bucket '{bucket_name}' set to public read")
+        
+        _known_buckets[bucket_name] = (time.monotonic() + settings.BUCKET_REGISTRY_TTL, public)
         return True
     except Exception as e:
         print(f"❌ Error creating bucket: {e}")
@@ -0,0 +1,164 @@
+"""
+Node-local cache for transform source images
+
+Several variants of the same original (srcset, thumbnails) would otherwise
+download the full object from MinIO once per variant. Sources are kept in
+two tiers, both validated against the MinIO ETag the transform endpoint
+already has:
+
+- Memory: small LRU per API worker (SOURCE_CACHE_MEMORY_SIZE bytes)
+- Disk: directory shared by all API workers of the node, LRU by mtime,
+  capped at SOURCE_CACHE_DISK_SIZE bytes
+
+All functions are blocking - call them from a thread (run_io_task).
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from config import settings
+from ingest import read_object
+from metrics import track_cache
+
+_memory: OrderedDict = OrderedDict()  # (bucket, path) -> (etag, bytes)
+_memory_size = 0
+_memory_lock = threading.Lock()
+
+_disk_lock = threading.Lock()
+_disk_usage: Optional[int] = None  # Estimate, recounted on eviction
+
+
+def source_hash(bucket: str, path: str) -> str:
+    return hashlib.sha1(f"{bucket}/{path}".encode()).hexdigest()
+
+
+def disk_path(bucket: str, path: str, etag: str) -> Path:
+    name = source_hash(bucket, path)
+    return Path(settings.SOURCE_CACHE_DIR) / name[:2] / f"{name}-{etag}"
+
+
+def _memory_get(bucket: str, path: str, etag: str) -> Optional[bytes]:
+    with _memory_lock:
+        entry = _memory.get((bucket, path))
+        if entry is None or entry[0] != etag:
+            return None
+        _memory.move_to_end((bucket, path))
+        return entry[1]
+
+
+def _memory_put(bucket: str, path: str, etag: str, data: bytes):
+    global _memory_size
+    if len(data) > settings.SOURCE_CACHE_MAX_MEMORY_ENTRY:
+        return
+    with _memory_lock:
+        old = _memory.pop((bucket, path), None)
+        if old:
+            _memory_size -= len(old[1])
+        _memory[(bucket, path)] = (etag, data)
+        _memory_size += len(data)
+        while _memory_size > settings.SOURCE_CACHE_MEMORY_SIZE and _memory:
+            _, (_, evicted) = _memory.popitem(last=False)
+            _memory_size -= len(evicted)
+
+
+def _disk_get(bucket: str, path: str, etag: str) -> Optional[bytes]:
+    file_path = disk_path(bucket, path, etag)
+    try:
+        data = file_path.read_bytes()
+        os.utime(file_path)  # LRU: mtime is the last use
+        return data
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        print(f"Source cache read failed: {e}")
+        return None
+
+
+def _disk_put(bucket: str, path: str, etag: str, data: bytes):
+    global _disk_usage
+    file_path = disk_path(bucket, path, etag)
+    try:
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        # Older versions of this source are useless now
+        for stale in file_path.parent.glob(f"{source_hash(bucket, path)}-*"):
+            stale.unlink(missing_ok=True)
+        # Write + rename, so other workers never read a partial file
+        fd, tmp_name = tempfile.mkstemp(dir=file_path.parent, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_name, file_path)
+    except OSError as e:
+        print(f"Source cache write failed: {e}")
+        return
+
+    with _disk_lock:
+        if _disk_usage is None:
+            _disk_usage = _scan_disk_usage()
+        else:
+            _disk_usage += len(data)
+        if _disk_usage > settings.SOURCE_CACHE_DISK_SIZE:
+            _disk_usage = evict_disk(int(settings.SOURCE_CACHE_DISK_SIZE * 0.9))
+
+
+def _cache_files() -> list[tuple[float, int, Path]]:
+    files = []
+    for file_path in Path(settings.SOURCE_CACHE_DIR).glob("*/*"):
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            continue  # Evicted by another worker meanwhile
+        files.append((stat.st_mtime, stat.st_size, file_path))
+    return files
+
+
+def _scan_disk_usage() -> int:
+    return sum(size for _, size, _ in _cache_files())
+
+
+def evict_disk(target_size: int) -> int:
+    """Delete least recently used files until the cache fits target_size, returns the new size"""
+    files = sorted(_cache_files())
+    total = sum(size for _, size, _ in files)
+    for _, size, file_path in files:
+        if total <= target_size:
+            break
+        file_path.unlink(missing_ok=True)
+        total -= size
+    return total
+
+
+def get_source(bucket: str, path: str, etag: str) -> bytes:
+    """Source image bytes for the given ETag: memory, then disk, then MinIO"""
+    data = _memory_get(bucket, path, etag)
+    if data is None and settings.SOURCE_CACHE_DIR:
+        data = _disk_get(bucket, path, etag)
+        if data is not None:
+            _memory_put(bucket, path, etag, data)
+
+    if data is not None:
+        track_cache(True, "transform_source")
+        return data
+
+    track_cache(False, "transform_source")
+    data = read_object(bucket, path)
+    _memory_put(bucket, path, etag, data)
+    if settings.SOURCE_CACHE_DIR:
+        _disk_put(bucket, path, etag, data)
+    return data
+
+
+def invalidate_source(bucket: str, path: str):
+    """Drop a source from both tiers (file deleted)"""
+    global _memory_size
+    with _memory_lock:
+        old = _memory.pop((bucket, path), None)
+        if old:
+            _memory_size -= len(old[1])
+    if settings.SOURCE_CACHE_DIR:
+        name = source_hash(bucket, path)
+        for file_path in (Path(settings.SOURCE_CACHE_DIR) / name[:2]).glob(f"{name}-*"):
+            file_path.unlink(missing_ok=True)
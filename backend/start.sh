@@ -21,6 +21,7 @@ echo "🌐 Starting FastAPI server..."
 # --limit-max-requests 0: No request limit (default: 0)
 # --timeout-keep-alive 650: Keep-alive timeout for large uploads (10min+50s buffer)
 # --limit-concurrency 1000: Max concurrent connections
-exec uvicorn main:app --host 0.0.0.0 --port 8000 --workers 4 \
+# --workers: API_WORKERS, also used to size the image process pools (config.py)
+exec uvicorn main:app --host 0.0.0.0 --port 8000 --workers "${API_WORKERS:-4}" \
   --timeout-keep-alive 650 \
   --limit-concurrency 1000
@@ -0,0 +1,215 @@
+"""
+Test harness: the FastAPI app on an in-memory SQLite database
+
+MinIO and Redis are not needed: the `storage` fixture puts an in-memory
+FakeMinio in place of the MinIO client and switches off the Redis-backed
+cache invalidation. Foreign keys are enforced like on Postgres.
+"""
+
+import hashlib
+import io
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from minio.error import S3Error
+
+import main
+import executors
+import services
+from auth import get_current_user_or_api_key
+from database import Base, get_db
+from executors import WorkQueue
+from routers import transform, upload_v2
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+
+    @event.listens_for(engine, "connect")
+    def enable_foreign_keys(connection, _):
+        connection.execute("PRAGMA foreign_keys=ON")
+
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def client(db_session):
+    main.app.dependency_overrides[get_db] = lambda: db_session
+    main.app.dependency_overrides[get_current_user_or_api_key] = lambda: None
+    try:
+        yield TestClient(main.app)
+    finally:
+        main.app.dependency_overrides.clear()
+
+
+class FakeResponse:
+    """Object body as returned by Minio.get_object"""
+
+    def __init__(self, data: bytes, content_type: str):
+        self.body = io.BytesIO(data)
+        self.headers = {"Content-Type": content_type}
+
+    def read(self, amt=None) -> bytes:
+        return self.body.read(amt)
+
+    def stream(self, amt: int):
+        while chunk := self.body.read(amt):
+            yield chunk
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+
+class FakeMinio:
+    """
+    In-memory MinIO: the public calls the backend makes plus the private
+    multipart methods wrapped by minio_multipart
+
+    objects: (bucket, object name) -> (bytes, content type)
+    part_pages: part number marker -> _list_parts result
+    """
+
+    def __init__(self):
+        self.objects: dict[tuple[str, str], tuple[bytes, str]] = {}
+        self.removed: list[tuple[str, str]] = []
+        self.copies: list[tuple] = []
+        self.part_pages: dict = {}
+        self.calls: list[tuple] = []
+        self.lifecycles: dict = {}
+
+    def add(self, bucket: str, object_name: str, data: bytes, content_type: str = "application/octet-stream"):
+        self.objects[(bucket, object_name)] = (data, content_type)
+
+    def data(self, bucket: str) -> dict[str, bytes]:
+        """Object name -> bytes of one bucket"""
+        return {name: data for (b, name), (data, _) in self.objects.items() if b == bucket}
+
+    def _object(self, bucket: str, object_name: str) -> tuple[bytes, str]:
+        if (bucket, object_name) not in self.objects:
+            raise S3Error(
+                code="NoSuchKey", message="Object does not exist", resource=f"/{bucket}/{object_name}",
+                request_id=None, host_id=None, response=None, bucket_name=bucket, object_name=object_name
+            )
+        return self.objects[(bucket, object_name)]
+
+    def bucket_exists(self, bucket: str) -> bool:
+        return True
+
+    def get_bucket_policy(self, bucket: str) -> str:
+        return json.dumps(services.public_read_policy(bucket))
+
+    def set_bucket_lifecycle(self, bucket: str, config):
+        self.lifecycles[bucket] = config
+
+    def put_object(self, bucket, object_name, data, length, content_type="application/octet-stream", **kwargs):
+        content = data.read() if length == -1 else data.read(length)
+        self.add(bucket, object_name, content, content_type)
+        return SimpleNamespace(bucket_name=bucket, object_name=object_name, etag=hashlib.md5(content).hexdigest())
+
+    def stat_object(self, bucket, object_name):
+        data, content_type = self._object(bucket, object_name)
+        return SimpleNamespace(
+            size=len(data), etag=hashlib.md5(data).hexdigest(), content_type=content_type,
+            last_modified=datetime(2026, 1, 1, tzinfo=timezone.utc)
+        )
+
+    def get_object(self, bucket, object_name, offset=0, length=None):
+        data, content_type = self._object(bucket, object_name)
+        end = offset + length if length else None
+        return FakeResponse(data[offset:end], content_type)
+
+    def list_objects(self, bucket, prefix="", recursive=False):
+        return [
+            SimpleNamespace(object_name=name)
+            for (b, name) in list(self.objects) if b == bucket and name.startswith(prefix)
+        ]
+
+    def remove_object(self, bucket, object_name):
+        self.objects.pop((bucket, object_name), None)
+        self.removed.append((bucket, object_name))
+
+    def copy_object(self, bucket, object_name, source, metadata=None, metadata_directive=None):
+        data, content_type = self._object(source.bucket_name, source.object_name)
+        self.add(bucket, object_name, data, (metadata or {}).get("Content-Type", content_type))
+        self.copies.append((bucket, object_name, source.bucket_name, source.object_name, metadata, metadata_directive))
+
+    def _list_parts(self, bucket_name, object_name, upload_id, part_number_marker=None):
+        self.calls.append(("list", part_number_marker))
+        return self.part_pages[part_number_marker]
+
+    def _upload_part(self, bucket_name, object_name, data, headers, upload_id, part_number):
+        self.calls.append(("upload", bucket_name, object_name, data, headers, upload_id, part_number))
+        return "etag-1"
+
+    def _complete_multipart_upload(self, bucket_name, object_name, upload_id, parts):
+        self.calls.append(("complete", [(p.part_number, p.etag) for p in parts]))
+
+
+@pytest.fixture
+def storage(monkeypatch) -> FakeMinio:
+    """FakeMinio as the MinIO client of every backend module, Redis cache invalidation off"""
+    fake = FakeMinio()
+    real = services.minio_client
+    for module in list(sys.modules.values()):
+        if getattr(module, "minio_client", None) is real:
+            monkeypatch.setattr(module, "minio_client", fake)
+    monkeypatch.setattr(services, "_known_buckets", {})
+    monkeypatch.setattr(upload_v2, "invalidate_cached_transforms", lambda *args: 0)
+    monkeypatch.setattr(upload_v2, "invalidate_source", lambda *args: None)
+    return fake
+
+
+async def run_inline(task, func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+@pytest.fixture
+def inline_image_tasks(monkeypatch):
+    """Run image pool tasks in the test process"""
+    monkeypatch.setattr(upload_v2, "run_image_task", run_inline)
+
+
+@pytest.fixture
+def saturated_image_queue(monkeypatch) -> WorkQueue:
+    """Image queue without a free slot (concurrency 0), one waiter allowed, 10ms wait"""
+    queue = WorkQueue("image", concurrency=0, max_waiting=1, timeout=0.01, retry_after=5)
+    monkeypatch.setattr(executors, "image_queue", queue)
+    monkeypatch.setattr(upload_v2, "image_queue", queue)
+    return queue
+
+
+@pytest.fixture
+def served_transforms(monkeypatch) -> list[tuple[str, str]]:
+    """(bucket, path) of every request that reached serve_transform, nothing is rendered"""
+    served = []
+
+    async def serve(bucket, path, *args, **kwargs):
+        served.append((bucket, path))
+        return {}
+
+    monkeypatch.setattr(transform, "serve_transform", serve)
+    return served
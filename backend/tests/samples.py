@@ -0,0 +1,36 @@
+"""Small media files built in memory for tests"""
+
+import io
+import struct
+
+from PIL import Image
+
+
+def png_bytes(color: str = "red", size: tuple[int, int] = (32, 32)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def build_mp4(width: int = 320, height: int = 240, timescale: int = 1000, duration: int = 5000) -> bytes:
+    """MP4 with the moov box after mdat (not faststart) and one stco chunk offset"""
+    ftyp = box(b"ftyp", b"isom" + b"\0\0\0\0" + b"isommp41")
+    media = b"\x00" * 64
+    mdat = box(b"mdat", media)
+    chunk_offset = len(ftyp) + 8  # first media byte
+
+    mvhd = box(b"mvhd", b"\0" * 12 + struct.pack(">II", timescale, duration) + b"\0" * 80)
+    tkhd = box(b"tkhd", b"\0" * 76 + struct.pack(">II", width << 16, height << 16))
+    hdlr = box(b"hdlr", b"\0" * 8 + b"vide" + b"\0" * 12 + b"\0")
+    stco = box(b"stco", b"\0" * 4 + struct.pack(">II", 1, chunk_offset))
+    stbl = box(b"stbl", stco)
+    minf = box(b"minf", stbl)
+    mdia = box(b"mdia", hdlr + minf)
+    trak = box(b"trak", tkhd + mdia)
+    moov = box(b"moov", mvhd + trak)
+
+    return ftyp + mdat + moov
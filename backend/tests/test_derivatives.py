@@ -0,0 +1,40 @@
+import derivatives
+from config import settings
+from derivatives import (
+    derivative_object_name, is_standard_variant, normalize_transform_params,
+    remove_stale_derivatives, store_derivative
+)
+
+BUCKET = settings.DERIVATIVES_BUCKET
+
+
+def test_only_standard_variant_params_count_as_standard():
+    assert is_standard_variant(normalize_transform_params(w=800, format="webp"))
+    assert is_standard_variant(normalize_transform_params(w=400, h=400, format="webp", fit="cover", crop="center"))
+    assert not is_standard_variant(normalize_transform_params(w=801, format="webp"))
+    assert not is_standard_variant(normalize_transform_params(w=800, format="webp", quality=84))
+
+
+def test_stale_derivatives_of_overwritten_source_are_removed(storage):
+    params = normalize_transform_params(w=800, format="webp")
+    old = derivative_object_name("media", "photo.jpg", params, "etag-old")
+    current = derivative_object_name("media", "photo.jpg", params, "etag-new")
+    nested = derivative_object_name("media", "photo.jpg/inner.jpg", params, "etag-old")
+    for name in (old, current, nested):
+        storage.add(BUCKET, name, b"webp")
+
+    assert remove_stale_derivatives("media", "photo.jpg", "etag-new") == 1
+    assert set(storage.data(BUCKET)) == {current, nested}
+
+
+def test_derivatives_bucket_gets_expiry_rule_once(storage, monkeypatch):
+    monkeypatch.setattr(derivatives, "_lifecycle_applied", False)
+    monkeypatch.setattr(settings, "DERIVATIVES_EXPIRE_DAYS", 30)
+    params = normalize_transform_params(w=800, format="webp")
+
+    store_derivative("media", "photo.jpg", params, b"webp", "image/webp", "etag-1")
+    (rule,) = storage.lifecycles.pop(BUCKET).rules
+    store_derivative("media", "photo.jpg", params, b"webp", "image/webp", "etag-2")
+
+    assert rule.expiration.days == 30
+    assert storage.lifecycles == {}
@@ -0,0 +1,34 @@
+import pytest
+
+import executors
+from config import settings
+
+
+@pytest.mark.parametrize("cores,api_workers,image_workers,expected", [
+    (16, 4, 0, 4),  # cores shared by the uvicorn workers
+    (4, 4, 0, 2),  # at least one process for uploads and one for transforms
+    (16, 4, 6, 6)  # explicit pool size
+])
+def test_pool_is_sized_per_api_worker(monkeypatch, cores, api_workers, image_workers, expected):
+    monkeypatch.setattr(executors.os, "cpu_count", lambda: cores)
+    monkeypatch.setattr(settings, "API_WORKERS", api_workers)
+    monkeypatch.setattr(settings, "IMAGE_WORKERS", image_workers)
+
+    assert executors.image_worker_count() == expected
+
+
+@pytest.mark.parametrize("pool,transform_concurrency,expected", [
+    (4, 0, (2, 2)),
+    (5, 0, (2, 3)),
+    (2, 0, (1, 1)),
+    (8, 6, (2, 6)),
+    (4, 10, (1, 3))  # clamped, uploads keep one process
+])
+def test_queues_split_the_pool(monkeypatch, pool, transform_concurrency, expected):
+    monkeypatch.setattr(settings, "IMAGE_WORKERS", pool)
+    monkeypatch.setattr(settings, "TRANSFORM_CONCURRENCY", transform_concurrency)
+
+    image, transform = executors.queue_budget()
+
+    assert (image, transform) == expected
+    assert image + transform == executors.image_worker_count()
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from models import UploadedFile, UploadSession
+
+
+def test_delete_file_created_by_upload_session(client, db_session, storage):
+    db_file = UploadedFile(
+        filename="clip.mp4", original_filename="clip.mp4", bucket="media",
+        path="/media/clip.mp4", size=10, file_type="video", is_active=True
+    )
+    db_session.add(db_file)
+    db_session.flush()
+    db_session.add(UploadSession(
+        id="session-1", upload_id="upload-1", bucket="media", object_name="clip.mp4",
+        original_filename="clip.mp4", file_type="video", total_size=10, chunk_size=10,
+        status="completed", file_id=db_file.id, expires_at=datetime.now()
+    ))
+    db_session.commit()
+    file_id = db_file.id
+    storage.add("media", "clip.mp4", b"video")
+
+    response = client.delete(f"/api/files/{file_id}")
+
+    assert response.status_code == 200
+    db_session.expire_all()
+    assert db_session.get(UploadedFile, file_id) is None
+    assert db_session.get(UploadSession, "session-1").file_id is None
+    assert storage.removed == [("media", "clip.mp4")]
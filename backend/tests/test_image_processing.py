@@ -0,0 +1,75 @@
+import io
+
+import pytest
+from PIL import Image
+
+from image_processing import get_watermark_overlay, render_variants, target_size, transform_image
+
+
+def encode(size: tuple[int, int], format: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "red").save(buffer, format)
+    return buffer.getvalue()
+
+
+def output_size(data: bytes) -> tuple[int, int]:
+    return Image.open(io.BytesIO(data)).size
+
+
+# The size is computed from the source before shrink-on-load: the requested
+# side is kept exactly, the other one rounded to nearest, on every path
+# (JPEG draft, Image.reduce, full decode)
+@pytest.mark.parametrize("source,format", [
+    ((6000, 4000), "JPEG"),  # draft
+    ((6000, 4000), "PNG"),  # reduce
+    ((3000, 2000), "JPEG"),  # below REDUCING_GAP, full decode
+    ((3000, 2000), "PNG")
+])
+def test_width_only_keeps_requested_width(source, format):
+    data, _ = transform_image(encode(source, format), width=800, format="png")
+
+    assert output_size(data) == (800, 533)
+
+
+@pytest.mark.parametrize("format", ["JPEG", "PNG"])
+def test_odd_source_rounds_derived_side_to_nearest(format):
+    data, _ = transform_image(encode((4031, 3023), format), width=500, format="png")
+
+    assert output_size(data) == (500, 375)
+
+
+def test_height_only_keeps_requested_height():
+    data, _ = transform_image(encode((4000, 6000), "JPEG"), height=800, format="png")
+
+    assert output_size(data) == (533, 800)
+
+
+def test_contain_fits_box_and_does_not_enlarge():
+    assert target_size((6000, 4000), 800, 800, "contain") == (800, 533)
+    assert target_size((6000, 4000), 1200, 400, "contain") == (600, 400)
+    assert target_size((300, 200), 800, None, "contain") == (300, 200)
+    assert target_size((6000, 4000), 800, None, "cover") == (800, 533)
+
+
+def test_variants_match_single_transforms():
+    data = encode((6000, 4000), "JPEG")
+    variants = {
+        "preview": {"w": 800, "format": "webp"},
+        "thumbnail": {"w": 400, "h": 400, "fit": "cover", "crop": "center", "format": "webp"}
+    }
+
+    rendered = render_variants(data, variants)
+
+    assert output_size(rendered["preview"][0]) == output_size(transform_image(data, width=800, format="webp")[0])
+    assert output_size(rendered["thumbnail"][0]) == (400, 400)
+
+
+def test_changed_watermark_config_gets_a_new_overlay():
+    red, blue = encode((64, 32), "PNG"), io.BytesIO()
+    Image.new("RGB", (64, 32), "blue").save(blue, "PNG")
+
+    before = get_watermark_overlay(red, 64, 70, version="1:100.0")
+    after = get_watermark_overlay(blue.getvalue(), 64, 70, version="1:200.0")
+
+    assert before.getpixel((0, 0))[:3] == (255, 0, 0)
+    assert after.getpixel((0, 0))[:3] == (0, 0, 255)
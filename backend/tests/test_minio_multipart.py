@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+import pytest
+from minio.datatypes import Part
+
+import minio_multipart
+
+
+def test_installed_minio_matches_expected_private_api():
+    minio_multipart.check_minio_api()
+
+
+def test_check_minio_api_detects_changed_signature(monkeypatch):
+    def changed(self, bucket_name, object_name, upload_id, part_number, data):
+        pass
+
+    monkeypatch.setattr(minio_multipart.Minio, "_upload_part", changed)
+    with pytest.raises(RuntimeError, match="_upload_part"):
+        minio_multipart.check_minio_api()
+
+
+def test_list_parts_follows_pagination(storage):
+    storage.part_pages = {
+        None: SimpleNamespace(parts=[Part(1, "a"), Part(2, "b")], is_truncated=True, next_part_number_marker="2"),
+        "2": SimpleNamespace(parts=[Part(3, "c")], is_truncated=False, next_part_number_marker=None)
+    }
+
+    parts = minio_multipart.list_parts("media", "video.mp4", "upload-1")
+
+    assert [p.part_number for p in parts] == [1, 2, 3]
+    assert storage.calls == [("list", None), ("list", "2")]
+
+
+def test_upload_part_and_complete_argument_order(storage):
+    assert minio_multipart.upload_part("media", "video.mp4", "upload-1", 3, b"data") == "etag-1"
+    minio_multipart.complete_multipart_upload("media", "video.mp4", "upload-1", [Part(2, "b"), Part(1, "a")])
+
+    assert storage.calls == [
+        ("upload", "media", "video.mp4", b"data", None, "upload-1", 3),
+        ("complete", [(1, "a"), (2, "b")])
+    ]
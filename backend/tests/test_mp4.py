@@ -0,0 +1,26 @@
+import io
+
+import mp4
+from samples import build_mp4
+
+
+def test_prepare_mp4_remuxes_trailing_moov():
+    output, info = mp4.prepare_mp4(io.BytesIO(build_mp4()))
+
+    assert info.faststart
+    assert (info.duration, info.width, info.height) == (5.0, 320, 240)
+    assert output.read(8)[4:] == b"ftyp"
+
+
+def test_stco_overflow_keeps_metadata(monkeypatch):
+    def overflow(*args):
+        raise OverflowError("stco offset overflow")
+
+    monkeypatch.setattr(mp4, "patch_chunk_offsets", overflow)
+    original = io.BytesIO(build_mp4())
+
+    output, info = mp4.prepare_mp4(original)
+
+    assert output is original and output.tell() == 0
+    assert not info.faststart
+    assert (info.duration, info.width, info.height) == (5.0, 320, 240)
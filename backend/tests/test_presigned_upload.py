@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from config import settings
+from models import UploadedFile, UploadSession
+from routers import upload_sessions
+from samples import png_bytes
+
+STAGED = (settings.UPLOAD_STAGING_BUCKET, "presigned/presigned-1")
+
+
+@pytest.fixture
+def staged_upload(db_session, storage):
+    def stage(content: bytes, expires_in: timedelta = timedelta(minutes=30)) -> UploadSession:
+        session = UploadSession(
+            id="presigned-1", upload_id="", bucket="media", object_name="photo.png",
+            original_filename="photo.png", file_type="image", mime_type="image/png",
+            total_size=len(content), chunk_size=len(content), status="pending",
+            expires_at=datetime.now() + expires_in
+        )
+        db_session.add(session)
+        db_session.commit()
+        storage.add(*STAGED, content, "text/html")
+        return session
+
+    return stage
+
+
+def test_finalize_publishes_with_sniffed_content_type(client, db_session, storage, staged_upload):
+    # PNG header, HTML body - the client PUT it as text/html
+    polyglot = png_bytes("red") + b"<html><script>alert(1)</script></html>"
+    session = staged_upload(polyglot)
+
+    response = client.post(f"/api/upload/presigned/{session.id}/finalize")
+
+    assert response.status_code == 200
+    (copy,) = storage.copies
+    assert copy == ("media", "photo.png", *STAGED, {"Content-Type": "image/png"}, "REPLACE")
+    assert storage.objects[("media", "photo.png")][1] == "image/png"
+    assert STAGED not in storage.objects
+    assert db_session.query(UploadedFile).one().mime_type == "image/png"
+
+
+def test_finalize_rejects_expired_session(client, db_session, storage, staged_upload):
+    session = staged_upload(png_bytes("red"), expires_in=timedelta(minutes=-1))
+
+    response = client.post(f"/api/upload/presigned/{session.id}/finalize")
+
+    assert response.status_code == 410
+    assert storage.copies == []
+    assert storage.removed == [STAGED]
+    db_session.expire_all()
+    assert db_session.get(UploadSession, "presigned-1").status == "aborted"
+
+
+def test_presigned_url_points_at_private_staging_bucket(client, storage, monkeypatch):
+    signed = []
+    monkeypatch.setattr(
+        upload_sessions.minio_public_client, "presigned_put_object",
+        lambda bucket, name, expires: signed.append((bucket, name)) or "https://minio/upload"
+    )
+
+    response = client.post("/api/upload/presigned", data={"filename": "photo.png", "size": "100"})
+
+    assert response.status_code == 200
+    assert signed == [(settings.UPLOAD_STAGING_BUCKET, f"presigned/{response.json()['session_id']}")]
@@ -0,0 +1,31 @@
+import pytest
+
+from config import settings
+from routers import transform
+
+
+@pytest.fixture
+def batch_renders(monkeypatch) -> list[dict]:
+    """Params passed to render_batch, nothing is rendered"""
+    rendered = []
+
+    async def render(bucket, path, params, force=False):
+        rendered.extend(params)
+        return [{"status": "rendered"} for _ in params]
+
+    monkeypatch.setattr(transform, "render_batch", render)
+    return rendered
+
+
+def test_batch_outputs_are_snapped_like_transform_urls(client, batch_renders, monkeypatch):
+    monkeypatch.setattr(settings, "TRANSFORM_SNAP_MODE", "up")
+    monkeypatch.setattr(settings, "TRANSFORM_WIDTH_LADDER", [320, 640, 960])
+
+    response = client.post("/api/transform/batch", json={
+        "bucket": "media", "path": "hero.jpg",
+        "outputs": [{"w": 500, "h": 250, "format": "webp"}, {"w": 960, "format": "webp"}]
+    })
+
+    assert response.status_code == 200
+    assert [(p["w"], p["h"]) for p in batch_renders] == [(640, 320), (960, None)]
+    assert "w=640" in response.json()["outputs"][0]["url"]
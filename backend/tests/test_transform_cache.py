@@ -0,0 +1,82 @@
+import asyncio
+import transform_cache
+from config import settings
+from derivatives import normalize_transform_params
+
+PARAMS = normalize_transform_params(w=800, format="webp")
+
+
+class FakeRedis:
+    def __init__(self):
+        self.keys = {}
+        self.stored = []
+
+    def set(self, key, value, nx=False, px=None):
+        if nx and key in self.keys:
+            return False
+        self.keys[key] = value
+        return True
+
+
+def patch_redis(monkeypatch, uncacheable=False) -> FakeRedis:
+    redis = FakeRedis()
+    monkeypatch.setattr(settings, "TRANSFORM_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "TRANSFORM_CACHE_MAX_ENTRY_SIZE", 8)
+    monkeypatch.setattr(transform_cache, "is_uncacheable", lambda *args: uncacheable)
+    monkeypatch.setattr(transform_cache, "acquire_render_lock", lambda key, token: redis.set(key, token, nx=True))
+    monkeypatch.setattr(transform_cache, "release_render_lock", lambda key, token: redis.keys.pop(key, None))
+    monkeypatch.setattr(transform_cache, "mark_uncacheable", lambda *args: redis.stored.append("uncacheable"))
+    monkeypatch.setattr(transform_cache, "store_cached_transform", lambda *args: redis.stored.append("entry"))
+    return redis
+
+
+def test_oversized_render_is_marked_instead_of_cached(monkeypatch):
+    redis = patch_redis(monkeypatch)
+
+    async def render():
+        return b"x" * 9, "image/webp"
+
+    data, _, status = asyncio.run(transform_cache.render_once("media", "photo.jpg", PARAMS, render))
+
+    assert (len(data), status) == (9, "MISS")
+    assert redis.stored == ["uncacheable"]
+    assert redis.keys == {}
+
+
+def test_uncacheable_render_skips_lock_and_wait(monkeypatch):
+    redis = patch_redis(monkeypatch, uncacheable=True)
+    # Another worker holds the lock, the request must not wait for it
+    redis.keys[transform_cache.lock_key("media", "photo.jpg", PARAMS)] = "other"
+
+    async def fail_wait(*args):
+        raise AssertionError("waited for an uncacheable render")
+
+    async def render():
+        return b"x" * 9, "image/webp"
+
+    monkeypatch.setattr(transform_cache, "wait_for_render", fail_wait)
+    _, _, status = asyncio.run(transform_cache.render_once("media", "photo.jpg", PARAMS, render))
+
+    assert status == "MISS"
+    assert redis.stored == []
+
+
+def test_concurrent_requests_in_one_worker_share_an_uncacheable_render(monkeypatch):
+    patch_redis(monkeypatch)
+    renders = []
+
+    async def render():
+        renders.append(1)
+        await asyncio.sleep(0.01)
+        return b"x" * 9, "image/webp"
+
+    async def both():
+        return await asyncio.gather(
+            transform_cache.render_once("media", "photo.jpg", PARAMS, render),
+            transform_cache.render_once("media", "photo.jpg", PARAMS, render)
+        )
+
+    results = asyncio.run(both())
+
+    assert sorted(status for _, _, status in results) == ["COALESCED", "MISS"]
+    assert renders == [1]
@@ -0,0 +1,32 @@
+import pytest
+
+from config import settings
+from derivatives import STANDARD_VARIANTS
+from transform_presets import snap_dimensions, snap_width
+
+
+@pytest.fixture(autouse=True)
+def snapping(monkeypatch):
+    monkeypatch.setattr(settings, "TRANSFORM_SNAP_MODE", "up")
+    monkeypatch.setattr(settings, "TRANSFORM_WIDTH_LADDER", [160, 320, 480, 640])
+    monkeypatch.setattr(settings, "WARM_WIDTHS", [400, 560])
+
+
+def test_pre_rendered_widths_are_not_snapped():
+    thumbnail = STANDARD_VARIANTS["thumbnail"]
+
+    assert snap_dimensions(thumbnail["w"], thumbnail["h"]) == (400, 400)
+    assert snap_width(560) == 560
+    assert snap_width(1600) == 1600  # "large" variant, above the configured ladder
+
+
+def test_other_widths_round_up():
+    assert snap_width(401) == 480
+    assert snap_dimensions(300, 150) == (320, 160)
+
+
+def test_preset_route_does_not_shadow_buckets(client, served_transforms):
+    client.get("/api/transform/preset/media/image.jpg?w=300")
+    client.get("/api/transform/_preset/thumbnail/media/image.jpg")
+
+    assert served_transforms == [("preset", "media/image.jpg"), ("media", "image.jpg")]
@@ -0,0 +1,36 @@
+from routers import upload_v2
+from samples import png_bytes
+
+
+def test_identical_files_in_one_batch_share_one_row(client, storage, inline_image_tasks):
+    image = png_bytes("red")
+    files = [("files", ("a.png", image, "image/png")), ("files", ("b.png", image, "image/png"))]
+
+    response = client.post("/api/upload/multi", files=files, data={"bucket": "media"})
+
+    body = response.json()
+    assert response.status_code == 200
+    assert body["failed"] == 0
+    first, second = body["results"]
+    assert first["deduplicated"] is False
+    assert second["deduplicated"] is True
+    assert second["file_id"] == first["file_id"]
+    assert second["original_filename"] == "b.png"
+    assert len(storage.data("media")) == 1
+
+
+def test_database_errors_are_not_leaked(client, storage, inline_image_tasks, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("INSERT INTO uploaded_files ... secret parameters")
+
+    monkeypatch.setattr(upload_v2, "register_contents", fail)
+
+    response = client.post(
+        "/api/upload/multi",
+        files=[("files", ("a.png", png_bytes("red"), "image/png"))],
+        data={"bucket": "media"}
+    )
+
+    (error,) = response.json()["errors"]
+    assert "INSERT" not in error["error"]
+    assert error["error"] == "Could not register the file, please retry"
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from config import settings
+from routers import upload_v2
+from samples import png_bytes
+
+STAGED = [{"object_name": "job-1/0_a.png", "filename": "a.png", "content_type": "image/png", "size": 0}]
+
+
+@pytest.fixture
+def staged_job(storage, db_session, monkeypatch) -> dict:
+    storage.add(settings.UPLOAD_STAGING_BUCKET, STAGED[0]["object_name"], png_bytes("red"))
+    monkeypatch.setattr(upload_v2, "SessionLocal", lambda: db_session)
+    monkeypatch.setattr(upload_v2, "increment_progress", lambda *args: None)
+    return {
+        "bucket": "media", "folder": "", "apply_watermark_flag": False,
+        "watermark_position": "bottom-right", "files": STAGED
+    }
+
+
+def test_failed_job_removes_staged_files(storage, staged_job, monkeypatch):
+    async def fail(*args, **kwargs):
+        raise RuntimeError("worker bug")
+
+    monkeypatch.setattr(upload_v2, "ingest_files", fail)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(upload_v2.process_upload_job("job-1", staged_job))
+
+    assert storage.data(settings.UPLOAD_STAGING_BUCKET) == {}
+
+
+def test_cancelled_job_keeps_staged_files_for_the_retry(storage, staged_job, monkeypatch):
+    async def cancel(*args, **kwargs):
+        raise asyncio.CancelledError()
+
+    monkeypatch.setattr(upload_v2, "ingest_files", cancel)
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(upload_v2.process_upload_job("job-1", staged_job))
+
+    assert list(storage.data(settings.UPLOAD_STAGING_BUCKET)) == ["job-1/0_a.png"]
@@ -0,0 +1,24 @@
+from samples import png_bytes
+
+
+def test_saturated_image_queue_fails_multi_upload_with_503(client, storage, saturated_image_queue):
+    files = [
+        ("files", (f"image{i}.png", png_bytes(color), "image/png"))
+        for i, color in enumerate(["red", "green", "blue"])
+    ]
+
+    response = client.post("/api/upload/multi", files=files, data={"bucket": "media"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+
+def test_saturated_image_queue_fails_single_upload_with_503(client, storage, saturated_image_queue):
+    response = client.post(
+        "/api/upload",
+        files={"file": ("image.png", png_bytes("red"), "image/png")},
+        data={"bucket": "media"}
+    )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
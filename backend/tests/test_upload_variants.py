@@ -0,0 +1,37 @@
+import io
+
+from PIL import Image
+
+from config import settings
+from image_processing import transform_image
+from routers import upload_v2
+
+
+def jpeg_bytes(size: tuple[int, int]) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "red").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def test_variants_are_rendered_from_the_upload_decode(client, storage, inline_image_tasks, monkeypatch):
+    def second_decode(*args):
+        raise AssertionError("variants must come from the pipeline's decoded image")
+
+    monkeypatch.setattr(upload_v2, "render_variants", second_decode)
+
+    response = client.post(
+        "/api/upload",
+        files={"file": ("photo.jpg", jpeg_bytes((3000, 2000)), "image/jpeg")},
+        data={"bucket": "media", "generate_variants": "true"}
+    )
+
+    assert response.status_code == 200
+    (stored,) = storage.data("media").values()
+    sizes = sorted(Image.open(io.BytesIO(data)).size for data in storage.data(settings.DERIVATIVES_BUCKET).values())
+    # Same sizes as /api/transform renders of the stored WebP
+    requests = [(400, 400, "cover", "center"), (800, None, "contain", None), (1600, None, "contain", None), (None, None, "contain", None)]
+    on_demand = sorted(
+        Image.open(io.BytesIO(transform_image(stored, w, h, "webp", fit=fit, crop=crop)[0])).size
+        for w, h, fit, crop in requests
+    )
+    assert sizes == on_demand == [(400, 400), (800, 533), (1600, 1067), (3000, 2000)]
@@ -0,0 +1,32 @@
+import hashlib
+
+from samples import build_mp4
+
+
+def test_faststart_remux_keeps_hash_of_original_upload(client, storage):
+    original = build_mp4()
+
+    response = client.post(
+        "/api/upload",
+        files={"file": ("clip.mp4", original, "video/mp4")},
+        data={"bucket": "media"}
+    )
+
+    assert response.status_code == 200
+    result = response.json()
+    (stored_bytes,) = storage.data("media").values()
+    assert stored_bytes != original  # moov moved to the front
+    assert result["sha256"] == hashlib.sha256(original).hexdigest()
+    assert result["duration"] == 5.0
+
+
+def test_repeated_video_upload_is_not_stored_again(client, storage):
+    upload = {"files": {"file": ("clip.mp4", build_mp4(), "video/mp4")}, "data": {"bucket": "media"}}
+
+    first = client.post("/api/upload", **upload).json()
+    second = client.post("/api/upload", **upload).json()
+
+    assert second["deduplicated"] is True
+    assert second["file_id"] == first["file_id"]
+    assert len(storage.data("media")) == 1
+    assert storage.removed == []
@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from models import BackgroundJob
+
+
+def test_warm_job_status_is_outside_the_bucket_namespace(client, db_session, served_transforms):
+    db_session.add(BackgroundJob(
+        id="job-1", kind="warm", status="running", params="{}",
+        total_items=10, processed_items=4, created_at=datetime.now()
+    ))
+    db_session.commit()
+
+    response = client.get("/api/transform-jobs/warm/job-1")
+    client.get("/api/transform/warm/job-1?w=100")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "running"
+    assert served_transforms == [("warm", "job-1")]
@@ -0,0 +1,63 @@
+"""
+Batch transforms: many outputs of one source from a single fetch and decode
+
+Used by POST /api/transform/batch (responsive srcsets, CMS pre-generation).
+Results are written through to the derivatives bucket and Redis under the
+same keys /api/transform uses, so the individual transform URLs are served
+from cache afterwards.
+"""
+
+from starlette.concurrency import run_in_threadpool
+from ingest import object_version
+from source_cache import get_source
+from image_processing import render_variants
+from derivatives import derivative_exists, store_derivative, http_date
+from transform_cache import store_cached_transform
+from executors import run_io_task, run_transform_task, transform_queue
+from metrics import track_storage_operation
+
+
+async def render_batch(bucket: str, path: str, outputs: list[dict], force: bool = False) -> list[dict]:
+    """
+    Render all outputs that are not stored yet (force: render all)
+
+    outputs: normalized transform params (see normalize_transform_params)
+    Returns per output: {"status": "rendered"|"cached", "size", "content_type"}
+    Raises S3Error if the source does not exist, QueueSaturated if the
+    transform queue is full.
+    """
+    source_etag, last_modified = await run_io_task("origin_stat", object_version, bucket, path)
+
+    results: list[dict] = [{"status": "cached"} for _ in outputs]
+    pending = {}
+    for index, params in enumerate(outputs):
+        if force or not await run_io_task(
+            "derivative_stat", derivative_exists, bucket, path, params, source_etag
+        ):
+            pending[str(index)] = params
+
+    if not pending:
+        return results
+
+    transform_queue.check_capacity()
+    image_data = await run_io_task("origin_fetch", get_source, bucket, path, source_etag)
+    rendered = await run_transform_task("transform_batch", render_variants, image_data, pending)
+
+    for key, (data, content_type) in rendered.items():
+        params = pending[key]
+        try:
+            await run_io_task(
+                "derivative_store", store_derivative,
+                bucket, path, params, data, content_type, source_etag
+            )
+            track_storage_operation("derivatives", True)
+        except Exception as e:
+            track_storage_operation("derivatives", False)
+            print(f"Derivative store failed for {bucket}/{path}: {e}")
+        await run_in_threadpool(
+            store_cached_transform, bucket, path, params, data, content_type,
+            source_etag, http_date(last_modified)
+        )
+        results[int(key)] = {"status": "rendered", "size": len(data), "content_type": content_type}
+
+    return results
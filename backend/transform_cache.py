@@ -0,0 +1,316 @@
+"""
+Redis cache for transform results (second tier behind nginx)
+
+Shared by all API workers, so an nginx eviction or restart is answered from
+Redis instead of fetching, decoding and encoding the original again.
+
+- Entries: hash cdn:transform:{cache_key} with fields data/ct, the source
+  version they were rendered from (src: MinIO ETag, lm: Last-Modified) and a TTL
+- Size budget: Redis maxmemory + volatile-lfu (docker-compose.yml). Only
+  keys with a TTL are evicted, so the job queues are never dropped.
+- Index: set cdn:transform:index:{bucket}/{path} with the keys of one
+  source, so deleting or purging a file drops its renders as well
+
+All functions are best effort - a Redis outage only means a cache miss.
+render_once() adds single-flight on top (see below).
+"""
+
+import asyncio
+import secrets
+import time
+from typing import Awaitable, Callable, Optional
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from services import redis_client, redis_binary_client
+from derivatives import get_transform_cache_key
+
+KEY_PREFIX = "cdn:transform:"
+INDEX_PREFIX = "cdn:transform:index:"
+
+
+def entry_key(bucket: str, path: str, params: dict) -> str:
+    return KEY_PREFIX + get_transform_cache_key(bucket, path, params)
+
+
+def index_key(bucket: str, path: str) -> str:
+    return f"{INDEX_PREFIX}{bucket}/{path.lstrip('/')}"
+
+
+def get_cached_entry(bucket: str, path: str, params: dict) -> Optional[dict]:
+    """
+    Cached entry for normalized transform params, or None (blocking)
+
+    Keys: data, content_type, source_etag and last_modified (None for
+    entries stored without a source version)
+    """
+    if not settings.TRANSFORM_CACHE_ENABLED:
+        return None
+    try:
+        data, content_type, source_etag, last_modified = redis_binary_client.hmget(
+            entry_key(bucket, path, params), "data", "ct", "src", "lm"
+        )
+    except Exception as e:
+        print(f"Transform cache read failed: {e}")
+        return None
+    if data is None:
+        return None
+    return {
+        "data": data,
+        "content_type": (content_type or b"image/webp").decode(),
+        "source_etag": source_etag.decode() if source_etag else None,
+        "last_modified": last_modified.decode() if last_modified else None
+    }
+
+
+def get_cached_transform(bucket: str, path: str, params: dict) -> Optional[tuple[bytes, str]]:
+    """Cached (bytes, content_type) for normalized transform params, or None (blocking)"""
+    entry = get_cached_entry(bucket, path, params)
+    if entry is None:
+        return None
+    return entry["data"], entry["content_type"]
+
+
+def store_cached_transform(
+    bucket: str,
+    path: str,
+    params: dict,
+    data: bytes,
+    content_type: str,
+    source_etag: Optional[str] = None,
+    last_modified: Optional[str] = None
+):
+    """Cache a transform result (blocking, skips entries above the size limit)"""
+    if not settings.TRANSFORM_CACHE_ENABLED or len(data) > settings.TRANSFORM_CACHE_MAX_ENTRY_SIZE:
+        return
+    key = entry_key(bucket, path, params)
+    index = index_key(bucket, path)
+    fields = {"data": data, "ct": content_type}
+    if source_etag:
+        fields["src"] = source_etag
+    if last_modified:
+        fields["lm"] = last_modified
+    try:
+        pipe = redis_binary_client.pipeline(transaction=False)
+        pipe.delete(key)  # Drop the version fields of an older entry
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, settings.TRANSFORM_CACHE_TTL)
+        pipe.sadd(index, key)
+        pipe.expire(index, settings.TRANSFORM_CACHE_TTL)
+        pipe.execute()
+    except Exception as e:
+        print(f"Transform cache write failed: {e}")
+
+
+def invalidate_cached_transforms(bucket: str, path: str) -> int:
+    """Drop all cached renders of one source file (blocking), returns the count"""
+    index = index_key(bucket, path)
+    try:
+        keys = redis_binary_client.smembers(index)
+        if keys:
+            redis_binary_client.delete(*keys)
+        redis_binary_client.delete(index)
+        return len(keys)
+    except Exception as e:
+        print(f"Transform cache invalidation failed for {bucket}/{path}: {e}")
+        return 0
+
+
+def clear_transform_cache(bucket: Optional[str] = None) -> int:
+    """Drop all cached renders (of one bucket, or everything), returns the count"""
+    if bucket:
+        pattern = f"{INDEX_PREFIX}{bucket}/*"
+        removed = 0
+        try:
+            for index in redis_binary_client.scan_iter(match=pattern, count=500):
+                keys = redis_binary_client.smembers(index)
+                if keys:
+                    removed += redis_binary_client.delete(*keys)
+                redis_binary_client.delete(index)
+        except Exception as e:
+            print(f"Transform cache clear failed for bucket {bucket}: {e}")
+        return removed
+
+    removed = 0
+    try:
+        batch = []
+        for key in redis_binary_client.scan_iter(match=f"{KEY_PREFIX}*", count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                removed += redis_binary_client.delete(*batch)
+                batch = []
+        if batch:
+            removed += redis_binary_client.delete(*batch)
+    except Exception as e:
+        print(f"Transform cache clear failed: {e}")
+    return removed
+
+
+# === Single-flight ===
+# Concurrent misses for the same render are collapsed: within a worker they
+# share one asyncio future, across workers one takes a Redis lock and renders
+# while the others poll the cache for its result. Waiters give up after
+# TRANSFORM_COALESCE_WAIT seconds (or when the lock vanishes without a
+# result, e.g. the renderer failed) and render themselves.
+# Results above TRANSFORM_CACHE_MAX_ENTRY_SIZE can't be handed over through
+# the cache, so the renderer leaves an "uncacheable" marker instead and later
+# requests for that render skip the lock and the wait.
+
+LOCK_PREFIX = "cdn:transform:lock:"
+UNCACHEABLE_PREFIX = "cdn:transform:uncacheable:"
+
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_inflight: dict[str, asyncio.Future] = {}
+
+
+def lock_key(bucket: str, path: str, params: dict) -> str:
+    return LOCK_PREFIX + get_transform_cache_key(bucket, path, params)
+
+
+def uncacheable_key(bucket: str, path: str, params: dict) -> str:
+    return UNCACHEABLE_PREFIX + get_transform_cache_key(bucket, path, params)
+
+
+def mark_uncacheable(bucket: str, path: str, params: dict):
+    """Remember that a render is too large to cache (blocking), dropped with the source's entries"""
+    key = uncacheable_key(bucket, path, params)
+    index = index_key(bucket, path)
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.set(key, 1, ex=settings.TRANSFORM_CACHE_TTL)
+        pipe.sadd(index, key)
+        pipe.expire(index, settings.TRANSFORM_CACHE_TTL)
+        pipe.execute()
+    except Exception as e:
+        print(f"Transform cache marker write failed: {e}")
+
+
+def is_uncacheable(bucket: str, path: str, params: dict) -> bool:
+    try:
+        return bool(redis_client.exists(uncacheable_key(bucket, path, params)))
+    except Exception:
+        return False
+
+
+def acquire_render_lock(key: str, token: str) -> bool:
+    """Try to become the renderer (blocking), True if Redis is unavailable"""
+    try:
+        return bool(redis_client.set(key, token, nx=True, px=int(settings.TRANSFORM_LOCK_TTL * 1000)))
+    except Exception as e:
+        print(f"Transform lock failed, rendering without it: {e}")
+        return True
+
+
+def release_render_lock(key: str, token: str):
+    try:
+        redis_client.eval(_RELEASE_LOCK, 1, key, token)
+    except Exception as e:
+        print(f"Transform lock release failed: {e}")
+
+
+def render_lock_held(key: str) -> bool:
+    try:
+        return bool(redis_client.exists(key))
+    except Exception:
+        return False
+
+
+async def wait_for_render(bucket: str, path: str, params: dict, key: str) -> Optional[tuple[bytes, str]]:
+    """Poll the cache until another worker stored the render, None on timeout/failure"""
+    deadline = time.monotonic() + settings.TRANSFORM_COALESCE_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(settings.TRANSFORM_COALESCE_POLL)
+        cached = await run_in_threadpool(get_cached_transform, bucket, path, params)
+        if cached:
+            return cached
+        if not await run_in_threadpool(render_lock_held, key):
+            # Renderer finished without caching (failed or result too large)
+            return await run_in_threadpool(get_cached_transform, bucket, path, params)
+    return None
+
+
+async def render_once(
+    bucket: str,
+    path: str,
+    params: dict,
+    render: Callable[[], Awaitable[tuple[bytes, str]]],
+    source_etag: Optional[str] = None,
+    last_modified: Optional[str] = None
+) -> tuple[bytes, str, str]:
+    """
+    Render a transform at most once across all API workers
+
+    render() produces (bytes, content_type) and is only called by the worker
+    that holds the lock, or as fallback. Returns (bytes, content_type, status)
+    with status MISS (rendered here) or COALESCED (result of another request).
+    source_etag/last_modified are stored with the cached result.
+    """
+    key = lock_key(bucket, path, params)
+
+    # Same render already running in this worker
+    inflight = _inflight.get(key)
+    if inflight is not None:
+        try:
+            data, content_type = await asyncio.shield(inflight)
+            return data, content_type, "COALESCED"
+        except asyncio.CancelledError:
+            if not inflight.cancelled():
+                raise  # This request was cancelled itself
+            # Leading request went away (client disconnect) - render here
+            data, content_type = await render()
+            return data, content_type, "MISS"
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result, status = await _render_or_wait(
+            bucket, path, params, key, render, source_etag, last_modified
+        )
+        future.set_result(result)
+        return result[0], result[1], status
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # Mark retrieved, waiters (if any) get it via await
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+
+async def _render_or_wait(
+    bucket, path, params, key, render, source_etag, last_modified
+) -> tuple[tuple[bytes, str], str]:
+    if not settings.TRANSFORM_CACHE_ENABLED:
+        return await render(), "MISS"
+
+    if await run_in_threadpool(is_uncacheable, bucket, path, params):
+        # Nothing to wait for, the result would not reach the cache anyway
+        return await render(), "MISS"
+
+    token = secrets.token_hex(8)
+    if not await run_in_threadpool(acquire_render_lock, key, token):
+        cached = await wait_for_render(bucket, path, params, key)
+        if cached:
+            return cached, "COALESCED"
+        print(f"Coalesced wait for {bucket}/{path} gave up, rendering locally")
+        return await render(), "MISS"
+
+    try:
+        data, content_type = await render()
+        if len(data) > settings.TRANSFORM_CACHE_MAX_ENTRY_SIZE:
+            # Marked before the lock is released, so waiters see it right away
+            await run_in_threadpool(mark_uncacheable, bucket, path, params)
+        else:
+            await run_in_threadpool(
+                store_cached_transform, bucket, path, params, data, content_type, source_etag, last_modified
+            )
+        return (data, content_type), "MISS"
+    finally:
+        await run_in_threadpool(release_render_lock, key, token)
@@ -0,0 +1,97 @@
+"""
+Transform presets and dimension snapping
+
+Both shrink the variant space, so more requests hit the nginx, Redis and
+derivative caches:
+
+- Presets: named parameter sets (TransformPreset table), served at
+  /api/transform/_preset/{name}/{bucket}/{path} ("_" cannot start a
+  bucket name, so the prefix never shadows a bucket). The standard variants
+  (thumbnail, preview, large, original_webp) are built in and can be
+  overridden by a preset of the same name.
+- Snapping: requested widths are rounded up to TRANSFORM_WIDTH_LADDER
+  (TRANSFORM_SNAP_MODE "up" renders the snapped size, "redirect" sends the
+  client to the snapped URL, "off" disables it). The widths of the standard
+  variants and WARM_WIDTHS are always rungs, so those requests hit the
+  upload-time derivatives and warmed entries.
+
+Preset reads are cached per process for PRESET_CACHE_TTL seconds like the
+bucket settings; other API workers pick up changes once their entry expires.
+"""
+
+import time
+from typing import Optional
+from sqlalchemy.orm import Session
+from config import settings
+from models import TransformPreset
+from derivatives import STANDARD_VARIANTS
+
+PRESET_CACHE_TTL = 30
+
+_cache: dict[str, tuple[float, Optional[dict]]] = {}
+
+
+def preset_params(preset: TransformPreset) -> dict:
+    """Transform query params of a preset row"""
+    return {
+        "w": preset.width,
+        "h": preset.height,
+        "format": preset.format,
+        "quality": preset.quality or 85,
+        "fit": preset.fit or "contain",
+        "crop": preset.crop,
+        "profile": preset.profile
+    }
+
+
+def get_preset(db: Session, name: str) -> Optional[dict]:
+    """Params of a preset (table first, then the built-in standard variants), None if unknown"""
+    cached = _cache.get(name)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    preset = db.query(TransformPreset).filter_by(name=name).first()
+    if preset:
+        params = preset_params(preset)
+    elif name in STANDARD_VARIANTS:
+        params = {"quality": 85, "fit": "contain", **STANDARD_VARIANTS[name]}
+    else:
+        params = None
+
+    _cache[name] = (time.monotonic() + PRESET_CACHE_TTL, params)
+    return params
+
+
+def invalidate_preset(name: str):
+    _cache.pop(name, None)
+
+
+def ladder_widths() -> list[int]:
+    """TRANSFORM_WIDTH_LADDER plus the widths that are rendered ahead of requests"""
+    pinned = {params["w"] for params in STANDARD_VARIANTS.values() if params.get("w")}
+    return sorted(set(settings.TRANSFORM_WIDTH_LADDER) | pinned | set(settings.WARM_WIDTHS))
+
+
+def snap_width(width: int) -> int:
+    """Smallest ladder width >= width (the largest rung if width is above all)"""
+    ladder = ladder_widths()
+    for rung in ladder:
+        if rung >= width:
+            return rung
+    return ladder[-1] if ladder else width
+
+
+def snap_dimensions(width: Optional[int], height: Optional[int]) -> tuple[Optional[int], Optional[int]]:
+    """
+    Width snapped to the ladder, height scaled by the same factor
+
+    Keeps the requested aspect ratio for w+h requests. Height-only requests
+    are left alone.
+    """
+    if settings.TRANSFORM_SNAP_MODE == "off" or not width or not settings.TRANSFORM_WIDTH_LADDER:
+        return width, height
+
+    snapped = snap_width(width)
+    if height and snapped != width:
+        height = max(1, min(4000, round(height * snapped / width)))
+    return snapped, height
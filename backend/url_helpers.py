@@ -86,6 +86,15 @@ def build_origin_url(bucket: str, path: str) -> str:
     return f"{protocol}://{settings.MINIO_ENDPOINT}/{bucket}/{clean_path}"
 
 
+def srcset_variants(widths: list[int], format: str = "webp") -> list[dict]:
+    """
+    Transform-Parameter der srcset-Einträge (gleiche Parameter wie in den URLs)
+    
+    Damit können die Varianten per POST /api/transform/batch vorgerendert werden.
+    """
+    return [{"w": width, "format": format} for width in widths]
+
+
 def get_responsive_srcset(bucket: str, path: str, widths: list[int], format: str = "webp") -> str:
     """
     Generate responsive srcset string für <img> srcset-Attribut
@@ -106,9 +115,9 @@ def get_responsive_srcset(bucket: str, path: str, widths: list[int], format: str
          http://localhost/api/transform/media/photo.jpg?w=1200&format=webp 1200w'
     """
     srcset_parts = []
-    for width in widths:
-        url = build_transform_url(bucket, path, w=width, format=format)
-        srcset_parts.append(f"{url} {width}w")
+    for params in srcset_variants(widths, format):
+        url = build_transform_url(bucket, path, **params)
+        srcset_parts.append(f"{url} {params['w']}w")
     
     return ", ".join(srcset_parts)
 